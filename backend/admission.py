@@ -0,0 +1,362 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from ingest import upload_path
+from metrics import ADMISSION_QUEUED, ADMISSION_RUNNING, ADMISSION_REJECTIONS, ADMISSION_WAIT_SECONDS
+
+load_dotenv()
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+# Scans running predict() at once across every pooled lane; lanes share these slots by weight
+ADMISSION_MAX_RUNNING = int(os.getenv("ADMISSION_MAX_RUNNING", max(2, os.cpu_count() or 2)))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", 15.0))  # waited longer: 503
+# Server threads kept free of scans so /login, /api/history and health checks stay responsive
+ADMISSION_RESERVED_THREADS = int(os.getenv("ADMISSION_RESERVED_THREADS", 2))
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv(
+    "ADMISSION_MAX_IN_FLIGHT", max(1, int(os.getenv("WAITRESS_THREADS", 8)) - ADMISSION_RESERVED_THREADS)))
+RETRY_AFTER_MAX_SECONDS = 60
+
+# Cost thresholds that send a scan to the slow lane of its modality
+LANE_IMAGE_LARGE_PIXELS = int(os.getenv("LANE_IMAGE_LARGE_PIXELS", 4_000_000))
+LANE_IMAGE_LARGE_BYTES = int(os.getenv("LANE_IMAGE_LARGE_BYTES", 8 * 1024 * 1024))  # when the header is unreadable
+LANE_AUDIO_LONG_SECONDS = float(os.getenv("LANE_AUDIO_LONG_SECONDS", 60))
+LANE_VIDEO_LONG_SECONDS = float(os.getenv("LANE_VIDEO_LONG_SECONDS", 60))
+LANE_VIDEO_LARGE_PIXELS = int(os.getenv("LANE_VIDEO_LARGE_PIXELS", 1920 * 1080))
+COMPRESSED_BYTES_PER_SECOND = 16_000  # ~128 kbit/s, for durations that cannot be probed
+
+
+def _lane_setting(lane, name, default, cast=int):
+    return cast(os.getenv(f"LANE_{lane.upper()}_{name}", default))
+
+
+def _lane_defaults():
+    # name: (weight, max_running, reserved, max_queued, pooled)
+    defaults = {
+        "image": (8, 4, 1, 32, True),
+        "image_large": (2, 2, 0, 8, True),
+        "audio": (4, 2, 0, 16, True),
+        "audio_long": (1, 1, 0, 8, True),
+        "video": (2, 1, 0, 8, True),
+        "video_long": (1, 1, 0, 4, True),
+        "batch": (1, 1, 0, 4, False),  # whole /upload/batch requests; their members take the lanes above
+    }
+    return {
+        name: {
+            "weight": _lane_setting(name, "WEIGHT", weight, float),
+            "max_running": _lane_setting(name, "MAX_RUNNING", max_running),
+            "reserved": _lane_setting(name, "RESERVED", reserved),
+            "max_queued": _lane_setting(name, "MAX_QUEUED", max_queued),
+            "pooled": pooled,
+        }
+        for name, (weight, max_running, reserved, max_queued, pooled) in defaults.items()
+    }
+
+
+LANES = _lane_defaults()
+
+
+# --------------------- COST ESTIMATES ---------------------
+
+def _probe_image(file):
+    from PIL import Image
+    path = upload_path(file)
+    if path is not None:
+        with Image.open(path) as image:  # reads the header only
+            return image.size
+    file.stream.seek(0)
+    try:
+        with Image.open(file.stream) as image:
+            return image.size
+    finally:
+        file.stream.seek(0)
+
+
+def _probe_audio_seconds(file):
+    import soundfile
+    path = upload_path(file)
+    if path is not None:
+        return soundfile.info(path).duration
+    file.stream.seek(0)
+    try:
+        return soundfile.info(file.stream).duration
+    finally:
+        file.stream.seek(0)
+
+
+def _probe_video(path):
+    import cv2
+    from frame_sampler import probe
+    cap = cv2.VideoCapture(path)
+    try:
+        frame_count, fps, width, height = probe(cap)
+    finally:
+        cap.release()
+    return (frame_count / fps if fps > 0 else None), width * height
+
+
+def estimate_cost(modality, file, file_size):
+    """What a scan will cost, from container headers only (no decoding): pixels and/or seconds.
+
+    Anything that cannot be probed is estimated from the file size.
+    """
+    cost = {"bytes": file_size}
+    path = upload_path(file)
+    try:
+        if modality == "image":
+            width, height = _probe_image(file)
+            cost["pixels"] = width * height
+        elif modality == "audio":
+            cost["seconds"] = _probe_audio_seconds(file)
+        elif modality == "video" and path is not None:  # OpenCV only opens paths
+            seconds, pixels = _probe_video(path)
+            if seconds:
+                cost["seconds"] = seconds
+            cost["pixels"] = pixels
+    except Exception:
+        pass  # unreadable header: the decoder will report it properly; fall back on the size
+    if modality in ("audio", "video") and "seconds" not in cost:
+        cost["seconds"] = file_size / COMPRESSED_BYTES_PER_SECOND
+    return cost
+
+
+def lane_for(modality, file, file_size):
+    """(lane name, cost estimate) for a scan; lanes split each modality into cheap and expensive work."""
+    if modality not in ("image", "audio", "video"):
+        return modality, {}
+    cost = estimate_cost(modality, file, file_size)
+    if modality == "image":
+        large = cost.get("pixels", 0) > LANE_IMAGE_LARGE_PIXELS if "pixels" in cost \
+            else file_size > LANE_IMAGE_LARGE_BYTES
+        return ("image_large" if large else "image"), cost
+    if modality == "audio":
+        return ("audio_long" if cost["seconds"] > LANE_AUDIO_LONG_SECONDS else "audio"), cost
+    long_video = cost["seconds"] > LANE_VIDEO_LONG_SECONDS or cost.get("pixels", 0) > LANE_VIDEO_LARGE_PIXELS
+    return ("video_long" if long_video else "video"), cost
+
+
+# --------------------- ADMISSION ---------------------
+
+class AdmissionRejected(Exception):
+    """Raised instead of queueing a scan; `status` is 429 (full) or 503 (waited too long)."""
+
+    def __init__(self, status, reason, retry_after, lane):
+        super().__init__(f"{lane} scans are saturated ({reason}), retry in {retry_after}s")
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+        self.lane = lane
+
+
+class Slot:
+    """An admitted scan; release() frees its place and is safe to call more than once."""
+
+    def __init__(self, controller, lane, counted):
+        self.controller = controller
+        self.lane = lane
+        self.counted = counted
+        self.started = time.perf_counter()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.controller._release(self)
+
+
+class _Ticket:
+    __slots__ = ("granted",)
+
+    def __init__(self):
+        self.granted = False
+
+
+class _Lane:
+    def __init__(self, name, weight, max_running, reserved, max_queued, pooled):
+        self.name = name
+        self.weight = max(0.001, float(weight))
+        self.max_running = max(1, int(max_running))
+        self.reserved = max(0, min(int(reserved), self.max_running))
+        self.max_queued = max(0, int(max_queued))
+        self.pooled = pooled
+        self.running = 0
+        self.waiting = deque()
+        self.virtual_time = 0.0  # service handed out so far, divided by weight
+        self.admitted = 0
+        self.rejected = {}
+        self.wait_total = 0.0
+        self.busy_total = 0.0
+        self.service_ewma = 1.0  # seconds per scan, seeded with a guess until real scans finish
+
+    @property
+    def active(self):
+        return self.running > 0 or bool(self.waiting)
+
+
+class AdmissionController:
+    """Weighted-fair admission in front of inference, one queue per lane.
+
+    Every lane has its own slots (`max_running`) and queue bound (`max_queued`);
+    pooled lanes also share `max_running` slots overall. `reserved` slots of a lane
+    are never lent to other lanes, so cheap image scans always find room. When a slot
+    frees up it goes to the waiting lane that has received the least service time
+    relative to its weight (start-time fair queuing), so heavy lanes keep making
+    progress without crowding out light ones.
+
+    Request-thread scans count against `max_in_flight` whether running or waiting,
+    since a waiting scan still holds a server thread; past that, or with a full lane
+    queue, they get 429 straight away. A scan that waits longer than `max_wait` gets
+    503. Both carry a Retry-After estimated from the lane's queue and recent scan
+    times. Background scans (jobs, batch members) only wait: they are bounded by
+    their own worker pools and never hold a server thread.
+    """
+
+    def __init__(self, lanes=None, max_running=ADMISSION_MAX_RUNNING, max_wait=ADMISSION_MAX_WAIT_SECONDS,
+                 max_in_flight=ADMISSION_MAX_IN_FLIGHT, enabled=ADMISSION_ENABLED):
+        self.max_running = max(1, int(max_running))
+        self.max_wait = float(max_wait)
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.enabled = enabled
+        self._cond = threading.Condition()
+        self._lanes = {name: _Lane(name, **config) for name, config in (lanes or LANES).items()}
+        self._pooled_running = 0
+        self._in_flight = 0
+
+    # All of the below run with self._cond held
+
+    def _can_start(self, lane):
+        if lane.running >= lane.max_running:
+            return False
+        if not lane.pooled or lane.running < lane.reserved:
+            return True
+        held_back = sum(max(0, other.reserved - other.running) for other in self._lanes.values()
+                        if other is not lane and other.pooled)
+        return self._pooled_running + held_back < self.max_running
+
+    def _dispatch(self):
+        granted = False
+        while True:
+            candidates = [lane for lane in self._lanes.values() if lane.waiting and self._can_start(lane)]
+            if not candidates:
+                break
+            lane = min(candidates, key=lambda l: l.virtual_time)
+            lane.waiting.popleft().granted = True
+            lane.running += 1
+            if lane.pooled:
+                self._pooled_running += 1
+            lane.virtual_time += lane.service_ewma / lane.weight
+            self._publish(lane)
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _retry_after(self, lane):
+        # Time for everyone queued ahead (and this scan) to get through the lane's slots
+        estimate = (len(lane.waiting) + lane.running + 1) * lane.service_ewma / lane.max_running
+        return int(min(RETRY_AFTER_MAX_SECONDS, max(1, math.ceil(estimate))))
+
+    def _reject(self, lane, status, reason):
+        lane.rejected[reason] = lane.rejected.get(reason, 0) + 1
+        ADMISSION_REJECTIONS.inc(lane=lane.name, reason=reason)
+        return AdmissionRejected(status, reason, self._retry_after(lane), lane.name)
+
+    def _publish(self, lane):
+        ADMISSION_QUEUED.set(len(lane.waiting), lane=lane.name)
+        ADMISSION_RUNNING.set(lane.running, lane=lane.name)
+
+    def acquire(self, lane_name, background=False):
+        """Waits for a slot in the lane and returns it; raises AdmissionRejected when saturated."""
+        lane = self._lanes.get(lane_name)
+        if not self.enabled or lane is None:
+            return Slot(self, lane_name, counted=False)  # unsupported files never reach a model
+
+        enqueued = time.perf_counter()
+        with self._cond:
+            if not background:
+                if self._in_flight >= self.max_in_flight:
+                    raise self._reject(lane, 429, "server_busy")
+                if len(lane.waiting) >= lane.max_queued and not self._can_start(lane):
+                    raise self._reject(lane, 429, "queue_full")
+                self._in_flight += 1
+
+            if not lane.active:
+                # A lane coming back from idle starts level with the busiest ones instead of cashing in idle time
+                busy = [other.virtual_time for other in self._lanes.values() if other.active]
+                if busy:
+                    lane.virtual_time = max(lane.virtual_time, min(busy))
+
+            ticket = _Ticket()
+            lane.waiting.append(ticket)
+            self._publish(lane)
+            self._dispatch()
+            deadline = None if background else enqueued + self.max_wait
+            while not ticket.granted:
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    lane.waiting.remove(ticket)
+                    self._in_flight -= 1
+                    self._publish(lane)
+                    raise self._reject(lane, 503, "queue_timeout")
+                self._cond.wait(remaining)
+
+            waited = time.perf_counter() - enqueued
+            lane.admitted += 1
+            lane.wait_total += waited
+        ADMISSION_WAIT_SECONDS.observe(waited, lane=lane.name)
+        return Slot(self, lane.name, counted=not background)
+
+    def _release(self, slot):
+        lane = self._lanes.get(slot.lane)
+        if lane is None or not self.enabled:
+            return
+        elapsed = time.perf_counter() - slot.started
+        with self._cond:
+            lane.running -= 1
+            if lane.pooled:
+                self._pooled_running -= 1
+            if slot.counted:
+                self._in_flight -= 1
+            lane.busy_total += elapsed
+            lane.service_ewma = 0.8 * lane.service_ewma + 0.2 * elapsed
+            self._publish(lane)
+            self._dispatch()
+
+    @contextmanager
+    def admit(self, lane_name, background=False):
+        slot = self.acquire(lane_name, background=background)
+        try:
+            yield slot
+        finally:
+            slot.release()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "enabled": self.enabled,
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "running": self._pooled_running,
+                "max_running": self.max_running,
+                "max_wait_s": self.max_wait,
+                "lanes": {
+                    name: {
+                        "weight": lane.weight,
+                        "max_running": lane.max_running,
+                        "reserved": lane.reserved,
+                        "max_queued": lane.max_queued,
+                        "running": lane.running,
+                        "queued": len(lane.waiting),
+                        "admitted": lane.admitted,
+                        "rejected": dict(lane.rejected),
+                        "avg_wait_ms": round(lane.wait_total * 1000.0 / lane.admitted, 1) if lane.admitted else 0.0,
+                        "avg_scan_ms": round(lane.service_ewma * 1000.0, 1),
+                        "busy_s": round(lane.busy_total, 2),
+                    }
+                    for name, lane in self._lanes.items()
+                },
+            }
@@ -1,9 +1,9 @@
 import psycopg2
+from psycopg2.extras import execute_values
 from generate_firebase_config import generate_config_file
-from flask import Flask, request, jsonify, send_from_directory, session
+from flask import Flask, request, jsonify, send_from_directory, session, Response, stream_with_context
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
-from waitress import serve
 from cloudinary.uploader import upload as cloudinary_upload
 from cloudinary.utils import cloudinary_url
 import base64
@@ -11,18 +11,34 @@ import re
 import firebase_admin
 from firebase_admin import credentials
 from firebase_admin import auth as firebase_auth
-from model import load_model, predict
+from model import load_model, predict, get_model_version, file_modality, warm_up
+import metrics
+from batching import BatchScheduler
+from inference_pool import InferencePool, INFERENCE_WORKERS
+from result_cache import create_cache, hash_stream, cache_key
+from stat_filter import prefilter
+from ingest import IngestRequest, REQUEST_MAX_BYTES, spooled_upload, content_matches_extension, detach_upload
+from storage import create_storage, BackgroundUploader, STORAGE_BACKEND, LOCAL_STORAGE_DIR
+from batch_scan import iter_members, run_concurrently, BATCH_MAX_BYTES, BATCH_SCAN_CONCURRENCY
+from scan_jobs import SQLiteJobQueue, ScanJobRunner, QueueFull, describe, FINISHED
+from admission import AdmissionController, AdmissionRejected, lane_for
+from cpu_optimize import optimize_models, configure_threads
+from model_registry import ModelRegistry, ModelGeneration, ServingModels, RegistryError, MODEL_REGISTRY_POLL_SECONDS
+import json
+import threading
+import time
 from database.db_config import get_connection
 import cloudinary_config
 from datetime import datetime
 import os
 from werkzeug.utils import secure_filename
+from werkzeug.datastructures import FileStorage
 import smtplib
 import random
 from email.message import EmailMessage
 from dotenv import load_dotenv
 import logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))  # DEBUG floods the logs with every request's internals
 
 
 load_dotenv()
@@ -60,7 +76,12 @@ app = Flask(__name__, static_folder=os.path.abspath("../frontend/dist"), static_
 app.config.update(
     SESSION_COOKIE_SAMESITE="None",  # allow cross-site cookies
     SESSION_COOKIE_SECURE=True,       # only send over HTTPS
+    # Checked against Content-Length before Flask parses the body. Under waitress the body is already
+    # buffered by then; serve.py sets the same limit on its listener so waitress refuses it first.
+    MAX_CONTENT_LENGTH=REQUEST_MAX_BYTES,
 )
+# Uploads are spooled to disk once, hashed and sniffed on the way in
+app.request_class = IngestRequest
 
 
 CORS(app, supports_credentials=True, origins=[
@@ -79,11 +100,32 @@ firebase_admin.initialize_app(cred)
 # Load model once at startup
 #model = load_model()
 
+# Torch's intra/inter-op pools, sized from TORCH_INTRA_OP_THREADS / TORCH_INTER_OP_THREADS
+configure_threads()
+
+# Prediction cache keyed by (content hash, model version)
+prediction_cache = create_cache()
+
 @app.route("/ping", methods=["GET"])
 def ping():
     return {"status": "ok", "message": "StegoShield backend is alive 🎯"}, 200
 
 
+@app.route("/healthz", methods=["GET"])
+def liveness():
+    # Liveness: the process answers requests. Restart it if this stops responding
+    return {"status": "alive", "uptime_s": round(time.time() - started_at, 1)}, 200
+
+
+@app.route("/readyz", methods=["GET"])
+def readiness_check():
+    # Readiness: every model is loaded and warm. Route traffic here only while this is 200
+    body = {"status": "ready" if readiness["ready"] else readiness["stage"], "warmup_ms": readiness["warmup_ms"]}
+    if readiness["error"]:
+        body["error"] = readiness["error"]
+    return body, 200 if readiness["ready"] else 503
+
+
 # --------------------- DATABASE TEST ROUTE ---------------------
 
 @app.route("/api/test_db", methods=["GET"])
@@ -461,6 +503,242 @@ def logout():
 
 # --------------------- PREDICTION ROUTE ---------------------
 
+_model_lock = threading.Lock()
+_swap_lock = threading.Lock()
+
+# Published model versions; the manifest's active version is served and swapped in when it changes
+registry = ModelRegistry()
+# The generation of models new scans run on; scans already running keep the one they started with
+serving = ServingModels()
+
+
+def build_generation(version, models):
+    models = optimize_models(models)  # BatchNorm folding, channels_last, TorchScript, bf16 per CPU_OPTIMIZATION
+    if INFERENCE_WORKERS > 0:
+        # 🔹 Forwards run in worker processes instead of contending with requests for the GIL
+        pool = InferencePool(models, model_version=version)
+        return ModelGeneration(version, models, pool.schedulers(), pool=pool)
+    return ModelGeneration(version, models, {name: BatchScheduler(m, name=name, model_version=version)
+                                                for name, m in models.items()})
+
+
+def ensure_model_loaded():
+    # Request threads and scan-job workers can both get here first
+    with _model_lock:
+        if serving.current is not None:
+            return
+        version = registry.active_version()
+        if version:
+            models = registry.load(version)  # memory-mapped, checksummed and validated
+        else:
+            # No registry yet: the checkpoints at the *_MODEL_PATH locations, versioned by their digest
+            models = load_model()  # full model dict (image, audio, video)
+            version = get_model_version()
+        serving.swap(build_generation(version, models))
+
+
+def swap_models(version):
+    """Loads `version` from the registry, warms it up and serves it; scans in flight finish on the old one."""
+    with _swap_lock:
+        if version == serving.version():
+            return serving.current
+        started = time.perf_counter()
+        generation = None
+        try:
+            models = registry.load(version)
+            generation = build_generation(version, models)
+            if generation.pool is None:
+                warm_up(models)  # pool workers warm themselves before the pool comes up
+        except Exception:
+            if generation is not None:
+                generation.retire()  # never served, so this closes its schedulers or pool straight away
+            raise
+        previous = serving.swap(generation)
+        print(f"🔄 Serving model version {version} (was {previous.version if previous else None}), "
+              f"ready in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return generation
+
+
+def watch_registry():
+    # 🔹 Polls the manifest; a version that fails to load is not retried until the manifest changes again
+    seen = None
+    while True:
+        time.sleep(MODEL_REGISTRY_POLL_SECONDS)
+        mtime = registry.manifest_mtime()
+        if mtime is None or mtime == seen:
+            continue
+        seen = mtime
+        try:
+            version = registry.active_version()
+            if version and version != serving.version():
+                swap_models(version)
+        except Exception as e:
+            print(f"❌ Model version swap failed: {e}")
+
+
+# Startup progress for /readyz; serve.py runs prepare_for_traffic() as soon as it is listening
+readiness = {"ready": False, "stage": "starting", "error": None, "warmup_ms": None}
+started_at = time.time()
+
+
+def prepare_for_traffic():
+    """Loads every model and warms it up; /readyz only reports ready once this has returned."""
+    readiness["stage"] = "loading_models"
+    started = time.perf_counter()
+    ensure_model_loaded()
+    readiness["stage"] = "warming_up"
+    # Pool workers warmed their own copies before the pool came up; only warm what runs in this process
+    generation = serving.current
+    timings = warm_up({} if generation.pool is not None else generation.models)
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+    readiness.update(ready=True, stage="ready", warmup_ms=timings)
+    print(f"✅ Models {generation.version} loaded and warmed up in {timings['total']:.0f} ms: {timings}")
+    if MODEL_REGISTRY_POLL_SECONDS > 0:
+        threading.Thread(target=watch_registry, name="model-registry", daemon=True).start()
+
+
+def record_file_url(rows, file_url):
+    # 🔹 Called by the background uploader once the file is in storage
+    if not rows:
+        return
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("UPDATE results SET file_url = %s WHERE id = ANY(%s)", (file_url, [r["results"] for r in rows]))
+    cursor.execute("UPDATE uploads SET file_url = %s WHERE id = ANY(%s)", (file_url, [r["uploads"] for r in rows]))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+# Bounds how many scans run predict() at once, per cost lane, and how long they may queue for it
+admission = AdmissionController()
+
+
+def admission_response(rejection):
+    response = jsonify({"error": "Scanner is busy, try again later", "reason": rejection.reason,
+                        "modality": rejection.lane.split("_")[0], "lane": rejection.lane,
+                        "retry_after": rejection.retry_after})
+    response.headers["Retry-After"] = str(rejection.retry_after)
+    return response, rejection.status
+
+
+# Storage runs off the request path; file_url columns are filled in when the upload lands
+file_storage = create_storage()
+uploader = BackgroundUploader(file_storage, record_file_url)
+
+
+def run_scan(file, filename, filetype, content_hash, file_size, user_id, set_stage=None, background=False):
+    """Classifies and records one file, handing storage to the background uploader.
+
+    Returns (scan_result, cache_status, file_url, timings, model_version); file_url is
+    None until the uploader has stored these bytes. Raises AdmissionRejected when a request-thread scan
+    (background=False) cannot get an inference slot; background scans wait for one.
+    """
+    set_stage = set_stage or (lambda stage: None)
+    modality = file_modality(filename)
+    timings = {}
+    started = time.perf_counter()
+    ensure_model_loaded()
+
+    # 🔹 Re-uploads of the same bytes skip inference
+    phase = time.perf_counter()
+    with serving.use() as generation, metrics.model_version(generation.version):
+        def scan():
+            # 🔹 Run prediction once the file's lane hands out a slot; cache hits never queue
+            lane, cost = lane_for(modality, file, file_size)
+            metrics.debug("Admission lane:", lane, cost)
+            with admission.admit(lane, background=background):
+                set_stage("analyzing")
+                file.stream.seek(0)  # Reset stream
+                details = {}
+                result, confidence = predict(file, model=generation.models, schedulers=generation.schedulers,
+                                             details=details)
+            return {"result": result, "confidence": confidence, "details": details}
+
+        model_version = generation.version
+        if prediction_cache is not None:
+            key = cache_key(content_hash, filetype, model_version)
+            scan_result, cache_status = prediction_cache.get_or_compute(key, scan)
+        else:
+            scan_result, cache_status = scan(), "miss"
+    timings["inference_ms"] = round((time.perf_counter() - phase) * 1000, 1)
+
+    result = scan_result["result"]
+    confidence = scan_result["confidence"]
+    file_url = uploader.known_url(content_hash)
+    metrics.debug("Prediction result:", result, "Confidence:", confidence, "| Cache:", cache_status)
+
+    # 🔹 Save results to DB with file_size
+    set_stage("saving")
+    phase = time.perf_counter()
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        INSERT INTO results (filename, prediction, confidence, user_id, file_url, file_size, model_version)
+        VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id
+    """, (filename, result, confidence, user_id, file_url, file_size, model_version))
+    result_id = cursor.fetchone()[0]
+
+    cursor.execute("""
+        INSERT INTO uploads (filename, filetype, result, file_url, user_id, file_size)
+        VALUES (%s, %s, %s, %s, %s, %s) RETURNING id
+    """, (filename, filetype, result, file_url, user_id, file_size))
+    upload_id = cursor.fetchone()[0]
+
+    conn.commit()
+    cursor.close()
+    conn.close()
+    metrics.observe_stage("db_write", modality, time.perf_counter() - phase, model_version)
+    timings["db_ms"] = round((time.perf_counter() - phase) * 1000, 1)
+
+    # 🔹 Queue the file for storage; only the local copy happens here
+    if file_url is None:
+        phase = time.perf_counter()
+        rows = [{"results": result_id, "uploads": upload_id}]
+        file_url = uploader.submit(file, content_hash, filetype, rows, modality=modality,
+                                   model_version=model_version)
+        if file_url is not None:
+            record_file_url(rows, file_url)  # stored by another request in the meantime
+        timings["storage_enqueue_ms"] = round((time.perf_counter() - phase) * 1000, 1)
+
+    timings["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    metrics.debug(f"⏱ {filename}: {timings}")
+    return scan_result, cache_status, file_url, timings, model_version
+
+
+def scan_response(scan_result, cache_status, file_url, timings, filename, file_size, debug=False):
+    response = {
+        "result": scan_result["result"],
+        "confidence": scan_result["confidence"],
+        "file_url": file_url,
+        "storage": "stored" if file_url else "pending",
+        "filename": filename,
+        "file_size": file_size,  # Include file size in response
+        "cached": cache_status != "miss",
+        "timings": timings,
+    }
+    # 🔹 ?debug=1 adds model internals such as per-tile scores
+    if debug:
+        response["details"] = scan_result.get("details", {})
+    return response
+
+
+def run_scan_job(job, set_stage):
+    # 🔹 Background half of /upload?async=1: same pipeline, reading the stored copy of the upload
+    with open(job["file_path"], "rb") as stream:
+        file = FileStorage(stream=stream, filename=job["filename"])
+        scan_result, cache_status, file_url, timings, _ = run_scan(
+            file, job["filename"], job["filetype"], job["content_hash"], job["file_size"], job["user_id"],
+            set_stage=set_stage, background=True)
+    return scan_response(scan_result, cache_status, file_url, timings, job["filename"], job["file_size"], debug=True)
+
+
+# Durable scan-job queue; jobs left over from a previous run resume as soon as the app starts
+job_queue = SQLiteJobQueue()
+job_runner = ScanJobRunner(job_queue, run_scan_job)
+
+
 @app.route('/upload', methods=['POST', 'GET' , 'OPTIONS'])
 def detect():
     if request.method == "OPTIONS":
@@ -474,64 +752,306 @@ def detect():
     if 'file' not in request.files:
         return jsonify({"error": "No file uploaded"}), 400
 
+    started = time.perf_counter()
+    metrics.start_debug_sample(force=request.args.get("debug") == "1")
     file = request.files['file']
     filename = secure_filename(file.filename)
     filetype = filename.rsplit('.', 1)[-1].lower()
+    modality = file_modality(filename)
     
-    # Get file size from the uploaded file
-    file_size = request.content_length  # This gets the size in bytes
-    if file_size is None:
-        # Fallback method if content_length isn't available
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)  # Reset file pointer
+    # 🔹 Hash and size were computed while the upload streamed to disk
+    spool = spooled_upload(file)
+    if spool is not None:
+        content_hash, file_size = spool.sha256, spool.size
+        if not content_matches_extension(spool.kind, filetype):
+            return jsonify({"error": f"File content does not match its .{filetype} extension"}), 415
+    else:
+        content_hash, file_size = hash_stream(file.stream)
+
+    metrics.debug(f"DEBUG: Uploading {filename} (Type: {filetype}, Size: {file_size} bytes)")
+
+    # 🔹 ?async=1 stores the file, queues the scan and answers straight away with a job id
+    if request.args.get("async") == "1":
+        try:
+            job_id = job_queue.enqueue(file, filename, filetype, session['user_id'],
+                                       file_size=file_size, content_hash=content_hash)
+        except QueueFull as e:
+            return jsonify({"error": "Scan queue is full, try again later", "message": str(e)}), 503
+        job_runner.notify()
+        return jsonify({
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/api/jobs/{job_id}",
+            "events_url": f"/api/jobs/{job_id}/events",
+        }), 202
 
-    print(f"DEBUG: Uploading {filename} (Type: {filetype}, Size: {file_size} bytes)")
+    try:
+        scan_result, cache_status, file_url, timings, model_version = run_scan(
+            file, filename, filetype, content_hash, file_size, session['user_id'])
+        metrics.observe_request("upload", modality, time.perf_counter() - started, model_version)
+        return jsonify(scan_response(scan_result, cache_status, file_url, timings, filename, file_size,
+                                     debug=request.args.get("debug") == "1"))
+
+    except AdmissionRejected as e:
+        return admission_response(e)
+
+    except Exception as e:
+        metrics.ERRORS.inc(stage="request", modality=modality)
+        print("Error in /upload:", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/upload/batch', methods=['POST'])
+def detect_batch():
+    """Scans many files, or zip/tar archives of them, streaming one NDJSON line per verdict.
 
+    Rows for the whole batch are written in one transaction once every file is done;
+    the final line is a summary.
+    """
+    if 'user_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    # The per-upload limits would reject most batches; members are still held to UPLOAD_MAX_BYTES each.
+    # Under serve.py, bodies past REQUEST_MAX_BYTES only get here through the BATCH_PORT listener.
+    request.max_content_length = BATCH_MAX_BYTES
+    request.max_file_bytes = BATCH_MAX_BYTES
+    files = request.files.getlist('files') + request.files.getlist('file')
+    if not files:
+        return jsonify({"error": "No files uploaded"}), 400
+
+    user_id = session['user_id']
+    debug = request.args.get("debug") == "1"
+    metrics.start_debug_sample(force=debug)
+    ensure_model_loaded()
     try:
-        # 🔹 Upload file to Cloudinary
-        cloud_result = cloudinary_upload(file, resource_type="auto")
-        print("DEBUG cloud_result:", cloud_result)
-        file_url = cloud_result['secure_url']
+        batch_slot = admission.acquire("batch")
+    except AdmissionRejected as e:
+        return admission_response(e)
+    # Every file of the batch runs on the same model version, even if a new one is swapped in meanwhile
+    generation = serving.acquire()
+    # Flask closes request.files when this view returns, before the response below is streamed
+    files = [detach_upload(file) for file in files]
+    model_version = generation.version
+
+    def classify(member):
+        # Concurrent predict() calls meet in the per-modality batch schedulers, so files share forwards
+        def scan():
+            # The batch holds one request slot; its members queue for inference like background jobs
+            lane, _ = lane_for(file_modality(member.filename), member.as_file(), member.size)
+            with admission.admit(lane, background=True), metrics.model_version(model_version):
+                details = {}
+                result, confidence = predict(member.as_file(), model=generation.models,
+                                             schedulers=generation.schedulers, details=details)
+            return {"result": result, "confidence": confidence, "details": details}
+
+        if prediction_cache is not None:
+            scan_result, cache_status = prediction_cache.get_or_compute(
+                cache_key(member.sha256, member.filetype, model_version), scan)
+        else:
+            scan_result, cache_status = scan(), "miss"
+        # Stage the bytes for storage now so the member can be dropped from memory
+        file_url = uploader.submit(member.as_file(), member.sha256, member.filetype, [],
+                                   modality=file_modality(member.filename), model_version=model_version)
+        return scan_result, cache_status, file_url
+
+    def generate():
+        started = time.perf_counter()
+        scanned, errors = [], 0
+        for member, outcome in run_concurrently(iter_members(files), classify, BATCH_SCAN_CONCURRENCY):
+            member.release()
+            if isinstance(outcome, Exception):
+                errors += 1
+                metrics.ERRORS.inc(stage="request", modality=file_modality(member.filename))
+                yield json.dumps({"type": "error", "filename": member.filename, "error": str(outcome)}) + "\n"
+                continue
+            scan_result, cache_status, file_url = outcome
+            scanned.append((member, scan_result, file_url))
+            line = {
+                "type": "result",
+                "filename": member.filename,
+                "path": member.name,
+                "result": scan_result["result"],
+                "confidence": scan_result["confidence"],
+                "file_size": member.size,
+                "cached": cache_status != "miss",
+            }
+            if debug:
+                line["details"] = scan_result.get("details", {})
+            yield json.dumps(line) + "\n"
+        scan_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        # 🔹 One transaction, one multi-row INSERT per table for the whole batch
+        phase = time.perf_counter()
+        saved = 0
+        try:
+            if scanned:
+                conn = get_connection()
+                cursor = conn.cursor()
+                result_ids = execute_values(cursor, """
+                    INSERT INTO results (filename, prediction, confidence, user_id, file_url, file_size,
+                                         model_version)
+                    VALUES %s RETURNING id
+                """, [(m.filename, r["result"], r["confidence"], user_id, url, m.size, model_version)
+                      for m, r, url in scanned], fetch=True)
+                upload_ids = execute_values(cursor, """
+                    INSERT INTO uploads (filename, filetype, result, file_url, user_id, file_size)
+                    VALUES %s RETURNING id
+                """, [(m.filename, m.filetype, r["result"], url, user_id, m.size) for m, r, url in scanned],
+                    fetch=True)
+                conn.commit()
+                cursor.close()
+                conn.close()
+                saved = len(scanned)
+                metrics.observe_stage("db_write", "batch", time.perf_counter() - phase, model_version)
+
+                for (member, _, file_url), (result_id,), (upload_id,) in zip(scanned, result_ids, upload_ids):
+                    if file_url is None:
+                        rows = [{"results": result_id, "uploads": upload_id}]
+                        stored_url = uploader.attach(member.sha256, rows)
+                        if stored_url is not None:
+                            record_file_url(rows, stored_url)
+        except Exception as e:
+            metrics.ERRORS.inc(stage="db_write", modality="batch")
+            print("Error saving batch:", e)
+            yield json.dumps({"type": "error", "error": f"Results could not be saved: {e}"}) + "\n"
+
+        metrics.observe_request("upload_batch", "batch", time.perf_counter() - started, model_version)
+        yield json.dumps({
+            "type": "summary",
+            "files": len(scanned) + errors,
+            "scanned": len(scanned),
+            "errors": errors,
+            "saved": saved,
+            "timings": {"scan_ms": scan_ms, "db_ms": round((time.perf_counter() - phase) * 1000, 1),
+                        "total_ms": round((time.perf_counter() - started) * 1000, 1)},
+        }) + "\n"
+
+    response = Response(stream_with_context(generate()), mimetype="application/x-ndjson",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Both run when the stream ends, also when the client disconnects mid-stream
+    response.call_on_close(batch_slot.release)
+    response.call_on_close(generation.release)
+    for file in files:
+        response.call_on_close(file.close)  # members taken from a loose file have closed it already
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    # Per-process: with several web workers, scrape each one (or run a single worker per container)
+    token = os.getenv("METRICS_TOKEN")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
-        # 🔹 Run prediction (lazy-load model only once)
-        file.stream.seek(0)  # Reset stream
-        if not hasattr(app, 'model'):
-            from model import load_model
-            app.model = load_model()  # full model dict (image, audio, video)
 
-        result, confidence = predict(file, model=app.model)
-        print("Prediction result:", result, "Confidence:", confidence)
+@app.route("/storage/<path:name>", methods=["GET"])
+def local_storage_file(name):
+    # Serves LocalStorage, the offline stand-in for Cloudinary
+    if STORAGE_BACKEND != "local":
+        return jsonify({"error": "Not found"}), 404
+    return send_from_directory(os.path.abspath(LOCAL_STORAGE_DIR), name)
 
-        # 🔹 Save results to DB with file_size
-        conn = get_connection()
-        cursor = conn.cursor()
 
-        cursor.execute("""
-            INSERT INTO results (filename, prediction, confidence, user_id, file_url, file_size)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (filename, result, confidence, session['user_id'], file_url, file_size))
+def _owned_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None or job["user_id"] != session.get('user_id'):
+        return None
+    return job
 
-        cursor.execute("""
-            INSERT INTO uploads (filename, filetype, result, file_url, user_id, file_size)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (filename, filetype, result, file_url, session['user_id'], file_size))
 
-        conn.commit()
-        cursor.close()
-        conn.close()
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def scan_job_status(job_id):
+    if 'user_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    job = _owned_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(describe(job))
 
-        return jsonify({
-            "result": result,
-            "confidence": confidence,
-            "file_url": file_url,
-            "filename": filename,
-            "file_size": file_size  # Include file size in response
-        })
 
+@app.route("/api/jobs/<job_id>/events", methods=["GET"])
+def scan_job_events(job_id):
+    """Server-sent events: one message per stage change, ending with the verdict or the error."""
+    if 'user_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    if _owned_job(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def events():
+        last = None
+        last_sent = time.monotonic()
+        while True:
+            job = job_queue.get(job_id)
+            if job is None:
+                return
+            view = describe(job)
+            if (view["status"], view["stage"]) != last:
+                last = (view["status"], view["stage"])
+                last_sent = time.monotonic()
+                yield f"event: {view['status']}\ndata: {json.dumps(view)}\n\n"
+            if job["status"] in FINISHED:
+                return
+            if time.monotonic() - last_sent > 15:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"  # stops proxies from closing an idle stream
+            time.sleep(0.5)
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/api/inference/stats", methods=["GET"])
+@admin_required
+def inference_stats():
+    stats = {
+        "cache": prediction_cache.stats() if prediction_cache is not None else None,
+        "statistical_prefilter": prefilter.stats(),
+        "scan_jobs": job_queue.stats(),
+        "storage": uploader.stats(),
+        "admission": admission.stats(),
+    }
+    generation = serving.current
+    if generation is None:
+        stats["status"] = "idle"
+        stats["message"] = "Model not loaded yet"
+        return jsonify(stats)
+    stats["model_version"] = generation.version
+    stats["schedulers"] = {name: s.stats() for name, s in generation.schedulers.items()}
+    if generation.pool is not None:
+        stats["inference_pool"] = generation.pool.stats()
+    return jsonify(stats)
+
+
+@app.route("/api/models", methods=["GET"])
+@admin_required
+def list_model_versions():
+    generation = serving.current
+    return jsonify({
+        "active": registry.active_version(),
+        "serving": generation.version if generation is not None else None,
+        "in_flight": generation.in_use() if generation is not None else 0,
+        "versions": registry.versions(),
+    })
+
+
+@app.route("/api/models/activate", methods=["POST"])
+@admin_required
+def activate_model_version():
+    # 🔹 Swaps this process first; the manifest, which other processes follow, only changes once that worked
+    version = (request.get_json(silent=True) or {}).get("version")
+    if not version:
+        return jsonify({"error": "version is required"}), 400
+    try:
+        ensure_model_loaded()
+        swap_models(version)
+    except RegistryError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print("Error in /upload:", e)
-        return jsonify({"error": str(e)}), 500
+        print(f"❌ Model version {version} could not be served: {e}")
+        return jsonify({"error": f"Model version {version} could not be served: {e}"}), 500
+    registry.activate(version)
+    return jsonify({"active": version, "serving": serving.version()})
 
     
 @app.route("/api/history", methods=["GET"])
@@ -729,6 +1249,7 @@ def not_found(e):
 # --------------------- RUN SERVER ---------------------
 
 if __name__ == '__main__':
+    # Development server only; production runs serve.py (waitress, preloaded and warmed models)
     port = int(os.environ.get("PORT", 5000))
-    # app.run(debug=True)
+    threading.Thread(target=prepare_for_traffic, name="startup", daemon=True).start()
     app.run(host='0.0.0.0', port=port)
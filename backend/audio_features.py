@@ -0,0 +1,306 @@
+import librosa
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from media_decode import iter_pcm
+
+# Must match create_model/modelTraining/audio_steganography.py
+SAMPLE_RATE = 22050
+N_MELS = 128
+N_FFT = 2048
+HOP_LENGTH = 512
+TARGET_SHAPE = (128, 300)
+TRIM_TOP_DB = 60
+DB_TOP_DB = 80.0
+
+CHUNK_SAMPLES = SAMPLE_RATE * 5           # ~430 KB of float32 per decoded chunk
+IN_MEMORY_MAX_SAMPLES = SAMPLE_RATE * 60  # clips up to a minute take the exact librosa path
+
+
+# --------------------- TRAINING-TIME FRONT-END ---------------------
+
+def waveform_to_spectrogram(waveform, sr=SAMPLE_RATE, n_mels=N_MELS, target_shape=TARGET_SHAPE):
+    waveform, _ = librosa.effects.trim(waveform)
+    n_fft = min(N_FFT, len(waveform))
+    spectrogram = librosa.feature.melspectrogram(y=waveform, sr=sr, n_mels=n_mels, n_fft=n_fft)
+    spectrogram = librosa.power_to_db(spectrogram, ref=np.max)
+    if spectrogram.max() <= spectrogram.min():
+        raise ValueError("No audible audio found")  # digital silence has no dB range to scale
+    spectrogram = (spectrogram - spectrogram.min()) / (spectrogram.max() - spectrogram.min())
+    spectrogram = torch.tensor(spectrogram, dtype=torch.float32).unsqueeze(0)
+    return pad_spectrogram(spectrogram, target_shape)
+
+
+def pad_spectrogram(spectrogram, target_shape=TARGET_SHAPE):
+    _, height, width = spectrogram.shape
+    if width < target_shape[1]:
+        pad_width = target_shape[1] - width
+        spectrogram = F.pad(spectrogram, (0, pad_width), mode='constant', value=0)
+    elif width > target_shape[1]:
+        spectrogram = spectrogram[:, :, :target_shape[1]]
+    return spectrogram
+
+
+# --------------------- CHUNKED DECODING ---------------------
+
+def decode_pcm_chunks(source, sr=SAMPLE_RATE, chunk_samples=CHUNK_SAMPLES):
+    """Yields mono float32 PCM at `sr` from a path or an upload, one chunk at a time."""
+    return iter_pcm(source, sample_rate=sr, chunk_samples=chunk_samples)
+
+
+# --------------------- STREAMING MEL ---------------------
+
+class StreamingMel:
+    """Incremental equivalent of librosa.feature.melspectrogram(center=True) over chunked audio.
+
+    Frame t is centred on sample t * hop_length, exactly like librosa; only the
+    last n_fft samples are kept between chunks.
+    """
+
+    def __init__(self, sr=SAMPLE_RATE, n_fft=N_FFT, hop_length=HOP_LENGTH, n_mels=N_MELS):
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.window = librosa.filters.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+        self.mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels).astype(np.float32)
+        self.reset()
+
+    def reset(self):
+        # Centre padding: librosa pads n_fft // 2 zeros on each side
+        self._buffer = np.zeros(self.n_fft // 2, dtype=np.float32)
+        self.frames_emitted = 0
+
+    def _frames(self, buffer):
+        n = 1 + (len(buffer) - self.n_fft) // self.hop_length if len(buffer) >= self.n_fft else 0
+        if n <= 0:
+            return np.empty((0, self.n_fft), dtype=np.float32), 0
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, self.n_fft)[::self.hop_length][:n]
+        return windows, n
+
+    def _emit(self, windows):
+        spectrum = np.abs(np.fft.rfft(windows * self.window, n=self.n_fft, axis=1)) ** 2
+        power = (windows ** 2).mean(axis=1)  # frame mean-square, what librosa.effects.trim thresholds on
+        mel = self.mel_basis @ spectrum.T.astype(np.float32)
+        self.frames_emitted += windows.shape[0]
+        return mel, power
+
+    def push(self, samples):
+        """Returns (mel_power [n_mels, n], frame_mean_square [n]) for every frame now complete."""
+        buffer = np.concatenate([self._buffer, samples.astype(np.float32, copy=False)])
+        windows, n = self._frames(buffer)
+        if n == 0:
+            self._buffer = buffer
+            return np.empty((self.mel_basis.shape[0], 0), dtype=np.float32), np.empty(0, dtype=np.float32)
+        mel, power = self._emit(windows)
+        drop = n * self.hop_length
+        self._buffer = buffer[drop:]
+        return mel, power
+
+    def flush(self):
+        """Emits the trailing frames that librosa computes over the right-hand zero padding."""
+        buffer = np.concatenate([self._buffer, np.zeros(self.n_fft // 2, dtype=np.float32)])
+        self._buffer = np.zeros(0, dtype=np.float32)
+        windows, n = self._frames(buffer)
+        if n == 0:
+            return np.empty((self.mel_basis.shape[0], 0), dtype=np.float32), np.empty(0, dtype=np.float32)
+        return self._emit(windows)
+
+
+# --------------------- FILE -> MODEL INPUT ---------------------
+
+def _frame_statistics(chunks):
+    """First pass: per-frame mel max/min and mean-square, without keeping any samples."""
+    mel = StreamingMel()
+    mel_max, mel_min, mean_square = [], [], []
+
+    def collect(m, p):
+        if p.size:
+            mel_max.append(m.max(axis=0))
+            mel_min.append(m.min(axis=0))
+            mean_square.append(p)
+
+    for chunk in chunks:
+        collect(*mel.push(chunk))
+    collect(*mel.flush())
+
+    if not mean_square:
+        raise ValueError("No audio stream found")
+    return np.concatenate(mel_max), np.concatenate(mel_min), np.concatenate(mean_square)
+
+
+def _trimmed_frame_range(mean_square, total_samples):
+    # Same rule as librosa.effects.trim(top_db=60): frames within 60 dB of the loudest frame
+    nonsilent = np.flatnonzero(mean_square > mean_square.max() * 10 ** (-TRIM_TOP_DB / 10))
+    if nonsilent.size == 0:
+        raise ValueError("No audible audio found")
+    start = nonsilent[0] * HOP_LENGTH
+    end = min(total_samples, (nonsilent[-1] + 1) * HOP_LENGTH)
+    first = int(nonsilent[0])
+    last = first + 1 + (end - start) // HOP_LENGTH
+    return first, min(last, len(mean_square))
+
+
+def _normalise(mel_power, ref_power, min_power):
+    """power_to_db(ref=np.max, top_db=80) followed by the training-time min-max scaling."""
+    amin = 1e-10
+    ref_db = 10.0 * np.log10(max(amin, ref_power))
+    db = 10.0 * np.log10(np.maximum(amin, mel_power)) - ref_db
+    db = np.maximum(db, -DB_TOP_DB)
+    min_db = max(-DB_TOP_DB, 10.0 * np.log10(max(amin, min_power)) - ref_db)
+    if min_db >= 0:
+        return np.zeros_like(db)
+    return (db - min_db) / (0.0 - min_db)
+
+
+def _streaming_spectrogram(source, head, rest):
+    """Two bounded-memory passes for long files.
+
+    Pass 1 streams the whole file once to find the trim bounds and the global
+    dB reference that the training code derives from the full spectrogram.
+    Pass 2 only decodes until the first TARGET_SHAPE[1] trimmed frames are out.
+    Frames on the trim edges see real samples instead of librosa's zero padding,
+    otherwise the output matches waveform_to_spectrogram().
+    """
+    def first_pass():
+        yield from head
+        yield from rest
+
+    total_samples = 0
+
+    def counted(chunks):
+        nonlocal total_samples
+        for chunk in chunks:
+            total_samples += len(chunk)
+            yield chunk
+
+    mel_max, mel_min, mean_square = _frame_statistics(counted(first_pass()))
+    first, last = _trimmed_frame_range(mean_square, total_samples)
+    ref_power = float(mel_max[first:last].max())
+    min_power = float(mel_min[first:last].min())
+
+    wanted = min(last, first + TARGET_SHAPE[1])
+    mel = StreamingMel()
+    columns, frame = [], 0
+    for chunk in decode_pcm_chunks(source):
+        m, _ = mel.push(chunk)
+        frame = _take_columns(m, frame, first, wanted, columns)
+        if frame >= wanted:
+            break
+    else:
+        m, _ = mel.flush()
+        _take_columns(m, frame, first, wanted, columns)
+
+    spectrogram = _normalise(np.concatenate(columns, axis=1), ref_power, min_power)
+    spectrogram = torch.tensor(spectrogram, dtype=torch.float32).unsqueeze(0)
+    return pad_spectrogram(spectrogram)
+
+
+def _take_columns(mel_power, frame, first, wanted, columns):
+    n = mel_power.shape[1]
+    lo, hi = max(first, frame), min(wanted, frame + n)
+    if hi > lo:
+        columns.append(mel_power[:, lo - frame:hi - frame])
+    return frame + n
+
+
+def file_to_spectrogram(source):
+    """Decodes `source` (a path or an upload) in chunks and returns the (1, 128, 300) model input."""
+    chunks = decode_pcm_chunks(source)
+    head, n = [], 0
+    for chunk in chunks:
+        head.append(chunk)
+        n += len(chunk)
+        if n > IN_MEMORY_MAX_SAMPLES:
+            return _streaming_spectrogram(source, head, chunks)
+
+    if n == 0:
+        raise ValueError("No audio stream found")
+    return waveform_to_spectrogram(np.concatenate(head))
+
+
+# --------------------- SLIDING WINDOWS ---------------------
+
+def _window(mel_power):
+    """One window normalised on its own, as if it were a training clip; None if it is silent."""
+    ref_power = float(mel_power.max())
+    if ref_power <= 1e-10:
+        return None
+    spectrogram = _normalise(mel_power, ref_power, float(mel_power.min()))
+    return torch.tensor(spectrogram, dtype=torch.float32).unsqueeze(0)
+
+
+def spectrogram_windows(source, hop=TARGET_SHAPE[1] // 2, width=TARGET_SHAPE[1]):
+    """Yields (start_frame, (1, 128, width) spectrogram) for overlapping windows over the whole file.
+
+    Windows start every `hop` frames, plus one flush with the end so the tail is
+    covered. Audio is decoded and transformed chunk by chunk and only the mel columns
+    of the window being filled are kept, so memory does not grow with the file.
+    Clips no longer than one window take the training front-end unchanged. Longer
+    files skip librosa's trim and scale each window by its own dB range; windows of
+    digital silence are skipped. Closing the generator stops the decoder.
+    """
+    chunks = decode_pcm_chunks(source)
+    head, n = [], 0
+    single_window_samples = (width - 1) * HOP_LENGTH  # more samples than this make a 301st frame
+    for chunk in chunks:
+        head.append(chunk)
+        n += len(chunk)
+        if n > single_window_samples:
+            break
+    else:
+        if n == 0:
+            raise ValueError("No audio stream found")
+        yield 0, waveform_to_spectrogram(np.concatenate(head))
+        return
+
+    mel = StreamingMel()
+    columns = np.empty((N_MELS, 0), dtype=np.float32)
+    first_column = 0  # frame index of columns[:, 0]
+    next_start = 0
+    emitted_any = False
+    last_start = None
+
+    def pieces():
+        yield from head
+        yield from chunks
+
+    def windows_ready(m, final=False):
+        nonlocal columns, first_column, next_start, emitted_any, last_start
+        columns = np.concatenate([columns, m], axis=1)
+        end = first_column + columns.shape[1]
+        while next_start + width <= end:
+            offset = next_start - first_column
+            window = _window(columns[:, offset:offset + width])
+            last_start = next_start
+            next_start += hop
+            if window is not None:
+                emitted_any = True
+                yield last_start, window
+        if final and end > width and (last_start is None or last_start + width < end):
+            window = _window(columns[:, -width:])
+            if window is not None:
+                emitted_any = True
+                yield end - width, window
+        # Keep the columns the next window (or a final flush window) still needs
+        keep_from = max(first_column, min(next_start, end - width))
+        columns = columns[:, keep_from - first_column:]
+        first_column = keep_from
+
+    for chunk in pieces():
+        m, _ = mel.push(chunk)
+        yield from windows_ready(m)
+    m, _ = mel.flush()
+    yield from windows_ready(m, final=True)
+
+    if not emitted_any:
+        raise ValueError("No audible audio found")
+
+
+def window_seconds(frame):
+    """Start time, in seconds, of the spectrogram frame `frame`."""
+    return frame * HOP_LENGTH / SAMPLE_RATE
+
+
+def preprocess_audio(audio_file):
+    """Returns the (1, 1, 128, 300) spectrogram batch of an upload, piped to ffmpeg without a temp copy."""
+    return file_to_spectrogram(audio_file).unsqueeze(0)
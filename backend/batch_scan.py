@@ -0,0 +1,171 @@
+import os
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from dotenv import load_dotenv
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+
+from ingest import UPLOAD_MAX_BYTES, SpoolReader, UploadSpool, content_matches_extension, spooled_upload, upload_path
+
+load_dotenv()
+
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 500))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", 2 * 1024 * 1024 * 1024))  # whole batch request
+BATCH_SCAN_CONCURRENCY = int(os.getenv("BATCH_SCAN_CONCURRENCY", 8))  # files classified at once
+
+ZIP_EXTENSIONS = (".zip",)
+TAR_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+class BatchMember:
+    """One file of a batch, spooled to disk; `error` is set instead when it was skipped."""
+
+    def __init__(self, name, spool=None, error=None):
+        self.name = name
+        self.filename = secure_filename(os.path.basename(name)) or "unnamed"
+        self.filetype = self.filename.rsplit('.', 1)[-1].lower() if '.' in self.filename else ""
+        self.spool = spool
+        self.error = error
+        self.size = spool.size if spool is not None else 0
+        self.sha256 = spool.sha256 if spool is not None else None
+        if spool is not None and not content_matches_extension(spool.kind, self.filetype):
+            self.error = f"File content does not match its .{self.filetype} extension"  # as /upload's 415
+            self.release()
+
+    def as_file(self):
+        """A fresh FileStorage over the spooled bytes, the shape predict() expects."""
+        return FileStorage(stream=SpoolReader(self.spool), filename=self.filename)
+
+    def release(self):
+        if self.spool is not None:
+            self.spool.close()  # deletes the spooled file
+            self.spool = None
+
+
+def is_archive(filename):
+    name = filename.lower()
+    return name.endswith(ZIP_EXTENSIONS) or name.endswith(TAR_EXTENSIONS)
+
+
+def _skip(name):
+    # Directories and the resource-fork junk macOS adds to zips
+    base = os.path.basename(name.rstrip("/"))
+    return name.endswith("/") or name.startswith("__MACOSX/") or base.startswith("._") or not base
+
+
+def _spool_limited(stream, name, max_bytes, chunk_size=1 << 20):
+    # Copied to disk chunk by chunk, never trusting the size an archive header claims
+    spool = UploadSpool(max_bytes=max_bytes)
+    try:
+        for chunk in iter(lambda: stream.read(chunk_size), b""):
+            spool.write(chunk)
+        spool.flush()
+    except RequestEntityTooLarge:
+        return BatchMember(name, error=f"Larger than {max_bytes} bytes")  # the spool removed itself
+    except Exception:
+        spool.close()
+        raise
+    return BatchMember(name, spool)
+
+
+def _loose_member(file, name, max_bytes):
+    # A plain file part was already spooled by IngestRequest; the member takes it over
+    spool = spooled_upload(file)
+    if isinstance(spool, UploadSpool):
+        if spool.size > max_bytes:
+            return BatchMember(name, error=f"Larger than {max_bytes} bytes")
+        spool.flush()
+        return BatchMember(name, spool)
+    file.stream.seek(0)
+    return _spool_limited(file.stream, name, max_bytes)
+
+
+def _iter_zip(file, max_bytes):
+    source = upload_path(file) or file.stream
+    with zipfile.ZipFile(source) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or _skip(info.filename):
+                continue
+            if info.file_size > max_bytes:
+                yield BatchMember(info.filename, error=f"Larger than {max_bytes} bytes")
+                continue
+            with archive.open(info) as member:
+                yield _spool_limited(member, info.filename, max_bytes)
+
+
+def _iter_tar(file, max_bytes):
+    file.stream.seek(0)
+    # "r|*" reads the archive strictly front to back, one member at a time
+    with tarfile.open(fileobj=file.stream, mode="r|*") as archive:
+        for info in archive:
+            if not info.isfile() or _skip(info.name):
+                continue
+            if info.size > max_bytes:
+                yield BatchMember(info.name, error=f"Larger than {max_bytes} bytes")
+                continue
+            yield _spool_limited(archive.extractfile(info), info.name, max_bytes)
+
+
+def iter_members(files, max_files=BATCH_MAX_FILES, max_member_bytes=UPLOAD_MAX_BYTES):
+    """Yields a BatchMember per uploaded file, expanding zip and tar archives one member at a time.
+
+    Each member is spooled to its own temp file, so memory stays flat however large the
+    members are; the caller release()s a member once it is done with it.
+    """
+    count = 0
+    for file in files:
+        name = file.filename or ""
+        try:
+            if name.lower().endswith(ZIP_EXTENSIONS):
+                members = _iter_zip(file, max_member_bytes)
+            elif name.lower().endswith(TAR_EXTENSIONS):
+                members = _iter_tar(file, max_member_bytes)
+            else:
+                members = [_loose_member(file, name, max_member_bytes)]
+            for member in members:
+                if count >= max_files:
+                    member.release()
+                    yield BatchMember(member.name, error=f"Batch limit of {max_files} files reached")
+                    return
+                count += 1
+                yield member
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            yield BatchMember(name, error=f"Unreadable archive: {e}")
+
+
+def run_concurrently(members, fn, concurrency=BATCH_SCAN_CONCURRENCY):
+    """Yields (member, outcome) as each fn(member) finishes; outcome is the return value or the exception.
+
+    Members are pulled from the iterator only while fewer than `concurrency` are
+    running, so an archive is never read much further ahead than it is classified.
+    Skipped members come straight back with their error. Members whose outcome was
+    never yielded are released when the generator is closed.
+    """
+    members = iter(members)
+    running = {}
+    exhausted = False
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch-scan") as pool:
+            while True:
+                while not exhausted and len(running) < concurrency:
+                    member = next(members, None)
+                    if member is None:
+                        exhausted = True
+                    elif member.error is not None:
+                        yield member, ValueError(member.error)
+                    else:
+                        running[pool.submit(fn, member)] = member
+                if not running:
+                    return
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    member = running.pop(future)
+                    error = future.exception()
+                    yield member, error if error is not None else future.result()
+    finally:
+        # Closed early (the client went away): the pool has let the running scans finish; drop their spools
+        for member in running.values():
+            member.release()
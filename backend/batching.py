@@ -0,0 +1,155 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+import torch
+from dotenv import load_dotenv
+
+from metrics import observe_stage
+
+load_dotenv()
+
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 16))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", 10))
+
+
+def classify_logits(output):
+    """("Malicious" | "Safe", confidence) for the first row of a batch of logits."""
+    prediction = torch.argmax(output, dim=1)[0].item()
+    confidence = torch.softmax(output, dim=1).max(dim=1).values[0].item()
+    result = "Malicious" if prediction == 1 else "Safe"
+    return result, round(confidence, 2)
+
+
+class _PendingRequest:
+    __slots__ = ("inputs", "done", "output", "error", "enqueued_at")
+
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.done = threading.Event()
+        self.output = None
+        self.error = None
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchScheduler:
+    """Collects preprocessed tensors from concurrent requests and runs them through one forward pass."""
+
+    def __init__(self, model, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS, name="image",
+                 model_version=None):
+        self.model = model
+        self.model_version = model_version  # metrics label; this thread serves every scan on the generation
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._batches = 0
+        self._samples = 0
+        self._requests = 0
+        self._wait_total = 0.0
+        self._forward_total = 0.0
+
+        self._worker = threading.Thread(target=self._run, name=f"batcher-{name}", daemon=True)
+        self._worker.start()
+
+    # Blocks until the batch containing `inputs` has run; returns this caller's rows of logits
+    def run(self, inputs):
+        if inputs.dim() == 0:
+            raise ValueError("BatchScheduler.run() expects a batched tensor")
+        pending = _PendingRequest(inputs)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.output
+
+    def classify(self, inputs):
+        """Returns ("Malicious" | "Safe", confidence) for a single preprocessed sample."""
+        return classify_logits(self.run(inputs))
+
+    def close(self):
+        """Stops the worker thread once the requests already queued have run."""
+        self._queue.put(None)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None, 0
+        batch = [first]
+        size = first.inputs.shape[0]
+        deadline = time.perf_counter() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if pending is None:
+                self._queue.put(None)  # run this batch first, stop on the next collect
+                break
+            batch.append(pending)
+            size += pending.inputs.shape[0]
+        return batch, size
+
+    def _run(self):
+        while True:
+            batch, size = self._collect()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            try:
+                # Grad mode is thread-local, so it has to be disabled in this thread
+                with torch.no_grad():
+                    output = self.model(torch.cat([p.inputs for p in batch], dim=0))
+                offset = 0
+                for pending in batch:
+                    n = pending.inputs.shape[0]
+                    pending.output = output[offset:offset + n]
+                    offset += n
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            finished = time.perf_counter()
+
+            observe_stage("forward", self.name, finished - started, self.model_version)
+            for pending in batch:
+                observe_stage("queue_wait", self.name, started - pending.enqueued_at, self.model_version)
+
+            with self._stats_lock:
+                self._batches += 1
+                self._samples += size
+                self._requests += len(batch)
+                self._batch_sizes[size] += 1
+                self._wait_total += sum(started - p.enqueued_at for p in batch)
+                self._forward_total += finished - started
+
+            for pending in batch:
+                pending.done.set()
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._stats_lock:
+            batches = self._batches
+            return {
+                "name": self.name,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": self.queue_depth(),
+                "batches": batches,
+                "requests": self._requests,
+                "samples": self._samples,
+                "avg_batch_size": round(self._samples / batches, 2) if batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "avg_queue_wait_ms": round(self._wait_total * 1000.0 / self._requests, 3) if self._requests else 0.0,
+                "avg_forward_ms": round(self._forward_total * 1000.0 / batches, 3) if batches else 0.0,
+            }
@@ -0,0 +1,136 @@
+"""Plain model.eval() against the CPU preparations in cpu_optimize.py: latency and parity, per model.
+
+  eval        the model as load_model() returns it
+  eager       BatchNorm folded into the convolutions, channels_last weights and inputs
+  jit         eager, then traced, frozen and run with oneDNN graph fusion
+  +bf16       the same under bf16 autocast (skipped without native bf16 unless --bf16 on)
+
+Parity is measured against eval on --samples random inputs: the largest change in
+the stego probability and the share of verdicts that stay the same. Random weights
+get randomised BatchNorm statistics so folding has something to fold; pass
+--checkpoints to compare the trained models instead.
+
+Run from backend/:
+  python benchmarks/cpu_optimize.py [--models image audio audio_cnn video] [--batch-sizes 1 8]
+                                    [--threads 1] [--json results.json]
+"""
+import argparse
+import copy
+import json
+import os
+import statistics
+import sys
+import time
+import warnings
+
+import torch
+import torch.nn as nn
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import cpu_optimize  # noqa: E402
+import model as model_module  # noqa: E402
+
+# name: (modality, factory for random weights, loader for --checkpoints)
+MODELS = {
+    "image": ("image", lambda: model_module.ImageStegoCNN(pretrained=False), model_module.load_image_model),
+    "audio": ("audio", model_module.ResNet34Audio, model_module.load_audio_model),
+    "audio_cnn": ("audio", model_module.AudioStegoCNN, None),
+    "video": ("video", lambda: model_module.VideoStegoModel(pretrained=False), model_module.load_video_model),
+}
+VARIANTS = [("eval", "none", False), ("eager", "eager", False), ("jit", "jit", False),
+            ("eager+bf16", "eager", True), ("jit+bf16", "jit", True)]
+
+
+def reference_model(name, checkpoints):
+    _, factory, loader = MODELS[name]
+    if checkpoints and loader is not None:
+        return loader()
+    model = factory().eval()
+    generator = torch.Generator().manual_seed(0)
+    for module in model.modules():
+        if isinstance(module, nn.BatchNorm2d):
+            module.running_mean.uniform_(-0.5, 0.5, generator=generator)
+            module.running_var.uniform_(0.5, 2.0, generator=generator)
+    return model
+
+
+def inputs(modality, batch_size, seed=0):
+    shape = model_module.warmup_inputs()[modality].shape[1:]
+    return torch.randn(batch_size, *shape, generator=torch.Generator().manual_seed(seed))
+
+
+def latency_ms(model, x, repeats, warmup):
+    timings = []
+    with torch.no_grad():
+        for i in range(warmup + repeats):
+            started = time.perf_counter()
+            model(x)
+            if i >= warmup:
+                timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def parity(reference, candidate, modality, samples):
+    """(max |delta stego probability|, share of matching verdicts) over `samples` single inputs."""
+    worst, same = 0.0, 0
+    with torch.no_grad():
+        for seed in range(samples):
+            x = inputs(modality, 1, seed=1000 + seed)
+            expected = torch.softmax(reference(x), dim=1)[0]
+            actual = torch.softmax(candidate(x).float(), dim=1)[0]
+            worst = max(worst, abs(expected[1] - actual[1]).item())
+            same += int(expected.argmax() == actual.argmax())
+    return worst, same / samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", nargs="+", choices=list(MODELS), default=list(MODELS))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=3, help="untimed forwards; jit needs a few to fuse")
+    parser.add_argument("--samples", type=int, default=16, help="random inputs for the parity check")
+    parser.add_argument("--bf16", choices=["auto", "on", "off"], default="auto")
+    parser.add_argument("--checkpoints", action="store_true", help="load the configured checkpoints, not random weights")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")  # tracing warns about shape-derived Python values it records as constants
+    torch.set_num_threads(args.threads)
+    bf16 = cpu_optimize.use_bf16(args.bf16)
+    print(f"🧮 {args.threads} thread(s), native bf16: {cpu_optimize.bf16_supported()}")
+
+    results = []
+    print(f"{'model':>9} | {'variant':>10} | {'batch':>5} | {'ms':>8} | {'speedup':>7} | "
+          f"{'max dP':>8} | {'verdicts':>8}")
+    for name in args.models:
+        modality = MODELS[name][0]
+        reference = reference_model(name, args.checkpoints)
+        # Clips are long already; batch 1 is how the video model is served
+        batch_sizes = [1] if modality == "video" else args.batch_sizes
+        baseline = {}
+        for variant, level, wants_bf16 in VARIANTS:
+            if wants_bf16 and not bf16:
+                continue
+            candidate = cpu_optimize.optimize_model(copy.deepcopy(reference), modality, level, wants_bf16)
+            drift, agreement = parity(reference, candidate, modality, args.samples)
+            for batch_size in batch_sizes:
+                x = inputs(modality, batch_size)
+                elapsed = latency_ms(candidate, x, args.repeats, args.warmup)
+                baseline.setdefault(batch_size, elapsed)
+                speedup = baseline[batch_size] / elapsed
+                results.append({"model": name, "variant": variant, "batch_size": batch_size, "ms": elapsed,
+                                "speedup": speedup, "max_prob_delta": drift, "verdict_agreement": agreement})
+                print(f"{name:>9} | {variant:>10} | {batch_size:>5} | {elapsed:>8.1f} | {speedup:>6.2f}x | "
+                      f"{drift:>8.1e} | {agreement:>7.0%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"threads": args.threads, "checkpoints": args.checkpoints, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Decode throughput: media_decode's ffmpeg pipe against the libraries it replaces, on synthetic clips.
+
+  pcm          22.05 kHz mono PCM of an audio file
+                 ffmpeg-pipe   media_decode.iter_pcm() from the path
+                 ffmpeg-mem    the same from an in-memory upload (memfd, no temp file)
+                 librosa       librosa.load(sr=22050)
+  frames       every frame of a video at 224x224 RGB
+                 ffmpeg-pipe   media_decode.iter_frames()
+                 opencv        cv2.VideoCapture + resize + cvtColor
+  sample       10 frames spread over the clip, the model input
+                 ffmpeg-pipe   media_decode.sample_frames() from an in-memory upload
+                 opencv        frame_sampler.sample_frames() after copying the upload to a temp file
+
+Run from backend/:  python benchmarks/decoding.py [--seconds 10 60] [--json results.json]
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import media_decode  # noqa: E402
+from frame_sampler import sample_frames  # noqa: E402
+from media_decode import FFMPEG_PATH, local_copy  # noqa: E402
+from werkzeug.datastructures import FileStorage  # noqa: E402
+
+
+def write_clip(path, seconds, fps=25, size=(640, 360)):
+    """Test pattern with a tone, encoded the way phone uploads usually are (H.264 + AAC in MP4)."""
+    width, height = size
+    subprocess.run([
+        FFMPEG_PATH, "-nostdin", "-v", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=duration={seconds}:size={width}x{height}:rate={fps}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}:sample_rate=44100",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", path,
+    ], check=True)
+
+
+def write_audio(path, seconds):
+    subprocess.run([
+        FFMPEG_PATH, "-nostdin", "-v", "error", "-y",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}:sample_rate=44100", path,
+    ], check=True)
+
+
+def upload(path):
+    with open(path, "rb") as f:
+        return FileStorage(stream=io.BytesIO(f.read()), filename=os.path.basename(path))
+
+
+def pcm_ffmpeg(source):
+    return sum(len(chunk) for chunk in media_decode.iter_pcm(source, 22050))
+
+
+def pcm_librosa(path):
+    import librosa
+    return len(librosa.load(path, sr=22050)[0])
+
+
+def frames_ffmpeg(path):
+    return sum(1 for _ in media_decode.iter_frames(path, (224, 224)))
+
+
+def frames_opencv(path):
+    cap = cv2.VideoCapture(path)
+    count = 0
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        cv2.cvtColor(cv2.resize(frame, (224, 224)), cv2.COLOR_BGR2RGB)
+        count += 1
+    cap.release()
+    return count
+
+
+def sample_ffmpeg(path):
+    return media_decode.sample_frames(upload(path), 10, (224, 224))
+
+
+def sample_opencv(path):
+    copy, temporary = local_copy(upload(path))
+    try:
+        return sample_frames(copy, 10, (224, 224))
+    finally:
+        if temporary:
+            os.unlink(copy)
+
+
+def best_of(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, nargs="+", default=[10, 60])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'clip':>6} | {'case':>12} | {'method':>11} | {'seconds':>8} | {'x realtime':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for seconds in args.seconds:
+            video = os.path.join(tmp, f"clip_{seconds:g}s.mp4")
+            audio = os.path.join(tmp, f"tone_{seconds:g}s.wav")
+            write_clip(video, seconds)
+            write_audio(audio, seconds)
+
+            cases = {
+                "pcm": {
+                    "ffmpeg-pipe": lambda: pcm_ffmpeg(audio),
+                    "ffmpeg-mem": lambda: pcm_ffmpeg(upload(audio)),
+                    "librosa": lambda: pcm_librosa(audio),
+                },
+                "frames": {"ffmpeg-pipe": lambda: frames_ffmpeg(video), "opencv": lambda: frames_opencv(video)},
+                "sample": {"ffmpeg-pipe": lambda: sample_ffmpeg(video), "opencv": lambda: sample_opencv(video)},
+            }
+            for case, methods in cases.items():
+                for method, fn in methods.items():
+                    elapsed = best_of(fn, args.repeats)
+                    results.append({"clip_seconds": seconds, "case": case, "method": method, "seconds": elapsed,
+                                    "realtime_factor": seconds / elapsed})
+                    print(f"{seconds:>5g}s | {case:>12} | {method:>11} | {elapsed:>8.3f} | {seconds / elapsed:>9.1f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
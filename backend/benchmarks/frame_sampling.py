@@ -0,0 +1,103 @@
+"""Frame decode cost: seek-based sampling vs sequential decode, on synthetic 1- and 10-minute clips.
+
+Compares three ways of getting 10 frames out of a clip:
+  first-n     the old dataset behaviour, the first 10 frames read sequentially (cheap, but only
+              covers the first fraction of a second)
+  sequential  decode the whole clip and keep 10 evenly spaced frames (same coverage as the sampler)
+  sampler     frame_sampler.sample_frames(), seeking to the 10 segment centres
+
+Run from backend/:  python benchmarks/frame_sampling.py [--minutes 1 10] [--json results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from frame_sampler import sample_frames, sample_indices, read_first_frames  # noqa: E402
+
+
+def write_clip(path, minutes, fps, size):
+    """Moving gradient so every frame differs and the encoder produces real P-frames."""
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    ramp = np.add.outer(np.arange(height), np.arange(width)).astype(np.uint16)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    for i in range(int(minutes * 60 * fps)):
+        frame[:, :, 0] = (ramp + i) % 256
+        frame[:, :, 1] = (ramp * 2 + i * 3) % 256
+        frame[:, :, 2] = (i * 5) % 256
+        writer.write(frame)
+    writer.release()
+
+
+def decode_sequential(path, num_frames, size):
+    cap = cv2.VideoCapture(path)
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    wanted = set(sample_indices(count, num_frames).tolist())
+    frames = []
+    index = 0
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if index in wanted:
+            frames.append(cv2.cvtColor(cv2.resize(frame, size), cv2.COLOR_BGR2RGB))
+        index += 1
+    cap.release()
+    return frames
+
+
+def timed(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 10])
+    parser.add_argument("--fps", type=float, default=25)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--num-frames", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    size = (224, 224)
+    results = []
+    print(f"{'clip':>8} | {'method':>10} | {'seconds':>8} | {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for minutes in args.minutes:
+            path = os.path.join(tmp, f"clip_{minutes:g}min.mp4")
+            write_clip(path, minutes, args.fps, (args.width, args.height))
+
+            timings = {
+                "first-n": timed(lambda: read_first_frames(path, args.num_frames, size), args.repeats),
+                "sequential": timed(lambda: decode_sequential(path, args.num_frames, size), 1),
+                "sampler": timed(lambda: sample_frames(path, args.num_frames, size), args.repeats),
+            }
+            for method, seconds in timings.items():
+                speedup = timings["sequential"] / seconds
+                results.append({"minutes": minutes, "method": method, "seconds": seconds,
+                                "speedup_vs_sequential": speedup})
+                print(f"{minutes:>6g}m | {method:>10} | {seconds:>8.3f} | {speedup:>7.1f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+"""Detection hot path benchmarks: preprocessing, forward passes, predict() and model loading.
+
+Fixtures are generated on the fly: synthetic clean images, clips and recordings, and
+stego copies made with the injection functions in dataset_prep/injectPayload, so no
+dataset is needed. Models get random weights unless --checkpoints is given, which
+serves the checkpoints configured through IMAGE_MODEL_PATH / AUDIO_MODEL_PATH /
+VIDEO_MODEL_PATH instead (accuracy does not matter here, only the work done).
+
+Cases:
+  preprocess/<modality>           upload -> model input tensor
+  forward/<modality>/b<n>         one forward pass at batch size n
+  predict/<modality>/<fixture>    predict() on a spooled upload, as /upload calls it
+  statistics/image/<fixture>      the statistical prefilter alone, on the decoded image
+  predict/image/<fixture>/cnn_only, predict/image/<fixture>/stat_filter
+                                  predict() with the prefilter forced off and on, whatever STAT_FILTER_ENABLED says
+  load/<modality>, load/all       checkpoint -> model ready to serve
+
+Run from backend/:
+  python benchmarks/hot_path.py run --output results.json [--modalities image audio] [--batch-sizes 1 8 32]
+  python benchmarks/hot_path.py compare baseline.json results.json [--threshold 0.1]
+
+`compare` exits with status 1 when any case got slower than the baseline by more than
+--threshold (relative) and --min-delta-ms (absolute), so it can gate CI. Only compare
+results taken on the same machine with the same thread count.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INJECT_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "dataset_prep", "injectPayload")
+sys.path.insert(0, BACKEND_DIR)
+for _modality in ("image", "audio", "video"):
+    sys.path.insert(0, os.path.join(INJECT_DIR, _modality))
+
+MODALITIES = ("image", "audio", "video")
+FORMAT_VERSION = 1
+
+
+# --------------------- FIXTURES ---------------------
+
+def synthetic_image(width, height, rng):
+    """Smooth gradients plus mild sensor-like noise; flat synthetic images are unrealistically easy to compress."""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.stack([
+        128 + 100 * np.sin(x / 37.0) * np.cos(y / 53.0),
+        128 + 90 * np.cos((x + y) / 71.0),
+        128 + 80 * np.sin(y / 29.0),
+    ], axis=-1)
+    image += rng.normal(0, 4, image.shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def write_wav(path, samples, sample_rate):
+    with wave.open(path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        out.writeframes(samples.astype(np.int16).tobytes())
+
+
+def synthetic_audio(seconds, sample_rate, rng):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    tone = 6000 * np.sin(2 * np.pi * 220 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 0.5 * t))
+    tone += 2000 * np.sin(2 * np.pi * 1375 * t)
+    return tone + rng.normal(0, 300, t.shape)
+
+
+def synthetic_clip(seconds, fps, width, height):
+    frames = []
+    ramp = np.add.outer(np.arange(height), np.arange(width)).astype(np.uint16)
+    for i in range(int(seconds * fps)):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[:, :, 0] = (ramp + i) % 256
+        frame[:, :, 1] = (ramp * 2 + i * 3) % 256
+        frame[:, :, 2] = (i * 5) % 256
+        frames.append(frame)
+    return frames
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def build_fixtures(directory, modalities, args, rng):
+    """Returns ({modality: {fixture name: (filename, bytes)}}, [fixtures skipped and why])."""
+    fixtures = {}
+    skipped = []
+    quiet = contextlib.redirect_stdout(io.StringIO())  # the injection functions print per file
+
+    if "image" in modalities:
+        from inject_payload_img import embed_lsb, embed_noise
+        clean = synthetic_image(args.image_width, args.image_height, rng)
+        images = {"clean": clean, "lsb": embed_lsb(clean.copy(), rng.integers(0, 255, 512, dtype=np.uint8))}
+        try:
+            images["noise"] = embed_noise(clean.copy())
+        except ImportError as e:
+            skipped.append({"fixture": "image/noise", "reason": str(e)})
+        fixtures["image"] = {name: (f"{name}.png", cv2.imencode(".png", image)[1].tobytes())
+                             for name, image in images.items()}
+
+    if "audio" in modalities:
+        from inject_payload_audio import embed_text_lsb, embed_noise, TEXT_PAYLOAD
+        sample_rate = 22050
+        clean_path = os.path.join(directory, "clean.wav")
+        write_wav(clean_path, synthetic_audio(args.audio_seconds, sample_rate, rng), sample_rate)
+        with quiet:
+            embed_text_lsb(clean_path, os.path.join(directory, "text_lsb.wav"), TEXT_PAYLOAD)
+            embed_noise(clean_path, os.path.join(directory, "noise.wav"))
+        fixtures["audio"] = {name: (f"{name}.wav", _read(os.path.join(directory, f"{name}.wav")))
+                             for name in ("clean", "text_lsb", "noise")}
+
+    if "video" in modalities:
+        from inject_payload_video import save_video_with_audio, embed_noise, embed_frame_manipulation
+        frames = synthetic_clip(args.video_seconds, 25, args.video_width, args.video_height)
+        clips = {"clean": frames, "noise": embed_noise(frames), "frame_manipulation": embed_frame_manipulation(frames)}
+        fixtures["video"] = {}
+        for name, clip in clips.items():
+            path = os.path.join(directory, f"{name}.mp4")
+            with quiet:
+                save_video_with_audio(clip, path, os.path.join(directory, "no_soundtrack.wav"), 25)
+            fixtures["video"][name] = (f"{name}.mp4", _read(path))
+    return fixtures, skipped
+
+
+def write_random_checkpoints(directory, modalities):
+    """Random-weight checkpoints in the layout load_model() expects, exported through the env before model is imported."""
+    import torch
+
+    for modality in MODALITIES:
+        os.environ[f"{modality.upper()}_MODEL_PATH"] = os.path.join(directory, f"{modality}.pth")
+    from model import ImageStegoCNN, ResNet34Audio, VideoStegoModel  # reads the paths above on import
+
+    factories = {"image": lambda: ImageStegoCNN(pretrained=False), "audio": ResNet34Audio,
+                 "video": lambda: VideoStegoModel(pretrained=False)}
+    for modality in MODALITIES:
+        # Missing checkpoints just disable a modality, but the image model is always required
+        if modality in modalities or modality == "image":
+            torch.save(factories[modality]().state_dict(), os.environ[f"{modality.upper()}_MODEL_PATH"])
+
+
+# --------------------- MEASUREMENT ---------------------
+
+def measure(fn, setup=None, teardown=None, repeats=5, warmup=1, max_seconds=30.0):
+    """Times fn(setup()) `repeats` times after `warmup` untimed calls; stops early once max_seconds have been spent."""
+    timings = []
+    budget_started = time.perf_counter()
+    for i in range(warmup + repeats):
+        arg = setup() if setup else None
+        try:
+            started = time.perf_counter()
+            fn(arg) if setup else fn()
+            elapsed = time.perf_counter() - started
+        finally:
+            if teardown:
+                teardown(arg)
+        if i >= warmup:
+            timings.append(elapsed)
+            if time.perf_counter() - budget_started > max_seconds:
+                break
+    ms = [t * 1000.0 for t in timings]
+    return {
+        "median_ms": round(statistics.median(ms), 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "min_ms": round(min(ms), 3),
+        "max_ms": round(max(ms), 3),
+        "stdev_ms": round(statistics.stdev(ms), 3) if len(ms) > 1 else 0.0,
+        "runs": len(ms),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# --------------------- RUN ---------------------
+
+def run(args):
+    rng = np.random.default_rng(args.seed)
+    modalities = tuple(args.modalities)
+    with tempfile.TemporaryDirectory(prefix="stegoshield-bench-") as tmp:
+        if not args.checkpoints:
+            write_random_checkpoints(tmp, modalities)
+        os.environ.setdefault("INFERENCE_BACKEND", "torch")
+
+        import torch
+        torch.manual_seed(args.seed)
+        if args.threads:
+            torch.set_num_threads(args.threads)
+
+        import model as model_module
+        from ingest import UploadSpool
+        from werkzeug.datastructures import FileStorage
+
+        print("🔹 Building fixtures...")
+        fixtures, skipped = build_fixtures(tmp, modalities, args, rng)
+        for entry in skipped:
+            print(f"⚠️ Skipping fixture {entry['fixture']}: {entry['reason']}")
+
+        results = {}
+
+        def record(name, stats):
+            results[name] = stats
+            print(f"{name:<36} {stats['median_ms']:>10.2f} ms  (min {stats['min_ms']:.2f}, runs {stats['runs']})")
+
+        def options(**overrides):
+            return {"repeats": args.repeats, "warmup": args.warmup, "max_seconds": args.max_seconds, **overrides}
+
+        # Each timed call gets a fresh spooled upload, the object predict() sees behind IngestRequest
+        def spooled(filename, data):
+            def setup():
+                spool = UploadSpool(max_bytes=len(data) + 1)
+                spool.write(data)
+                spool.seek(0)
+                return FileStorage(stream=spool, filename=filename)
+            return setup
+
+        def close(file):
+            file.stream.close()
+
+        # 🔹 Model loading
+        loaders = {"image": model_module.load_image_model,
+                   "audio": lambda: model_module.load_audio_model(model_module.AUDIO_MODEL_PATH),
+                   "video": lambda: model_module.load_video_model(model_module.VIDEO_MODEL_PATH)}
+        for modality in modalities:
+            record(f"load/{modality}", measure(loaders[modality], **options(warmup=0, repeats=min(args.repeats, 3))))
+        record("load/all", measure(model_module.load_model, **options(warmup=0, repeats=min(args.repeats, 3))))
+        models = model_module.load_model()
+
+        # 🔹 Preprocessing
+        preprocessors = {"image": model_module.preprocess_image, "audio": model_module.preprocess_audio,
+                         "video": model_module.preprocess_video}
+        for modality in modalities:
+            filename, data = fixtures[modality]["clean"]
+            record(f"preprocess/{modality}", measure(preprocessors[modality], setup=spooled(filename, data),
+                                                     teardown=close, **options()))
+        if "image" in modalities:
+            filename, data = fixtures["image"]["clean"]
+            record("preprocess/image_tiles", measure(model_module.preprocess_image_tiles,
+                                                     setup=spooled(filename, data), teardown=close, **options()))
+
+        # 🔹 Forward passes
+        input_shapes = {"image": (3, 224, 224), "audio": (1, 128, 300),
+                        "video": (model_module.VIDEO_NUM_FRAMES, 3, 224, 224)}
+        for modality in modalities:
+            if modality not in models:
+                continue
+            for batch_size in args.batch_sizes:
+                inputs = torch.rand((batch_size,) + input_shapes[modality])
+
+                def forward(net=models[modality], x=inputs):
+                    with torch.no_grad():
+                        net(x)
+                record(f"forward/{modality}/b{batch_size}", measure(forward, **options()))
+
+        # 🔹 End-to-end predict()
+        for modality in modalities:
+            for name, (filename, data) in fixtures[modality].items():
+                record(f"predict/{modality}/{name}", measure(lambda f: model_module.predict(f, models),
+                                                             setup=spooled(filename, data), teardown=close,
+                                                             **options()))
+
+        # 🔹 Statistical prefilter: its own cost, and predict() with and without it in front of the CNN
+        if "image" in modalities:
+            from stat_filter import prefilter
+            default_enabled = model_module.STAT_FILTER_ENABLED
+            for name, (filename, data) in fixtures["image"].items():
+                pixels = np.asarray(model_module.open_image(io.BytesIO(data)))
+                record(f"statistics/image/{name}", measure(lambda: prefilter.check(pixels), **options()))
+                for case, enabled in (("cnn_only", False), ("stat_filter", True)):
+                    model_module.STAT_FILTER_ENABLED = enabled
+                    record(f"predict/image/{name}/{case}", measure(lambda f: model_module.predict(f, models),
+                                                                   setup=spooled(filename, data), teardown=close,
+                                                                   **options()))
+            model_module.STAT_FILTER_ENABLED = default_enabled
+
+    report = {
+        "format": FORMAT_VERSION,
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor() or None,
+            "cpu_count": os.cpu_count(),
+            "torch_threads": torch.get_num_threads(),
+            "weights": "checkpoints" if args.checkpoints else "random",
+            "stat_filter": model_module.STAT_FILTER_ENABLED,
+            "image_analysis_mode": model_module.IMAGE_ANALYSIS_MODE,
+            "fixtures": {
+                "image": [args.image_width, args.image_height],
+                "audio_seconds": args.audio_seconds,
+                "video": [args.video_width, args.video_height, args.video_seconds],
+            },
+            "skipped_fixtures": skipped,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+    return 0
+
+
+# --------------------- COMPARE ---------------------
+
+def compare_reports(baseline, current, threshold, min_delta_ms, metric="median_ms"):
+    """Returns rows of (case, baseline ms, current ms, relative change, status) plus the meta keys that differ."""
+    rows = []
+    for name in sorted(set(baseline["results"]) | set(current["results"])):
+        before = baseline["results"].get(name)
+        after = current["results"].get(name)
+        if before is None or after is None:
+            rows.append((name, before and before[metric], after and after[metric], None,
+                         "new" if before is None else "missing"))
+            continue
+        delta = after[metric] - before[metric]
+        change = delta / before[metric] if before[metric] else 0.0
+        if change > threshold and delta > min_delta_ms:
+            status = "REGRESSION"
+        elif change < -threshold and -delta > min_delta_ms:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append((name, before[metric], after[metric], change, status))
+
+    differing = [key for key in ("machine", "cpu_count", "torch_threads", "torch", "weights", "stat_filter",
+                                 "image_analysis_mode", "fixtures")
+                 if baseline["meta"].get(key) != current["meta"].get(key)]
+    return rows, differing
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows, differing = compare_reports(baseline, current, args.threshold, args.min_delta_ms, args.metric)
+    for key in differing:
+        print(f"⚠️ {key} differs: baseline {baseline['meta'].get(key)!r}, current {current['meta'].get(key)!r}")
+
+    print(f"{'case':<36} {'baseline':>11} {'current':>11} {'change':>8}  status")
+    for name, before, after, change, status in rows:
+        before_text = f"{before:.2f}" if before is not None else "-"
+        after_text = f"{after:.2f}" if after is not None else "-"
+        change_text = f"{change * 100:+.1f}%" if change is not None else "-"
+        print(f"{name:<36} {before_text:>11} {after_text:>11} {change_text:>8}  {status}")
+
+    regressions = [row for row in rows if row[4] == "REGRESSION"]
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "baseline": args.baseline, "current": args.current, "metric": args.metric,
+                "threshold": args.threshold, "min_delta_ms": args.min_delta_ms, "meta_differs": differing,
+                "cases": [{"case": n, "baseline_ms": b, "current_ms": a, "change": c, "status": s}
+                          for n, b, a, c, s in rows],
+            }, f, indent=2)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) beyond {args.threshold * 100:.0f}% and {args.min_delta_ms} ms")
+        return 1
+    print("✅ No regressions")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks and write JSON results")
+    run_parser.add_argument("--output", help="write the results to this JSON file")
+    run_parser.add_argument("--modalities", nargs="+", choices=MODALITIES, default=list(MODALITIES))
+    run_parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    run_parser.add_argument("--repeats", type=int, default=5)
+    run_parser.add_argument("--warmup", type=int, default=1)
+    run_parser.add_argument("--max-seconds", type=float, default=30.0, help="time budget per case; at least one run")
+    run_parser.add_argument("--threads", type=int, help="torch intra-op threads (default: torch's own)")
+    run_parser.add_argument("--checkpoints", action="store_true", help="load the configured checkpoints")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--image-width", type=int, default=1024)
+    run_parser.add_argument("--image-height", type=int, default=768)
+    run_parser.add_argument("--audio-seconds", type=float, default=10.0)
+    run_parser.add_argument("--video-seconds", type=float, default=4.0)
+    run_parser.add_argument("--video-width", type=int, default=640)
+    run_parser.add_argument("--video-height", type=int, default=360)
+
+    compare_parser = commands.add_parser("compare", help="flag regressions against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown that fails")
+    compare_parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore smaller absolute changes")
+    compare_parser.add_argument("--metric", default="median_ms", choices=["median_ms", "mean_ms", "min_ms"])
+    compare_parser.add_argument("--json", help="also write the comparison to this file")
+
+    args = parser.parse_args()
+    return run(args) if args.command == "run" else compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,400 @@
+"""Offline load test: drives login, upload and history traffic at app.py and reports latency per route.
+
+By default the app is booted in this process against the stand-ins in
+offline_services.py (SQLite for Postgres, local files for Cloudinary, a fake Firebase
+token verifier, a null SMTP sink), with random-weight models, and served by waitress
+on a free local port. Virtual users each sign up once, log in, then pick actions from
+--mix until --duration runs out.
+
+In-process runs share the GIL with the load generator. For numbers that only reflect
+the server, boot it on its own and point `run` at it:
+
+  python benchmarks/load_test.py serve --port 8001
+  python benchmarks/load_test.py run --url http://127.0.0.1:8001 --concurrency 16 --duration 60
+
+Run from backend/:
+  python benchmarks/load_test.py run [--concurrency 8] [--duration 30] [--mix login=1,upload=4,history=6]
+                                     [--output report.json]
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import types
+import uuid
+from urllib.parse import urlsplit
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+import offline_services  # noqa: E402
+from hot_path import build_fixtures, write_random_checkpoints  # noqa: E402
+
+ACTIONS = ("login", "google_login", "upload", "history", "password_reset")
+DEFAULT_MIX = "login=1,google_login=1,upload=4,history=6"
+PASSWORD = "load-test-password"
+
+
+# --------------------- BOOTING THE APP ---------------------
+
+def boot_app(workdir, args):
+    """Imports app.py against the offline stand-ins and loads the models; returns the app module."""
+    offline_services.install(workdir)
+    os.environ["WAITRESS_THREADS"] = str(args.server_threads)  # admission control keeps threads free relative to this
+    if not args.checkpoints:
+        os.makedirs(os.path.join(workdir, "models"), exist_ok=True)
+        write_random_checkpoints(os.path.join(workdir, "models"), tuple(args.modalities))
+    os.chdir(workdir)  # app.py writes firebase_config.json and its queue/storage dirs relative to the cwd
+
+    import app as app_module
+    app_module.app.config["SESSION_COOKIE_SECURE"] = False  # plain HTTP on localhost
+    app_module.ensure_model_loaded()
+    return app_module
+
+
+def start_server(app, threads):
+    from waitress import create_server
+    server = create_server(app, host="127.0.0.1", port=0, threads=threads)
+    thread = threading.Thread(target=server.run, name="waitress", daemon=True)
+    thread.start()
+    return f"http://127.0.0.1:{server.effective_port}"  # daemon thread: it goes away with the process
+
+
+# --------------------- HTTP CLIENT ---------------------
+
+class Client:
+    """One keep-alive connection and session cookie per virtual user."""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.https = parts.scheme == "https"
+        self.timeout = timeout
+        self.cookie = None
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            factory = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._conn = factory(self.host, self.port, timeout=self.timeout)
+        return self._conn
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        try:
+            conn = self._connection()
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()  # the next request reconnects
+            raise
+        for name, value in response.getheaders():
+            if name.lower() == "set-cookie" and value.startswith("session="):
+                self.cookie = value.split(";", 1)[0]
+        return response.status, payload
+
+    def post_json(self, path, data):
+        return self.request("POST", path, json.dumps(data).encode(), {"Content-Type": "application/json"})
+
+    def post_file(self, path, field, filename, data):
+        boundary = uuid.uuid4().hex
+        body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+                f"Content-Type: application/octet-stream\r\n\r\n").encode() + data + f"\r\n--{boundary}--\r\n".encode()
+        return self.request("POST", path, body, {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+# --------------------- VIRTUAL USERS ---------------------
+
+class Recorder:
+    def __init__(self, warmup_until):
+        self.warmup_until = warmup_until
+        self.samples = {}  # route -> [(finished_at, seconds, status)]; status None when the connection failed
+        self._lock = threading.Lock()
+
+    def record(self, route, started, status):
+        finished = time.perf_counter()
+        if finished < self.warmup_until:
+            return
+        with self._lock:
+            self.samples.setdefault(route, []).append((finished, finished - started, status))
+
+
+class VirtualUser:
+    def __init__(self, index, base_url, fixtures, args, recorder):
+        self.index = index
+        self.email = f"loadtest-{args.run_id}-{index}@example.com"
+        self.client = Client(base_url, args.timeout)
+        self.fixtures = fixtures
+        self.args = args
+        self.recorder = recorder
+        self.rng = random.Random(args.seed * 1000 + index)
+        self.user_id = None
+        self.sent = []  # uploads already sent once, for repeat traffic that hits the result cache
+
+    def call(self, route, fn):
+        started = time.perf_counter()
+        try:
+            status, payload = fn()
+        except (OSError, http.client.HTTPException):
+            self.recorder.record(route, started, None)
+            return None, None
+        self.recorder.record(route, started, status)
+        return status, payload
+
+    def signup(self):
+        status, payload = self.client.post_json("/signup", {"name": f"Load Test {self.index}", "email": self.email,
+                                                            "password": PASSWORD})
+        if status not in (200, 400):  # 400: already registered by an earlier run against the same server
+            raise RuntimeError(f"Signup failed with {status}: {payload[:200]!r}")
+
+    def login(self):
+        status, payload = self.call("POST /login", lambda: self.client.post_json(
+            "/login", {"email": self.email, "password": PASSWORD}))
+        if status == 200:
+            self.user_id = json.loads(payload)["user"]["id"]
+
+    def google_login(self):
+        token = offline_services.make_id_token(f"google-{self.email}", name=f"Google Load Test {self.index}")
+        self.call("POST /google-login", lambda: self.client.post_json("/google-login", {"idToken": token}))
+        self.login()  # back to the email account, whose history the other actions use
+
+    def upload(self):
+        if self.sent and self.rng.random() < self.args.repeat_fraction:
+            filename, data = self.rng.choice(self.sent)
+        else:
+            modality = self.rng.choice(sorted(self.fixtures))
+            name, (filename, data) = self.rng.choice(sorted(self.fixtures[modality].items()))
+            # Trailing bytes make the content hash unique without changing what the decoders see
+            data = data + os.urandom(16)
+            filename = f"{self.index}-{len(self.sent)}-{filename}"
+            self.sent.append((filename, data))
+        self.call("POST /upload", lambda: self.client.post_file("/upload", "file", filename, data))
+
+    def history(self):
+        self.call("GET /api/history", lambda: self.client.request("GET", f"/api/history?user_id={self.user_id}"))
+
+    def password_reset(self):
+        self.call("POST /api/send-otp", lambda: self.client.post_json("/api/send-otp", {"email": self.email}))
+
+    def run(self, mix, deadline):
+        self.login()
+        actions, weights = zip(*mix.items())
+        while time.perf_counter() < deadline:
+            getattr(self, self.rng.choices(actions, weights)[0])()
+            if self.args.think_ms:
+                time.sleep(self.rng.expovariate(1000.0 / self.args.think_ms))
+        self.client.close()
+
+
+# --------------------- REPORT ---------------------
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(q / 100.0 * len(sorted_values) + 0.5 - 1e-9)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarise(samples, window):
+    routes = {}
+    everything = []
+    for route, entries in sorted(samples.items()):
+        latencies = sorted(seconds * 1000.0 for _, seconds, _ in entries)
+        everything.extend(latencies)
+        errors = sum(1 for _, _, status in entries if status is None or not 200 <= status < 300)
+        statuses = {}
+        for _, _, status in entries:
+            statuses[str(status or "failed")] = statuses.get(str(status or "failed"), 0) + 1
+        routes[route] = {
+            "requests": len(entries),
+            "errors": errors,
+            "statuses": dict(sorted(statuses.items())),
+            "error_rate": round(errors / len(entries), 4),
+            "throughput_rps": round(len(entries) / window, 2),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "mean_ms": round(sum(latencies) / len(latencies), 2),
+            "max_ms": round(latencies[-1], 2),
+        }
+    everything.sort()
+    total = {
+        "requests": len(everything),
+        "errors": sum(r["errors"] for r in routes.values()),
+        "throughput_rps": round(len(everything) / window, 2),
+        "p50_ms": round(percentile(everything, 50), 2),
+        "p95_ms": round(percentile(everything, 95), 2),
+        "p99_ms": round(percentile(everything, 99), 2),
+    }
+    return routes, total
+
+
+def print_report(routes, total, window):
+    print(f"\n📊 {total['requests']} requests in {window:.1f}s ({total['throughput_rps']} req/s), "
+          f"{total['errors']} errors")
+    print(f"{'route':<22} {'reqs':>7} {'err':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+          f"  statuses")
+    for route, r in routes.items():
+        statuses = " ".join(f"{code}:{count}" for code, count in r["statuses"].items())
+        print(f"{route:<22} {r['requests']:>7} {r['errors']:>5} {r['throughput_rps']:>8} {r['p50_ms']:>9} "
+              f"{r['p95_ms']:>9} {r['p99_ms']:>9} {r['max_ms']:>9}  {statuses}")
+
+
+# --------------------- COMMANDS ---------------------
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        action, _, weight = part.partition("=")
+        action = action.strip()
+        if action not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"unknown action {action!r}; choose from {', '.join(ACTIONS)}")
+        mix[action] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("the mix needs at least one action with a positive weight")
+    return {action: weight for action, weight in mix.items() if weight > 0}
+
+
+def fixture_options(args):
+    return types.SimpleNamespace(image_width=args.image_width, image_height=args.image_height,
+                                 audio_seconds=args.audio_seconds, video_seconds=4.0, video_width=640, video_height=360)
+
+
+def run(args):
+    args.run_id = uuid.uuid4().hex[:8]
+    workdir = args.workdir or tempfile.mkdtemp(prefix="stegoshield-load-")
+    app_module = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        print(f"🔹 Booting app against offline stand-ins in {workdir}")
+        app_module = boot_app(workdir, args)
+        base_url = start_server(app_module.app, args.server_threads)
+
+    import numpy as np
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures, skipped = build_fixtures(tmp, tuple(args.modalities), fixture_options(args),
+                                           np.random.default_rng(args.seed))
+
+    recorder = Recorder(warmup_until=0)
+    users = [VirtualUser(i, base_url, fixtures, args, recorder) for i in range(args.concurrency)]
+    print(f"🔹 Signing up {len(users)} virtual users at {base_url}")
+    for user in users:
+        user.signup()
+
+    print(f"🚀 {args.concurrency} users for {args.duration:g}s (+{args.warmup:g}s warm-up), mix {args.mix}")
+    started = time.perf_counter()
+    recorder.warmup_until = started + args.warmup
+    deadline = recorder.warmup_until + args.duration
+    threads = [threading.Thread(target=user.run, args=(args.mix, deadline), name=f"vu-{user.index}", daemon=True)
+               for user in users]
+    quiet = contextlib.redirect_stdout(io.StringIO()) if app_module is not None and not args.verbose \
+        else contextlib.nullcontext()
+    with quiet:  # app.py prints on every request
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    window = max(1e-9, time.perf_counter() - recorder.warmup_until)
+
+    routes, total = summarise(recorder.samples, window)
+    print_report(routes, total, window)
+
+    report = {
+        "meta": {
+            "target": args.url or "in-process",
+            "concurrency": args.concurrency,
+            "duration_s": round(window, 2),
+            "warmup_s": args.warmup,
+            "mix": args.mix,
+            "think_ms": args.think_ms,
+            "repeat_fraction": args.repeat_fraction,
+            "modalities": list(args.modalities),
+            "server_threads": args.server_threads if app_module is not None else None,
+            "weights": "checkpoints" if args.checkpoints else "random",
+            "skipped_fixtures": skipped,
+            "cpu_count": os.cpu_count(),
+        },
+        "routes": routes,
+        "total": total,
+    }
+    if app_module is not None:
+        report["services"] = offline_services.stats()
+        report["admission"] = app_module.admission.stats()
+        report["storage"] = app_module.uploader.stats()
+        report["cache"] = app_module.prediction_cache.stats() if app_module.prediction_cache is not None else None
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"✅ Report written to {args.output}")
+    return 0
+
+
+def serve(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix="stegoshield-load-")
+    print(f"🔹 Booting app against offline stand-ins in {workdir}")
+    app_module = boot_app(workdir, args)
+    from waitress import serve as waitress_serve
+    print(f"🚀 Serving on http://{args.host}:{args.port}")
+    waitress_serve(app_module.app, host=args.host, port=args.port, threads=args.server_threads)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def app_options(p):
+        p.add_argument("--workdir", help="where the stand-ins keep their state (default: a new temp dir)")
+        p.add_argument("--server-threads", type=int, default=8, help="waitress worker threads")
+        p.add_argument("--checkpoints", action="store_true", help="load the configured checkpoints, not random weights")
+        p.add_argument("--modalities", nargs="+", choices=("image", "audio", "video"), default=["image", "audio"])
+        p.add_argument("--verbose", action="store_true", help="keep the app's per-request output")
+
+    run_parser = commands.add_parser("run", help="generate load and report per-route latency")
+    app_options(run_parser)
+    run_parser.add_argument("--url", help="drive an already running server instead of booting one in-process")
+    run_parser.add_argument("--concurrency", type=int, default=8, help="virtual users")
+    run_parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    run_parser.add_argument("--warmup", type=float, default=5.0, help="seconds of load before measuring")
+    run_parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                            help=f"action weights out of {', '.join(ACTIONS)} (default {DEFAULT_MIX})")
+    run_parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between a user's requests")
+    run_parser.add_argument("--repeat-fraction", type=float, default=0.2,
+                            help="share of uploads that resend bytes the user sent before")
+    run_parser.add_argument("--timeout", type=float, default=120.0)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--image-width", type=int, default=1024)
+    run_parser.add_argument("--image-height", type=int, default=768)
+    run_parser.add_argument("--audio-seconds", type=float, default=10.0)
+    run_parser.add_argument("--output", help="write the report to this JSON file")
+
+    serve_parser = commands.add_parser("serve", help="boot the app against the stand-ins and serve it")
+    app_options(serve_parser)
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8001)
+
+    args = parser.parse_args()
+    return run(args) if args.command == "run" else serve(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
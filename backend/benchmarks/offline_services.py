@@ -0,0 +1,331 @@
+"""Local stand-ins for the services app.py talks to, so it can be booted and load-tested offline.
+
+install() must run before app is imported. It registers fake `psycopg2`, `cloudinary`
+and `firebase_admin` modules and swaps smtplib's SMTP classes for a null sink:
+
+  psycopg2        connect() returns a SQLite connection speaking enough of psycopg2's
+                  dialect for app.py: %s placeholders, `col = ANY(%s)`, RETURNING,
+                  execute_values() and UniqueViolation
+  cloudinary      uploads are written to a local directory
+  firebase_admin  verify_id_token() accepts tokens made by make_id_token()
+  smtplib         messages are counted and dropped
+
+File storage for scans goes through storage.LocalStorage (STORAGE_BACKEND=local).
+"""
+import base64
+import json
+import os
+import re
+import smtplib
+import sqlite3
+import sys
+import threading
+import types
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    email TEXT UNIQUE NOT NULL,
+    password TEXT,
+    is_admin BOOLEAN DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    auth_provider TEXT DEFAULT 'email',
+    google_uid TEXT UNIQUE,
+    avatar TEXT,
+    theme TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT NOT NULL,
+    prediction TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    user_id INTEGER REFERENCES users(id),
+    file_url TEXT,
+    file_size BIGINT,
+    model_version TEXT
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT NOT NULL,
+    filetype TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    file_url TEXT,
+    user_id INTEGER REFERENCES users(id),
+    file_size BIGINT
+);
+"""
+
+_stats_lock = threading.Lock()
+_stats = {"db_connections": 0, "db_statements": 0, "cloudinary_uploads": 0, "firebase_verifications": 0,
+          "emails_sent": 0}
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+# --------------------- POSTGRES (SQLite shim) ---------------------
+
+class Error(Exception):
+    pass
+
+
+class IntegrityError(Error):
+    pass
+
+
+class UniqueViolation(IntegrityError):
+    pass
+
+
+_PLACEHOLDER = re.compile(r"=\s*ANY\(%s\)|%s")
+_WRITE = re.compile(r"^\s*(INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+
+def translate(sql, params):
+    """psycopg2-style SQL and params -> SQLite SQL and params; lists bound to `= ANY(%s)` become IN (...)."""
+    params = list(params or ())
+    out_params = []
+    pieces = []
+    position = 0
+    for index, match in enumerate(_PLACEHOLDER.finditer(sql)):
+        pieces.append(sql[position:match.start()])
+        position = match.end()
+        value = params[index]
+        if match.group(0) == "%s":
+            pieces.append("?")
+            out_params.append(value)
+        elif value:
+            pieces.append("IN (" + ", ".join("?" * len(value)) + ")")
+            out_params.extend(value)
+        else:
+            pieces.append("IN (NULL)")  # ANY of an empty array matches nothing
+    pieces.append(sql[position:])
+    return "".join(pieces), out_params
+
+
+class Cursor:
+    """Buffers every result row on execute, like psycopg2's default client-side cursor."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._rows = []
+        self.rowcount = -1
+
+    def execute(self, sql, params=None):
+        sql, params = translate(sql, params)
+        self.connection._begin_if_writing(sql)
+        _count("db_statements")
+        try:
+            cursor = self.connection._db.execute(sql, params)
+            self._rows = cursor.fetchall()
+            self.rowcount = cursor.rowcount
+        except sqlite3.IntegrityError as e:
+            raise (UniqueViolation if "UNIQUE" in str(e) else IntegrityError)(str(e)) from e
+        except sqlite3.Error as e:
+            raise Error(str(e)) from e
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        self._rows = []
+
+
+class Connection:
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None,
+                                   detect_types=sqlite3.PARSE_DECLTYPES)
+        self._in_transaction = False
+        _count("db_connections")
+
+    def _begin_if_writing(self, sql):
+        # Take the write lock up front: a deferred transaction that read first can fail to upgrade under load
+        if not self._in_transaction and _WRITE.match(sql):
+            self._db.execute("BEGIN IMMEDIATE")
+            self._in_transaction = True
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        if self._in_transaction:
+            self._db.execute("COMMIT")
+            self._in_transaction = False
+
+    def rollback(self):
+        if self._in_transaction:
+            self._db.execute("ROLLBACK")
+            self._in_transaction = False
+
+    def close(self):
+        self.rollback()  # like psycopg2, closing without commit() discards the transaction
+        self._db.close()
+
+
+def connect(dsn):
+    return Connection(dsn)
+
+
+def execute_values(cursor, sql, argslist, template=None, page_size=100, fetch=False):
+    """psycopg2.extras.execute_values: expands `VALUES %s` into one row group per item, page by page."""
+    head, tail = sql.split("%s", 1)
+    results = []
+    argslist = list(argslist)
+    for start in range(0, len(argslist), page_size):
+        page = argslist[start:start + page_size]
+        groups = ", ".join("(" + ", ".join(["%s"] * len(row)) + ")" for row in page)
+        cursor.execute(head + groups + tail, [value for row in page for value in row])
+        if fetch:
+            results.extend(cursor.fetchall())
+    return results if fetch else None
+
+
+def create_database(path):
+    sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript(SCHEMA)
+    db.close()
+
+
+# --------------------- CLOUDINARY ---------------------
+
+def _cloudinary_modules(directory):
+    os.makedirs(directory, exist_ok=True)
+
+    def upload(file, folder=None, public_id=None, **options):
+        if isinstance(file, (bytes, bytearray)):
+            data = bytes(file)
+        elif isinstance(file, str):
+            with open(file, "rb") as f:
+                data = f.read()
+        else:
+            data = file.read()
+        name = (public_id or os.urandom(8).hex()).replace("/", "_")
+        if folder:
+            name = f"{folder}_{name}"
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data)
+        _count("cloudinary_uploads")
+        return {"public_id": name, "secure_url": f"/offline-cloudinary/{name}", "bytes": len(data)}
+
+    package = types.ModuleType("cloudinary")
+    package.config = lambda **options: None
+    uploader = types.ModuleType("cloudinary.uploader")
+    uploader.upload = upload
+    utils = types.ModuleType("cloudinary.utils")
+    utils.cloudinary_url = lambda public_id, **options: (f"/offline-cloudinary/{public_id}", options)
+    package.uploader, package.utils = uploader, utils
+    return {"cloudinary": package, "cloudinary.uploader": uploader, "cloudinary.utils": utils}
+
+
+# --------------------- FIREBASE ---------------------
+
+def make_id_token(email, name=None, uid=None, picture=None):
+    """An ID token the fake verify_id_token() accepts; real Firebase tokens are rejected."""
+    claims = {"email": email, "name": name or email.split("@")[0], "uid": uid or email, "picture": picture}
+    return "offline." + base64.urlsafe_b64encode(json.dumps(claims).encode()).decode()
+
+
+def verify_id_token(id_token, app=None, check_revoked=False):
+    _count("firebase_verifications")
+    if not isinstance(id_token, str) or not id_token.startswith("offline."):
+        raise ValueError("Invalid ID token")
+    return json.loads(base64.urlsafe_b64decode(id_token[len("offline."):]))
+
+
+def _firebase_modules():
+    package = types.ModuleType("firebase_admin")
+    package.initialize_app = lambda credential=None, options=None, name="[DEFAULT]": types.SimpleNamespace(name=name)
+    credentials = types.ModuleType("firebase_admin.credentials")
+    credentials.Certificate = lambda cert: types.SimpleNamespace(cert=cert)
+    auth = types.ModuleType("firebase_admin.auth")
+    auth.verify_id_token = verify_id_token
+    package.credentials, package.auth = credentials, auth
+    return {"firebase_admin": package, "firebase_admin.credentials": credentials, "firebase_admin.auth": auth}
+
+
+# --------------------- SMTP ---------------------
+
+class NullSMTP:
+    """Accepts logins and messages and drops them."""
+
+    def __init__(self, host="", port=0, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def login(self, user, password):
+        return (235, b"Accepted")
+
+    def send_message(self, msg, *args, **kwargs):
+        _count("emails_sent")
+        return {}
+
+    sendmail = send_message
+
+    def starttls(self, *args, **kwargs):
+        return (220, b"Ready")
+
+    def quit(self):
+        return (221, b"Bye")
+
+    close = quit
+
+
+# --------------------- INSTALL ---------------------
+
+def install(workdir):
+    """Points app.py's dependencies at local stand-ins under `workdir`. Call before importing app."""
+    os.makedirs(workdir, exist_ok=True)
+    database_path = os.path.join(workdir, "offline.sqlite3")
+    create_database(database_path)
+
+    psycopg2 = types.ModuleType("psycopg2")
+    psycopg2.connect = connect
+    psycopg2.Error, psycopg2.IntegrityError = Error, IntegrityError
+    errors = types.ModuleType("psycopg2.errors")
+    errors.UniqueViolation = UniqueViolation
+    extras = types.ModuleType("psycopg2.extras")
+    extras.execute_values = execute_values
+    psycopg2.errors, psycopg2.extras = errors, extras
+
+    sys.modules.update({"psycopg2": psycopg2, "psycopg2.errors": errors, "psycopg2.extras": extras})
+    sys.modules.update(_cloudinary_modules(os.path.join(workdir, "cloudinary")))
+    sys.modules.update(_firebase_modules())
+    smtplib.SMTP = smtplib.SMTP_SSL = NullSMTP
+
+    os.environ.update({
+        "DATABASE_URL": database_path,
+        "STORAGE_BACKEND": "local",
+        "LOCAL_STORAGE_DIR": os.path.join(workdir, "storage"),
+        "STORAGE_PENDING_DIR": os.path.join(workdir, "storage_pending"),
+        "SCAN_JOB_DIR": os.path.join(workdir, "jobs"),
+        "SCAN_JOB_DB_PATH": os.path.join(workdir, "jobs", "scan_jobs.sqlite3"),
+        "RESULT_CACHE_PATH": os.path.join(workdir, "cache", "results.sqlite3"),
+        "EMAIL_HOST_USER": "loadtest@localhost",
+        "EMAIL_HOST_PASSWORD": "unused",
+        # generate_firebase_config.py writes these into firebase_config.json; the fake never reads it
+        "FIREBASE_TYPE": "service_account",
+        "FIREBASE_PROJECT_ID": "offline",
+        "FIREBASE_PRIVATE_KEY": "unused",
+    })
+    return database_path
@@ -0,0 +1,111 @@
+"""Throughput per core and resident memory: eager torch vs onnxruntime, one modality at a time.
+
+Each backend runs in its own subprocess so peak RSS is not shared between them.
+Export the graphs first:  python onnx_export.py [--random-weights] --output-dir models/onnx
+
+Run from backend/:  python benchmarks/onnx_vs_torch.py [--modalities image audio] [--threads 1 4]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+BATCH_SHAPES = {
+    "image": (3, 224, 224),
+    "audio": (1, 128, 300),
+    "video": (10, 3, 224, 224),
+}
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run_worker(backend, modality, threads, batch_size, seconds, onnx_dir, random_weights):
+    import torch
+
+    torch.set_num_threads(threads)
+    baseline_rss = rss_mb()
+    if backend == "onnx":
+        from onnx_backend import OnnxModel, onnx_model_path
+        model = OnnxModel(onnx_model_path(modality, onnx_dir), intra_op_threads=threads)
+    else:
+        from onnx_export import load_torch_model
+        model = load_torch_model(modality, random_weights=random_weights)
+    loaded_rss = rss_mb()
+
+    x = torch.rand(batch_size, *BATCH_SHAPES[modality])
+    samples = 0
+    with torch.no_grad():
+        model(x)  # warm-up
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            model(x)
+            samples += batch_size
+        elapsed = time.perf_counter() - started
+
+    return {
+        "backend": backend,
+        "modality": modality,
+        "threads": threads,
+        "batch_size": batch_size,
+        "samples_per_s": samples / elapsed,
+        "samples_per_s_per_core": samples / elapsed / threads,
+        "model_rss_mb": loaded_rss - baseline_rss,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modalities", nargs="+", choices=list(BATCH_SHAPES), default=["image", "audio"])
+    parser.add_argument("--backends", nargs="+", choices=["torch", "onnx"], default=["torch", "onnx"])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1])
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--onnx-dir", default=os.path.join(BACKEND_DIR, "models", "onnx"))
+    parser.add_argument("--random-weights", action="store_true", help="benchmark untrained torch models")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(args.backends[0], args.modalities[0], args.threads[0], args.batch_size,
+                            args.seconds, args.onnx_dir, args.random_weights)
+        print(json.dumps(result))
+        return
+
+    results = []
+    print(f"{'modality':>8} | {'backend':>7} | {'threads':>7} | {'samples/s':>9} | {'per core':>8} | {'model MB':>8} | {'peak MB':>8}")
+    for modality in args.modalities:
+        for threads in args.threads:
+            for backend in args.backends:
+                cmd = [sys.executable, os.path.abspath(__file__), "--worker",
+                       "--backends", backend, "--modalities", modality, "--threads", str(threads),
+                       "--batch-size", str(args.batch_size), "--seconds", str(args.seconds),
+                       "--onnx-dir", args.onnx_dir]
+                if args.random_weights:
+                    cmd.append("--random-weights")
+                output = subprocess.run(cmd, cwd=BACKEND_DIR, check=True, capture_output=True, text=True).stdout
+                r = json.loads(output.strip().splitlines()[-1])
+                results.append(r)
+                print(f"{modality:>8} | {backend:>7} | {threads:>7} | {r['samples_per_s']:>9.1f} | "
+                      f"{r['samples_per_s_per_core']:>8.1f} | {r['model_rss_mb']:>8.1f} | {r['peak_rss_mb']:>8.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Statistical prefilter calibration: how many clean images skip the CNN, and which stego slips through.
+
+Clean images come from --images (any folder of photos, e.g. a split_images clean split),
+each also rescaled and JPEG re-encoded the way uploads arrive. Stego copies are made
+with the injection functions in dataset_prep/injectPayload, plus LSB replacement at
+rates the CNN was not trained on:
+
+  train_lsb    embed_lsb() with the 512-byte payload the training set uses
+  noise        embed_noise() (the same Gaussian noise in NumPy when skimage is missing)
+  seq_100      every sample's LSB replaced, in raster order
+  rand_<n>     LSB replacement of n% of the samples, scattered
+
+Each set reports the share stat_filter.verdict() resolves as Safe and as Malicious
+with the current STAT_* settings (env vars override them as in production). The
+thresholds are sound when no stego set has any Safe and clean has no Malicious;
+the clean Safe share is the work the CNN is spared.
+
+The defaults, on 12 natural photos from scikit-image's data directory x 3 scales x
+4 encodings (144 clean images, 64-768 px, one thread):
+
+  set          Safe   Malicious   CNN    analyse ms
+  clean        35%    0%          65%    5.9
+  train_lsb    0%     0%          100%   4.2
+  noise        0%     6%          94%    4.4
+  seq_100      0%     91%         9%     3.9
+  rand_10      1%     0%          99%    4.0   (textured photos, where SPA reads ~0)
+  rand_30      0%     13%         87%    5.1
+  rand_100     0%     85%         15%    4.1
+
+Run from backend/:  python benchmarks/stat_calibration.py --images <dir> [--json results.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(BACKEND_DIR), "dataset_prep", "injectPayload", "image"))
+
+import stat_filter  # noqa: E402
+from inject_payload_img import embed_lsb, embed_noise  # noqa: E402
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+SCALES = (1.0, 0.75, 0.5)
+JPEG_QUALITIES = (None, 95, 85, 70)  # None keeps the lossless decode
+
+
+def clean_variants(path):
+    image = Image.open(path).convert("RGB")
+    width, height = image.size
+    for scale in SCALES:
+        scaled = image if scale == 1.0 else image.resize(
+            (max(64, int(width * scale)), max(64, int(height * scale))), Image.BILINEAR)
+        for quality in JPEG_QUALITIES:
+            if quality is None:
+                yield np.asarray(scaled).copy()
+                continue
+            buffer = io.BytesIO()
+            scaled.save(buffer, "JPEG", quality=quality)
+            buffer.seek(0)
+            yield np.asarray(Image.open(buffer).convert("RGB")).copy()
+
+
+def _noise(image, rng):
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return embed_noise(image.copy())
+    except ImportError:
+        return (np.clip(image / 255.0 + rng.normal(0, 0.1, image.shape), 0, 1) * 255).astype(np.uint8)
+
+
+def _replace_lsb(image, rng, rate=None):
+    stego = image.copy()
+    flat = stego.reshape(-1)
+    chosen = np.ones(flat.size, dtype=bool) if rate is None else rng.random(flat.size) < rate
+    flat[chosen] = (flat[chosen] & 254) | rng.integers(0, 2, int(chosen.sum()), dtype=np.uint8)
+    return stego
+
+
+def stego_sets(rng):
+    return {
+        "train_lsb": lambda image: embed_lsb(image.copy(), rng.integers(0, 255, 512, dtype=np.uint8)),
+        "noise": lambda image: _noise(image, rng),
+        "seq_100": lambda image: _replace_lsb(image, rng),
+        "rand_10": lambda image: _replace_lsb(image, rng, 0.1),
+        "rand_30": lambda image: _replace_lsb(image, rng, 0.3),
+        "rand_100": lambda image: _replace_lsb(image, rng, 1.0),
+    }
+
+
+def resolve(images):
+    counts = {"Safe": 0, "Malicious": 0, None: 0}
+    timings = []
+    for image in images:
+        started = time.perf_counter()
+        stats = stat_filter.analyse(image)
+        timings.append((time.perf_counter() - started) * 1000)
+        counts[stat_filter.verdict(stats)[0]] += 1
+    total = max(1, len(images))
+    return {"images": len(images), "safe": counts["Safe"] / total, "malicious": counts["Malicious"] / total,
+            "cnn": counts[None] / total, "analyse_ms": float(np.median(timings)) if timings else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", required=True, help="folder of clean images")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    paths = sorted(os.path.join(args.images, name) for name in os.listdir(args.images)
+                   if name.lower().endswith(IMAGE_EXTENSIONS))
+    clean = [variant for path in paths for variant in clean_variants(path)]
+    print(f"🖼️ {len(clean)} clean images from {len(paths)} files")
+
+    rng = np.random.default_rng(args.seed)
+    results = {"clean": resolve(clean)}
+    for name, embed in stego_sets(rng).items():
+        results[name] = resolve([embed(image) for image in clean])
+
+    print(f"{'set':>10} | {'Safe':>6} | {'Malicious':>9} | {'CNN':>6} | {'analyse ms':>10}")
+    for name, result in results.items():
+        print(f"{name:>10} | {result['safe']:>6.0%} | {result['malicious']:>9.0%} | {result['cnn']:>6.0%} | "
+              f"{result['analyse_ms']:>10.1f}")
+    unsafe = [name for name, result in results.items() if name != "clean" and result["safe"] > 0]
+    if unsafe:
+        print(f"⚠️ Stego resolved as Safe in: {', '.join(unsafe)}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
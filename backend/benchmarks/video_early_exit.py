@@ -0,0 +1,112 @@
+"""Tunes incremental video mode: accuracy and frames used per exit threshold, on a labelled test split.
+
+Every clip is run once through all VIDEO_MAX_FRAMES frames with the per-step scores
+recorded; each threshold/patience pair is then replayed on those scores with the
+same stopping rule the server uses (model.video_exit_settled), so the sweep costs
+one pass over the data. The full-budget row is the accuracy without early exit.
+
+The split is laid out like dataset_prep's: <data>/clean/* and <data>/stego/*.
+
+Run from backend/:
+  python benchmarks/video_early_exit.py --data ../dataset_prep/dataset/split_data/split_videos/test \\
+      [--thresholds 0.8 0.9 0.95 0.99] [--patience 1 2 3] [--json results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import model as model_module  # noqa: E402
+
+
+def labelled_clips(data_dir):
+    clips = []
+    for label, subdir in enumerate(["clean", "stego"]):
+        path = os.path.join(data_dir, subdir)
+        if not os.path.isdir(path):
+            continue
+        for name in sorted(os.listdir(path)):
+            if name.lower().endswith(model_module.VIDEO_EXTENSIONS):
+                clips.append((os.path.join(path, name), label))
+    return clips
+
+
+def step_trace(path, video_model, max_frames, step_frames):
+    """(frames fed after each step, stego score after each step) over the whole frame budget."""
+    _, _, _, scores = model_module.analyze_video_incremental(path, video_model, max_frames, step_frames, patience=0)
+    return [min((i + 1) * step_frames, max_frames) for i in range(len(scores))], scores
+
+
+def replay(counts, scores, threshold, patience):
+    """(frames used, final stego score) under the server's stopping rule."""
+    for i in range(len(scores)):
+        if model_module.video_exit_settled(scores[:i + 1], threshold, patience):
+            return counts[i], scores[i]
+    return counts[-1], scores[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", required=True, help="test split with clean/ and stego/ subdirectories")
+    parser.add_argument("--checkpoint", default=model_module.VIDEO_MODEL_PATH)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.8, 0.9, 0.95, 0.99])
+    parser.add_argument("--patience", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--max-frames", type=int, default=model_module.VIDEO_MAX_FRAMES)
+    parser.add_argument("--step-frames", type=int, default=model_module.VIDEO_STEP_FRAMES)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    clips = labelled_clips(args.data)
+    if not clips:
+        parser.error(f"no clips under {args.data}/clean or {args.data}/stego")
+    video_model = model_module.load_video_model(args.checkpoint)
+
+    traces = []
+    started = time.perf_counter()
+    for path, label in clips:
+        counts, scores = step_trace(path, video_model, args.max_frames, args.step_frames)
+        if scores:
+            traces.append((label, counts, scores))
+    print(f"🎬 Traced {len(traces)} clips in {time.perf_counter() - started:.1f}s "
+          f"({args.max_frames} frames, {args.step_frames} per step)")
+
+    def row(threshold, patience, outcomes):
+        correct = sum((score >= 0.5) == bool(label) for label, (_, score) in outcomes)
+        frames = [used for _, (used, _) in outcomes]
+        return {
+            "threshold": threshold,
+            "patience": patience,
+            "accuracy": correct / len(outcomes),
+            "mean_frames": float(np.mean(frames)),
+            "p95_frames": float(np.percentile(frames, 95)),
+            "early_exits": sum(used < args.max_frames for used in frames) / len(outcomes),
+        }
+
+    results = [row(None, None, [(label, (counts[-1], scores[-1])) for label, counts, scores in traces])]
+    for threshold in args.thresholds:
+        for patience in args.patience:
+            outcomes = [(label, replay(counts, scores, threshold, patience)) for label, counts, scores in traces]
+            results.append(row(threshold, patience, outcomes))
+
+    print(f"{'threshold':>9} | {'patience':>8} | {'accuracy':>8} | {'mean frames':>11} | {'p95 frames':>10} | "
+          f"{'early exits':>11}")
+    for r in results:
+        threshold = "full" if r["threshold"] is None else f"{r['threshold']:g}"
+        patience = "-" if r["patience"] is None else str(r["patience"])
+        print(f"{threshold:>9} | {patience:>8} | {r['accuracy']:>8.3f} | {r['mean_frames']:>11.2f} | "
+              f"{r['p95_frames']:>10.1f} | {r['early_exits']:>10.0%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"clips": len(traces), "max_frames": args.max_frames, "step_frames": args.step_frames,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
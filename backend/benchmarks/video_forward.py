@@ -0,0 +1,88 @@
+"""Per-clip CPU latency of VideoStegoModel: the backbone per timestep, over all frames at once, and in groups.
+
+  loop     one backbone call per frame, the original forward
+  single   batch and time folded into one backbone call
+  grouped  folded, VIDEO_BACKBONE_FRAMES frames per call: what VideoStegoModel.step() runs
+
+On CPU, one call over a long clip loses to the loop: each intermediate tensor grows
+with the frame count (77 MB after the stem at 64 frames) and the call becomes memory
+bound. Groups of 8 keep the call count low and the tensors small. 1 thread, batch
+size 1, median of 3; outputs match the loop to within 1e-8:
+
+  frames   loop ms   single ms   grouped ms
+  10        1548      1341        1289
+  32        4046      5248        4348   (loop and grouped swap places between runs, +-10%)
+  64        9577     12664        7638
+
+Run from backend/:  python benchmarks/video_forward.py [--frames 10 32 64] [--repeats 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model import VideoStegoModel, VIDEO_BACKBONE_FRAMES
+
+
+def forward_per_timestep(model, x):
+    """The previous VideoStegoModel.forward, kept as the reference implementation."""
+    batch_size, timesteps, C, H, W = x.shape
+    cnn_features = [model.cnn(x[:, t, :, :, :]) for t in range(timesteps)]
+    cnn_features = torch.stack(cnn_features, dim=1)
+    lstm_out, _ = model.lstm(cnn_features)
+    return model.fc(lstm_out[:, -1, :])
+
+
+def forward_single_call(model, x):
+    batch_size, timesteps, C, H, W = x.shape
+    cnn_features = model.cnn(x.reshape(batch_size * timesteps, C, H, W)).view(batch_size, timesteps, -1)
+    lstm_out, _ = model.lstm(cnn_features)
+    return model.fc(lstm_out[:, -1, :])
+
+
+def time_call(fn, repeats):
+    fn()  # warm-up
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000.0)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, nargs="+", default=[10, 32, 64])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    torch.manual_seed(0)
+    model = VideoStegoModel(pretrained=False).eval()  # latency does not depend on the weights
+
+    print(f"torch {torch.__version__}, {torch.get_num_threads()} threads, batch size 1, "
+          f"{VIDEO_BACKBONE_FRAMES} frames per grouped call")
+    print(f"{'frames':>6} | {'loop ms':>10} | {'single ms':>10} | {'grouped ms':>10} | {'max |diff|':>10}")
+    with torch.no_grad():
+        for frames in args.frames:
+            clip = torch.rand(1, frames, 3, 224, 224)
+            reference = forward_per_timestep(model, clip)
+            diff = max((reference - fn(model, clip)).abs().max().item()
+                       for fn in (forward_single_call, VideoStegoModel.forward))
+
+            loop_ms = time_call(lambda: forward_per_timestep(model, clip), args.repeats)
+            single_ms = time_call(lambda: forward_single_call(model, clip), args.repeats)
+            grouped_ms = time_call(lambda: model(clip), args.repeats)
+            print(f"{frames:>6} | {loop_ms:>10.1f} | {single_ms:>10.1f} | {grouped_ms:>10.1f} | {diff:>10.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""CPU inference preparation for the torch models: BatchNorm folding, channels_last, TorchScript with oneDNN, bf16.
+
+Levels (CPU_OPTIMIZATION):
+  none   plain model.eval()
+  eager  BatchNorm folded into the preceding convolutions and weights in channels_last
+  jit    eager, then the backbone is traced, frozen and run with oneDNN graph fusion
+
+CPU_BF16 runs the backbone under bf16 autocast; "auto" turns it on only on CPUs with
+native bf16 (AVX512-BF16 / AMX), where it is several times faster. Logits move by
+~1e-2, so compare verdicts with benchmarks/cpu_optimize.py before enabling it.
+
+Only the convolutional backbone of each model is prepared; the LSTM and the small
+heads stay eager, so VideoStegoModel.step() keeps working. Folding writes new
+weights, so a prepared model no longer shares memory-mapped checkpoint pages.
+"""
+import io
+import os
+
+import torch
+import torch.nn as nn
+from dotenv import load_dotenv
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+from model import ImageStegoCNN, AudioStegoCNN, ResNet34Audio, VideoStegoModel, warmup_inputs
+
+load_dotenv()
+
+CPU_OPTIMIZATION = os.getenv("CPU_OPTIMIZATION", "none")  # none | eager | jit
+CPU_BF16 = os.getenv("CPU_BF16", "off")  # off | auto (native bf16 CPUs only) | on
+TORCH_INTRA_OP_THREADS = int(os.getenv("TORCH_INTRA_OP_THREADS", 0))  # 0 keeps torch's default, one per core
+TORCH_INTER_OP_THREADS = int(os.getenv("TORCH_INTER_OP_THREADS", 0))  # 0 keeps torch's default
+
+LEVELS = ("none", "eager", "jit")
+
+# Attribute holding each model's convolutional backbone
+BACKBONES = {
+    ImageStegoCNN: "model",
+    ResNet34Audio: "resnet34",
+    AudioStegoCNN: "cnn",
+    VideoStegoModel: "cnn",
+}
+
+
+def configure_threads(intra_op=TORCH_INTRA_OP_THREADS, inter_op=TORCH_INTER_OP_THREADS):
+    """Applies the configured torch thread pools; call once, before the first forward."""
+    if intra_op > 0:
+        torch.set_num_threads(intra_op)
+    if inter_op > 0:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError as e:  # only settable before any inter-op work has started
+            print(f"⚠️ TORCH_INTER_OP_THREADS not applied: {e}")
+
+
+def bf16_supported():
+    return torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+
+
+def use_bf16(setting=CPU_BF16):
+    if setting == "auto":
+        return bf16_supported()
+    if setting == "on" and not bf16_supported():
+        print("⚠️ CPU_BF16=on without native bf16 support; autocast will be emulated and slow")
+    return setting == "on"
+
+
+# --------------------- BATCHNORM FOLDING ---------------------
+
+def fold_batchnorm(module):
+    """Folds every eval-mode BatchNorm2d into the Conv2d that feeds it, in place.
+
+    Covers the two layouts our backbones use: Conv2d then BatchNorm2d inside an
+    nn.Sequential (AudioStegoCNN, EfficientNet's Conv2dNormActivation, ResNet
+    downsample), and torchvision ResNet's convN/bnN attribute pairs.
+    """
+    for child in module.children():
+        fold_batchnorm(child)
+
+    if isinstance(module, nn.Sequential):
+        names = list(module._modules)
+        for conv_name, bn_name in zip(names, names[1:]):
+            conv, bn = module._modules[conv_name], module._modules[bn_name]
+            if isinstance(conv, nn.Conv2d) and isinstance(bn, nn.BatchNorm2d):
+                module._modules[conv_name] = fuse_conv_bn_eval(conv, bn)
+                module._modules[bn_name] = nn.Identity()
+
+    for name, conv in list(module.named_children()):
+        bn_name = "bn" + name[len("conv"):]
+        bn = getattr(module, bn_name, None)
+        if name.startswith("conv") and isinstance(conv, nn.Conv2d) and isinstance(bn, nn.BatchNorm2d):
+            setattr(module, name, fuse_conv_bn_eval(conv, bn))
+            setattr(module, bn_name, nn.Identity())
+    return module
+
+
+# --------------------- PREPARED BACKBONE ---------------------
+
+class OptimizedBackbone(nn.Module):
+    """Feeds a prepared backbone channels_last inputs, under bf16 autocast if enabled; returns float32."""
+
+    def __init__(self, backbone, bf16=False):
+        super().__init__()
+        self.backbone = backbone
+        self.bf16 = bf16
+
+    def forward(self, x):
+        if x.dim() == 4:
+            x = x.contiguous(memory_format=torch.channels_last)
+        with torch.autocast("cpu", dtype=torch.bfloat16, enabled=self.bf16):
+            return self.backbone(x).float()
+
+    def __getstate__(self):
+        # Traced backbones do not pickle; they travel to inference workers serialized
+        state = super().__getstate__()
+        if isinstance(self.backbone, torch.jit.ScriptModule):
+            buffer = io.BytesIO()
+            torch.jit.save(self.backbone, buffer)
+            state = dict(state, _modules=dict(state["_modules"], backbone=buffer.getvalue()))
+        return state
+
+    def __setstate__(self, state):
+        backbone = state["_modules"]["backbone"]
+        if isinstance(backbone, bytes):
+            torch.jit.enable_onednn_fusion(True)
+            state = dict(state, _modules=dict(state["_modules"], backbone=torch.jit.load(io.BytesIO(backbone))))
+        super().__setstate__(state)
+
+
+def _backbone_example(modality):
+    example = warmup_inputs()[modality]
+    # The video backbone sees frames, not clips: (B, T, C, H, W) -> (B*T, C, H, W)
+    return example.flatten(0, 1) if example.dim() == 5 else example
+
+
+def _trace(backbone, example, bf16):
+    # Traced under autocast, the bf16 casts are recorded into the graph
+    with torch.no_grad(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=bf16):
+        traced = torch.jit.trace(backbone, example.contiguous(memory_format=torch.channels_last), check_trace=False)
+    return torch.jit.freeze(traced)
+
+
+def optimize_model(model, modality, level=CPU_OPTIMIZATION, bf16=False):
+    """Prepares `model`'s backbone in place for `level`; models we have no backbone for are returned as is."""
+    if level not in LEVELS:
+        raise ValueError(f"Unknown CPU_OPTIMIZATION {level!r}; expected one of {LEVELS}")
+    attr = BACKBONES.get(type(model))
+    if attr is None or (level == "none" and not bf16):
+        return model  # TorchScript int8 and onnxruntime models are already compiled
+    model.eval()
+    backbone = getattr(model, attr)
+    if level != "none":
+        backbone = fold_batchnorm(backbone).to(memory_format=torch.channels_last)
+    if level == "jit":
+        torch.jit.enable_onednn_fusion(True)
+        backbone = _trace(backbone, _backbone_example(modality), bf16)
+    setattr(model, attr, OptimizedBackbone(backbone, bf16=bf16))
+    model.weights_mmapped = False  # folded weights are private copies, so the pool should share them itself
+    return model
+
+
+def optimize_models(models, level=CPU_OPTIMIZATION, bf16_setting=CPU_BF16):
+    """optimize_model() over a {modality: model} dict; warm the result up before serving it."""
+    bf16 = use_bf16(bf16_setting)
+    if level == "none" and not bf16:
+        return models
+    for modality, model in models.items():
+        models[modality] = optimize_model(model, modality, level, bf16)
+    print(f"⚙️ Models prepared for CPU: {level}{' + bf16' if bf16 else ''}")
+    return models
@@ -157,3 +157,14 @@ BEGIN
         ALTER TABLE uploads ADD COLUMN file_size BIGINT;
     END IF;
 END$$;
+
+-- Add model_version to results if not exists
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns 
+        WHERE table_name='results' AND column_name='model_version'
+    ) THEN
+        ALTER TABLE results ADD COLUMN model_version TEXT;
+    END IF;
+END$$;
@@ -0,0 +1,122 @@
+import cv2
+import numpy as np
+import torch
+
+# Targets closer together than this are reached by grabbing forward instead of seeking.
+# A seek lands on the previous keyframe and decodes forward from there anyway, so for
+# short gaps (within a typical GOP) grabbing is cheaper than a fresh seek.
+SEEK_MIN_GAP = 30
+
+
+def probe(cap):
+    """Container metadata as reported by OpenCV: (frame_count, fps, width, height)."""
+    return (
+        int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        float(cap.get(cv2.CAP_PROP_FPS) or 0.0),
+        int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+    )
+
+
+def sample_indices(frame_count, num_frames, strategy="uniform", rng=None):
+    """Frame indices spread over the whole clip.
+
+    uniform picks the centre of each of `num_frames` equal segments; stratified picks
+    a random frame inside each segment (useful as training-time augmentation).
+    """
+    if frame_count <= 0:
+        return np.zeros(num_frames, dtype=np.int64)
+    edges = np.linspace(0, frame_count, num_frames + 1)
+    if strategy == "stratified":
+        rng = rng or np.random.default_rng()
+        positions = edges[:-1] + rng.random(num_frames) * np.diff(edges)
+    elif strategy == "uniform":
+        positions = (edges[:-1] + edges[1:]) / 2
+    else:
+        raise ValueError(f"Unknown sampling strategy: {strategy}")
+    return np.minimum(positions.astype(np.int64), frame_count - 1)
+
+
+def _count_frames(path):
+    # Some containers do not report a frame count; grab() walks the stream without converting frames
+    cap = cv2.VideoCapture(path)
+    count = 0
+    while cap.grab():
+        count += 1
+    cap.release()
+    return count
+
+
+def iter_sampled_frames(path, num_frames=10, size=(224, 224), strategy="uniform", rng=None):
+    """Yields the frames sample_frames() returns, one (H, W, 3) RGB array at a time, decoding lazily.
+
+    Closing the generator early leaves the rest of the clip undecoded.
+    """
+    cap = cv2.VideoCapture(path)
+    try:
+        frame_count, _, width, height = probe(cap)
+        if frame_count <= 0:
+            frame_count = _count_frames(path)
+        out_w, out_h = size if size is not None else (width, height)
+        if frame_count <= 0 or out_w <= 0 or out_h <= 0:
+            for _ in range(num_frames):
+                yield np.zeros((max(out_h, 0), max(out_w, 0), 3), dtype=np.uint8)
+            return
+
+        position = 0  # index of the next frame the decoder will return
+        last_good = None
+        for target in sample_indices(frame_count, num_frames, strategy, rng):
+            if target < position or target - position > SEEK_MIN_GAP:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(target))
+                position = int(target)
+            while position < target and cap.grab():
+                position += 1
+
+            ok, frame = cap.read()
+            if ok:
+                position += 1
+                if size is not None and (frame.shape[1], frame.shape[0]) != (out_w, out_h):
+                    frame = cv2.resize(frame, (out_w, out_h))  # same interpolation the training script used
+                last_good = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                yield last_good
+            elif last_good is not None:
+                yield last_good
+            else:
+                yield np.zeros((out_h, out_w, 3), dtype=np.uint8)
+    finally:
+        cap.release()
+
+
+def sample_frames(path, num_frames=10, size=(224, 224), strategy="uniform", rng=None):
+    """Decodes only `num_frames` frames spread across the clip into one preallocated uint8 array.
+
+    Returns (num_frames, H, W, 3) RGB, resized to `size` (width, height) unless size is None.
+    Frames that cannot be decoded repeat the previous good frame, matching the datasets'
+    padding; a clip with no decodable frames comes back all zeros.
+    """
+    frames = None
+    for i, frame in enumerate(iter_sampled_frames(path, num_frames, size, strategy, rng)):
+        if frames is None:
+            frames = np.empty((num_frames,) + frame.shape, dtype=np.uint8)
+        frames[i] = frame
+    return frames
+
+
+def read_first_frames(path, num_frames=10, size=(224, 224)):
+    """The old behaviour, kept for benchmarks: the first `num_frames` frames read sequentially."""
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < num_frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if size is not None:
+            frame = cv2.resize(frame, size)
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    cap.release()
+    return frames
+
+
+def frames_to_tensor(frames):
+    """(T, H, W, 3) uint8 -> (T, 3, H, W) float in [0, 1], the layout VideoStegoModel was trained on."""
+    return torch.from_numpy(frames).permute(0, 3, 1, 2).float().div_(255.0)
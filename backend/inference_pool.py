@@ -0,0 +1,347 @@
+import io
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter, deque
+
+import torch
+import torch.nn as nn
+from dotenv import load_dotenv
+
+from batching import BATCH_MAX_SIZE, classify_logits
+from metrics import observe_stage
+from model import load_checkpoint_model, warmup_inputs, WARMUP_ITERATIONS
+
+load_dotenv()
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 0))  # 0 keeps inference in the web process
+INFERENCE_WORKER_THREADS = int(os.getenv("INFERENCE_WORKER_THREADS", 1))  # torch intra-op threads per worker
+INFERENCE_MAX_IN_FLIGHT = int(os.getenv("INFERENCE_MAX_IN_FLIGHT", 64))  # submitted but unfinished jobs
+INFERENCE_JOB_RETRIES = int(os.getenv("INFERENCE_JOB_RETRIES", 1))  # re-runs after the worker running a job dies
+
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+def _recipe(model):
+    """What a worker needs to rebuild `model` in its own process; everything in it pickles."""
+    if hasattr(model, "reopen"):
+        return ("onnx", model.path)  # onnxruntime sessions do not pickle; each worker opens its own
+    if isinstance(model, torch.jit.ScriptModule):
+        buffer = io.BytesIO()
+        torch.jit.save(model, buffer)
+        return ("torchscript", buffer.getvalue())
+    if getattr(model, "weights_mmapped", False) and getattr(model, "checkpoint_path", None):
+        return ("checkpoint", model.checkpoint_path)  # mapping the same file shares its page-cache pages
+    return ("module", model)  # parameters in shared memory are sent as file descriptors, not copied
+
+
+def _rebuild(modality, recipe, threads):
+    kind, payload = recipe
+    if kind == "onnx":
+        from onnx_backend import OnnxModel
+        return OnnxModel(payload, intra_op_threads=threads)
+    if kind == "torchscript":
+        return torch.jit.load(io.BytesIO(payload), map_location=torch.device("cpu")).eval()
+    if kind == "checkpoint":
+        return load_checkpoint_model(modality, payload, mmap=True)
+    return payload.eval()
+
+
+def _worker_main(conn, recipes, threads, warmup_iterations):
+    # A fresh process started by the forkserver: nothing is inherited from the web process but the recipes
+    torch.set_num_threads(threads)
+    models = {modality: _rebuild(modality, recipe, threads) for modality, recipe in recipes.items()}
+
+    # Warm this process's allocator and kernel caches before the first real batch
+    with torch.no_grad():
+        for modality, inputs in warmup_inputs().items():
+            if modality in models:
+                for _ in range(warmup_iterations):
+                    models[modality](inputs)
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        modality, inputs = message
+        try:
+            with torch.no_grad():
+                output = models[modality](torch.from_numpy(inputs))
+            conn.send(("ok", output.numpy()))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Job:
+    __slots__ = ("modality", "inputs", "done", "output", "error", "attempts", "enqueued_at")
+
+    def __init__(self, modality, inputs):
+        self.modality = modality
+        self.inputs = inputs
+        self.done = threading.Event()
+        self.output = None
+        self.error = None
+        self.attempts = 0
+        self.enqueued_at = time.perf_counter()
+
+
+class InferencePool:
+    """Inference processes sharing the parent's model weights.
+
+    Workers are started from a forkserver, never forked from the web process: that
+    process runs request, feeder and torch threads, and a fork copies whatever locks
+    those threads held at that moment. This applies to respawns and hot swaps too.
+    Each worker rebuilds its models from _recipe(). Memory-mapped checkpoints are
+    mapped again and shared parameters arrive as shared memory, so weights are not
+    copied per worker. Like multiprocessing's spawn, a new worker imports the entry
+    script as __mp_main__. serve.py defers its work to main(), so that import is cheap.
+
+    Jobs wait in one queue in the parent. Each worker is driven by a feeder thread
+    that takes the oldest job plus any queued jobs of the same modality (up to
+    `max_batch_size` samples), sends them as one batch and waits for the logits. If
+    the worker dies mid-batch the feeder respawns it and puts that batch back at the
+    front of the queue; jobs nobody had picked up yet are never touched.
+    """
+
+    def __init__(self, models, num_workers=INFERENCE_WORKERS, threads_per_worker=INFERENCE_WORKER_THREADS,
+                 max_in_flight=INFERENCE_MAX_IN_FLIGHT, max_batch_size=BATCH_MAX_SIZE,
+                 warmup_iterations=WARMUP_ITERATIONS, model_version=None):
+        self.models = models
+        self.model_version = model_version  # metrics label for the feeder threads
+        self.warmup_iterations = max(0, int(warmup_iterations))
+        self.num_workers = max(1, int(num_workers))
+        self.threads_per_worker = max(1, int(threads_per_worker))
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_batch_size = max(1, int(max_batch_size))
+
+        # Move parameters into shared memory so every worker, including respawned ones, maps the same pages;
+        # weights memory-mapped from a checkpoint are shared through the page cache already
+        for model in models.values():
+            if isinstance(model, nn.Module) and not getattr(model, "weights_mmapped", False):
+                model.share_memory()
+
+        self._recipes = {modality: _recipe(model) for modality, model in models.items()}
+
+        self._context = multiprocessing.get_context("forkserver")
+        self._context.set_forkserver_preload(["inference_pool"])  # torch and the model code are imported once
+        self._jobs = deque()
+        self._cond = threading.Condition()
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._batches = 0
+        self._completed = 0
+        self._failed = 0
+        self._restarts = 0
+        self._wait_total = 0.0
+        self._forward_total = 0.0
+
+        self._workers = [self._spawn(i) for i in range(self.num_workers)]
+        for index, worker in enumerate(self._workers):  # they warm up in parallel; wait for all of them
+            if not self._await_ready(worker):
+                raise WorkerCrashed(f"inference worker {index} died during warm-up")
+        self._feeders = []
+        for i in range(self.num_workers):
+            feeder = threading.Thread(target=self._feed, args=(i,), name=f"inference-feeder-{i}", daemon=True)
+            feeder.start()
+            self._feeders.append(feeder)
+
+    def _spawn(self, index):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(child_conn, self._recipes, self.threads_per_worker, self.warmup_iterations),
+            name=f"inference-worker-{index}", daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        return {"process": process, "conn": parent_conn, "batches": 0, "restarts": 0}
+
+    @staticmethod
+    def _await_ready(worker):
+        try:
+            status, _ = worker["conn"].recv()
+        except (EOFError, OSError):
+            return False
+        return status == "ready"
+
+    def _respawn(self, index):
+        worker = self._workers[index]
+        worker["conn"].close()
+        worker["process"].join(timeout=1)
+        print(f"⚠️ Inference worker {index} (pid {worker['process'].pid}) exited "
+              f"with code {worker['process'].exitcode}; respawning")
+        replacement = self._spawn(index)
+        if not self._await_ready(replacement):
+            print(f"⚠️ Replacement inference worker {index} died during warm-up")  # the next batch respawns it again
+        replacement["batches"] = worker["batches"]
+        replacement["restarts"] = worker["restarts"] + 1
+        self._workers[index] = replacement
+        with self._stats_lock:
+            self._restarts += 1
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._jobs and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+            first = self._jobs.popleft()
+            batch = [first]
+            size = first.inputs.shape[0]
+            # Same-modality jobs queued behind the first one ride along; the rest keep their place
+            for job in list(self._jobs):
+                if size >= self.max_batch_size:
+                    break
+                if job.modality == first.modality and size + job.inputs.shape[0] <= self.max_batch_size:
+                    self._jobs.remove(job)
+                    batch.append(job)
+                    size += job.inputs.shape[0]
+            return batch
+
+    def _requeue(self, batch, error):
+        with self._cond:
+            for job in reversed(batch):
+                job.attempts += 1
+                if job.attempts > INFERENCE_JOB_RETRIES:
+                    self._finish(job, error=error)
+                else:
+                    self._jobs.appendleft(job)
+            self._cond.notify_all()
+
+    def _finish(self, job, output=None, error=None):
+        job.output = output
+        job.error = error
+        with self._stats_lock:
+            if error is None:
+                self._completed += 1
+            else:
+                self._failed += 1
+        job.done.set()
+
+    def _feed(self, index):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            inputs = torch.cat([job.inputs for job in batch], dim=0).numpy()
+            started = time.perf_counter()
+            try:
+                self._workers[index]["conn"].send((batch[0].modality, inputs))
+                status, payload = self._workers[index]["conn"].recv()
+            except (EOFError, OSError):
+                self._respawn(index)
+                self._requeue(batch, WorkerCrashed(f"inference worker {index} died running this job"))
+                continue
+            finished = time.perf_counter()
+            # forward includes the pipe round trip
+            observe_stage("forward", batch[0].modality, finished - started, self.model_version)
+            for job in batch:
+                observe_stage("queue_wait", job.modality, started - job.enqueued_at, self.model_version)
+
+            with self._stats_lock:
+                self._batches += 1
+                self._batch_sizes[inputs.shape[0]] += 1
+                self._wait_total += sum(started - job.enqueued_at for job in batch)
+                self._forward_total += finished - started
+            self._workers[index]["batches"] += 1
+
+            if status != "ok":
+                for job in batch:
+                    self._finish(job, error=RuntimeError(payload))
+                continue
+            output = torch.from_numpy(payload)
+            offset = 0
+            for job in batch:
+                n = job.inputs.shape[0]
+                self._finish(job, output=output[offset:offset + n])
+                offset += n
+
+    def run(self, modality, inputs):
+        """Blocks until a worker has run `inputs` through the `modality` model; returns its logits."""
+        if modality not in self.models:
+            raise KeyError(f"No {modality} model loaded")
+        job = _Job(modality, inputs.detach().contiguous())
+        self._slots.acquire()  # back-pressure once max_in_flight jobs are outstanding
+        try:
+            with self._cond:
+                self._jobs.append(job)
+                self._cond.notify()
+            job.done.wait()
+        finally:
+            self._slots.release()
+        if job.error is not None:
+            raise job.error
+        return job.output
+
+    def schedulers(self):
+        """Per-modality handles with the BatchScheduler interface, for predict()."""
+        return {name: PoolScheduler(self, name) for name in self.models}
+
+    def queue_depth(self, modality=None):
+        with self._cond:
+            return sum(1 for job in self._jobs if modality is None or job.modality == modality)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            try:
+                worker["conn"].send(None)
+            except OSError:
+                pass
+            worker["process"].join(timeout=5)
+
+    def stats(self):
+        with self._stats_lock:
+            batches = self._batches
+            finished = self._completed + self._failed
+            stats = {
+                "workers": self.num_workers,
+                "threads_per_worker": self.threads_per_worker,
+                "max_in_flight": self.max_in_flight,
+                "max_batch_size": self.max_batch_size,
+                "batches": batches,
+                "jobs_completed": self._completed,
+                "jobs_failed": self._failed,
+                "worker_restarts": self._restarts,
+                "avg_batch_size": round(sum(k * v for k, v in self._batch_sizes.items()) / batches, 2) if batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "avg_queue_wait_ms": round(self._wait_total * 1000.0 / finished, 3) if finished else 0.0,
+                "avg_forward_ms": round(self._forward_total * 1000.0 / batches, 3) if batches else 0.0,
+            }
+        stats["queue_depth"] = self.queue_depth()
+        stats["processes"] = [
+            {"pid": w["process"].pid, "alive": w["process"].is_alive(), "batches": w["batches"], "restarts": w["restarts"]}
+            for w in self._workers
+        ]
+        return stats
+
+
+class PoolScheduler:
+    """One modality's view of an InferencePool, interchangeable with a BatchScheduler."""
+
+    def __init__(self, pool, name):
+        self.pool = pool
+        self.name = name
+
+    def run(self, inputs):
+        return self.pool.run(self.name, inputs)
+
+    def classify(self, inputs):
+        return classify_logits(self.run(inputs))
+
+    def queue_depth(self):
+        return self.pool.queue_depth(self.name)
+
+    def stats(self):
+        return {"name": self.name, "queue_depth": self.queue_depth(), "backend": "inference_pool"}
@@ -0,0 +1,212 @@
+import copy
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+
+from dotenv import load_dotenv
+from flask import Request
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
+
+load_dotenv()
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 200 * 1024 * 1024))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None  # None uses the system temp dir
+# Whole-request limit checked against Content-Length before any of the body is read
+REQUEST_MAX_BYTES = UPLOAD_MAX_BYTES + (1 << 20)  # headroom for multipart framing and form fields
+MAGIC_PROBE_BYTES = 16
+
+# Sniffed content type -> extensions it may be uploaded as
+MAGIC_EXTENSIONS = {
+    "png": ("png",),
+    "jpeg": ("jpg", "jpeg"),
+    "wav": ("wav",),
+    "mp3": ("mp3",),
+    "flac": ("flac",),
+    "isobmff": ("mp4", "mov", "m4a"),
+    "quicktime": ("mov", "mp4"),
+}
+
+# Top-level atoms QuickTime files may start with instead of ftyp
+QUICKTIME_ATOMS = (b"moov", b"mdat", b"wide", b"free", b"skip")
+
+
+def sniff(header):
+    """Content type from the first bytes of a file, or None when unrecognised."""
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "wav"
+    if header.startswith(b"fLaC"):
+        return "flac"
+    if header.startswith(b"ID3") or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return "mp3"
+    if header[4:8] == b"ftyp":  # mp4, mov and m4a are all ISO base media files
+        return "isobmff"
+    if header[4:8] in QUICKTIME_ATOMS:  # older .mov files have no ftyp atom
+        return "quicktime"
+    return None
+
+
+def content_matches_extension(kind, extension):
+    """False only when the extension is one we sniff for and the bytes say otherwise."""
+    known = {ext for exts in MAGIC_EXTENSIONS.values() for ext in exts}
+    if extension not in known:
+        return True  # predict() reports unsupported types itself
+    return extension in MAGIC_EXTENSIONS.get(kind, ())
+
+
+class UploadSpool:
+    """Writable temp file that hashes, counts and sniffs an upload as werkzeug streams it in.
+
+    The request body is only read once: by the time the view runs, `sha256`, `size`
+    and `kind` are known and the bytes are on disk at `path`, where storage and
+    inference can read them (or map them with `mmap()`) without touching the stream.
+    Writing past `max_bytes` aborts the request with 413 before the rest is read.
+    """
+
+    def __init__(self, max_bytes=UPLOAD_MAX_BYTES, spool_dir=UPLOAD_SPOOL_DIR):
+        self.max_bytes = max_bytes
+        self._file = tempfile.NamedTemporaryFile(prefix="upload-", dir=spool_dir, delete=False)
+        self.path = self._file.name
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._header = b""
+        self._mmaps = []
+        self._detached = False
+
+    # --- written by the form parser ---
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.close()
+            raise RequestEntityTooLarge(f"Uploads are limited to {self.max_bytes} bytes")
+        if len(self._header) < MAGIC_PROBE_BYTES:
+            self._header += bytes(data[:MAGIC_PROBE_BYTES - len(self._header)])
+        self._digest.update(data)
+        return self._file.write(data)
+
+    # --- read like any other upload stream ---
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def readline(self, size=-1):
+        return self._file.readline(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self._file.flush()
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def __iter__(self):
+        return iter(self._file)
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    # --- computed while the upload was written ---
+    @property
+    def sha256(self):
+        return self._digest.hexdigest()
+
+    @property
+    def kind(self):
+        return sniff(self._header)
+
+    def mmap(self):
+        """Read-only memory map of the spooled bytes; released when the spool is closed."""
+        self._file.flush()
+        mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mmaps.append(mapped)
+        return mapped
+
+    def detach(self):
+        """Hands the spooled file to a new UploadSpool; closing this one then leaves the file alone.
+
+        For uploads read after the request has closed its files, as streamed responses do.
+        """
+        self._file.flush()
+        owner = copy.copy(self)
+        owner._mmaps = []
+        self._detached = True
+        return owner
+
+    def close(self):
+        for mapped in self._mmaps:
+            mapped.close()
+        self._mmaps = []
+        if self._detached:
+            return  # the spool detach() returned owns the file now
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class SpoolReader(io.BufferedReader):
+    """An independent read handle on a finished spool, so several readers never share a file position.
+
+    Carries the spool's path, digest, size and kind; upload_path() and spooled_upload()
+    treat it like the spool itself. The spool's owner still deletes the file.
+    """
+
+    def __init__(self, spool):
+        super().__init__(io.FileIO(spool.path, "r"))
+        self.path = spool.path
+        self.sha256 = spool.sha256
+        self.size = spool.size
+        self.kind = spool.kind
+
+    def mmap(self):
+        return mmap.mmap(self.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class IngestRequest(Request):
+    """Spools file uploads through UploadSpool instead of werkzeug's default buffers."""
+
+    max_file_bytes = UPLOAD_MAX_BYTES  # per file part; routes that accept archives raise it before reading files
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return UploadSpool(max_bytes=self.max_file_bytes)
+
+
+def spooled_upload(file):
+    """The UploadSpool (or SpoolReader) behind a FileStorage, or None if the upload was not spooled."""
+    stream = getattr(file, "stream", file)
+    return stream if isinstance(stream, (UploadSpool, SpoolReader)) else None
+
+
+def detach_upload(file):
+    """A FileStorage that outlives the request: its spool is detached, and the caller close()s it."""
+    spool = spooled_upload(file)
+    if not isinstance(spool, UploadSpool):
+        return file
+    return FileStorage(stream=spool.detach(), filename=file.filename, name=file.name,
+                       content_type=file.content_type)
+
+
+def upload_path(file):
+    spool = spooled_upload(file)
+    return spool.path if spool is not None else None
@@ -0,0 +1,287 @@
+"""Media decoding through one ffmpeg pipe: raw PCM and raw frames straight into numpy.
+
+Sources can be a path, an upload ingestion already spooled to disk, or an in-memory
+upload. In-memory bytes are handed to ffmpeg through an anonymous memory file
+(memfd) rather than stdin, because MP4/MOV containers with the index at the end
+need a seekable input; nothing is written to disk. Where memfd is unavailable the
+bytes are spooled to a temp file instead.
+
+  iter_pcm       mono float32 PCM at a requested sample rate, chunk by chunk
+  iter_frames    uint8 frames (rgb24 or bgr24) at a requested size and frame rate
+  sample_frames  `num_frames` frames spread over the clip, same contract as frame_sampler
+
+A stream read to the end raises MediaDecodeError if ffmpeg exited with an error.
+"""
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from collections import namedtuple
+from contextlib import contextmanager
+
+import imageio_ffmpeg
+import numpy as np
+
+from ingest import upload_path
+
+FFMPEG_PATH = imageio_ffmpeg.get_ffmpeg_exe()
+PCM_CHUNK_SAMPLES = 22050 * 5  # ~430 KB of float32 per chunk
+
+MediaInfo = namedtuple("MediaInfo", "duration fps width height has_video has_audio")
+
+
+# --------------------- INPUTS ---------------------
+
+def spool_to_tempfile(file, chunk_size=1 << 20):
+    """Copies an upload stream to a temp file in fixed-size chunks and returns its path."""
+    file.seek(0)
+    suffix = os.path.splitext(getattr(file, "filename", "") or "")[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        shutil.copyfileobj(file, tmp, chunk_size)
+    file.seek(0)
+    return tmp.name
+
+
+def local_copy(file):
+    """(path, temporary): the upload's spool file when ingestion already wrote one, else a fresh temp copy."""
+    path = upload_path(file)
+    if path is not None:
+        return path, False
+    return spool_to_tempfile(file), True
+
+
+@contextmanager
+def media_input(source):
+    """Yields (ffmpeg input argument, fds the ffmpeg process must inherit) for `source`."""
+    if isinstance(source, (str, os.PathLike)):
+        yield os.fspath(source), ()
+        return
+    path = upload_path(source)
+    if path is not None:
+        yield path, ()
+        return
+
+    stream = getattr(source, "stream", source)
+    if not hasattr(os, "memfd_create"):
+        path = spool_to_tempfile(source)
+        try:
+            yield path, ()
+        finally:
+            os.unlink(path)
+        return
+
+    fd = os.memfd_create("stegoshield-upload")
+    try:
+        stream.seek(0)
+        with os.fdopen(os.dup(fd), "wb") as memory_file:
+            shutil.copyfileobj(stream, memory_file, 1 << 20)
+        stream.seek(0)
+        yield f"/dev/fd/{fd}", (fd,)  # opened afresh by ffmpeg, so it can seek
+    finally:
+        os.close(fd)
+
+
+class MediaDecodeError(RuntimeError):
+    """ffmpeg exited with an error; the message carries what it printed."""
+
+
+class MissingStreamError(MediaDecodeError):
+    """The file has no stream of the kind that was asked for."""
+
+
+_MISSING_STREAM = ("matches no streams", "does not contain any stream")
+
+
+def _spawn(input_arg, output_args, pass_fds=()):
+    cmd = [FFMPEG_PATH, "-nostdin", "-v", "error", "-i", input_arg, *output_args]
+    # stderr goes to a temp file, not a pipe, so a chatty ffmpeg cannot block on it while we read stdout
+    log = tempfile.TemporaryFile()
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=log, pass_fds=pass_fds)
+    except Exception:
+        log.close()
+        raise
+    proc.log = log
+    return proc
+
+
+def _stop(proc, finished=False):
+    """Reaps ffmpeg; once its output was read to the end, raises MediaDecodeError if it failed.
+
+    Otherwise (the caller stopped early or hit an error) ffmpeg is killed and its exit code ignored.
+    """
+    proc.stdout.close()
+    if not finished:
+        proc.kill()
+    proc.wait()
+    try:
+        if finished and proc.returncode != 0:
+            proc.log.seek(0)
+            message = proc.log.read().decode("utf-8", "replace").strip() or "no output"
+            error = MissingStreamError if any(m in message for m in _MISSING_STREAM) else MediaDecodeError
+            raise error(f"ffmpeg exited with code {proc.returncode}: {message.splitlines()[-1]}")
+    finally:
+        proc.log.close()
+
+
+# --------------------- PROBING ---------------------
+
+_DURATION = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_VIDEO = re.compile(r"Stream #.*?Video: .*?(\d{2,5})x(\d{2,5})")
+_FPS = re.compile(r"(\d+(?:\.\d+)?) (?:fps|tbr)")
+
+
+def parse_header(text):
+    """MediaInfo from the stream summary `ffmpeg -i` prints; unknown values are 0."""
+    duration = fps = 0.0
+    width = height = 0
+    match = _DURATION.search(text)
+    if match:
+        hours, minutes, seconds = match.groups()
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    video_line = next((line for line in text.splitlines() if "Video:" in line and "Stream #" in line), "")
+    match = _VIDEO.search(video_line)
+    if match:
+        width, height = int(match.group(1)), int(match.group(2))
+    match = _FPS.search(video_line)
+    if match:
+        fps = float(match.group(1))
+    has_audio = any("Audio:" in line and "Stream #" in line for line in text.splitlines())
+    return MediaInfo(duration, fps, width, height, bool(video_line), has_audio)
+
+
+def probe(source):
+    """Duration, frame rate, frame size and which streams exist, from the container header."""
+    with media_input(source) as (input_arg, pass_fds):
+        cmd = [FFMPEG_PATH, "-nostdin", "-hide_banner", "-i", input_arg]
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, pass_fds=pass_fds)
+    return parse_header(result.stderr.decode("utf-8", "replace"))
+
+
+# --------------------- AUDIO ---------------------
+
+def _pcm_args(sample_rate, target):
+    args = ["-map", "0:a:0", "-ac", "1"]
+    if sample_rate:
+        args += ["-ar", str(sample_rate)]
+    return args + ["-f", "f32le", target]
+
+
+def iter_pcm(source, sample_rate=None, chunk_samples=PCM_CHUNK_SAMPLES):
+    """Yields mono float32 PCM at `sample_rate` (the file's own rate if None), one chunk at a time.
+
+    Files without an audio stream yield nothing. Closing the generator stops ffmpeg.
+    """
+    with media_input(source) as (input_arg, pass_fds):
+        proc = _spawn(input_arg, _pcm_args(sample_rate, "pipe:1"), pass_fds)
+        chunk_bytes = chunk_samples * 4
+        finished = False
+        try:
+            while True:
+                data = proc.stdout.read(chunk_bytes)
+                if not data:
+                    break
+                # Keep whole samples only; a short read at EOF can split a float
+                usable = len(data) - len(data) % 4
+                if usable:
+                    yield np.frombuffer(data[:usable], dtype=np.float32)
+            finished = True
+        finally:
+            try:
+                _stop(proc, finished)
+            except MissingStreamError:
+                pass  # no audio stream: nothing to yield
+
+
+# --------------------- VIDEO ---------------------
+
+def _frame_args(width, height, size=None, fps=None, select=None, pix_fmt="rgb24", target="pipe:1"):
+    filters = []
+    if select:
+        filters.append(f"select='{select}'")
+    if fps:
+        filters.append(f"fps={fps}")
+    if size is not None and tuple(size) != (width, height):
+        # Bilinear, the same interpolation as cv2.resize's default
+        filters.append(f"scale={size[0]}:{size[1]}:flags=bilinear")
+    args = ["-map", "0:v:0"]
+    if filters:
+        args += ["-vf", ",".join(filters)]
+    if select:
+        args += ["-fps_mode", "passthrough"]  # emit only the selected frames, without duplicates
+    return args + ["-f", "rawvideo", "-pix_fmt", pix_fmt, target]
+
+
+def _output_shape(source, size):
+    if size is not None:
+        return None, size
+    info = probe(source)
+    return info, (info.width, info.height)
+
+
+def iter_frames(source, size=None, fps=None, pix_fmt="rgb24", select=None):
+    """Yields (H, W, 3) uint8 frames, resized to `size` (width, height) unless it is None.
+
+    `fps` resamples the frame rate; `select` is an ffmpeg select expression over
+    the frame number `n`. Use pix_fmt="bgr24" for frames that go back into OpenCV.
+    """
+    info, (width, height) = _output_shape(source, size)
+    if width <= 0 or height <= 0:
+        return
+    source_size = (info.width, info.height) if info is not None else None
+    with media_input(source) as (input_arg, pass_fds):
+        output = _frame_args(*(source_size or (0, 0)), size=size, fps=fps, select=select, pix_fmt=pix_fmt)
+        proc = _spawn(input_arg, output, pass_fds)
+        finished = False
+        try:
+            while True:
+                frame = np.empty((height, width, 3), dtype=np.uint8)
+                if proc.stdout.readinto(memoryview(frame).cast("B")) != frame.nbytes:
+                    break
+                yield frame
+            finished = True
+        finally:
+            try:
+                _stop(proc, finished)
+            except MissingStreamError:
+                pass  # no video stream: nothing to yield
+
+
+def sample_frames(source, num_frames=10, size=(224, 224), strategy="uniform", rng=None):
+    """frame_sampler.sample_frames() over an ffmpeg pipe: no file path or temp file needed.
+
+    ffmpeg decodes the stream sequentially and converts only the selected frames,
+    which match OpenCV's decode pixel for pixel (tests/test_media_decode.py). The
+    frame count is estimated from duration x fps, so on some containers indices can
+    be a frame off OpenCV's count.
+    """
+    import cv2
+    from frame_sampler import sample_indices
+
+    info = probe(source)
+    frame_count = int(round(info.duration * info.fps))
+    out_w, out_h = size if size is not None else (info.width, info.height)
+    frames = np.zeros((num_frames, out_h, out_w, 3), dtype=np.uint8)
+    if frame_count <= 0 or out_w <= 0 or out_h <= 0:
+        return frames
+
+    indices = sample_indices(frame_count, num_frames, strategy, rng)
+    wanted = sorted(set(indices.tolist()))
+    select = "+".join(f"eq(n\\,{i})" for i in wanted)
+    decoded = {}
+    # Full-size frames resized by OpenCV, so the pixels match what the model was trained on
+    for index, frame in zip(wanted, iter_frames(source, (info.width, info.height), select=select)):
+        if (frame.shape[1], frame.shape[0]) != (out_w, out_h):
+            frame = cv2.resize(frame, (out_w, out_h))
+        decoded[index] = frame
+
+    last_good = None
+    for i, index in enumerate(indices.tolist()):
+        if index in decoded:
+            frames[i] = decoded[index]
+            last_good = i
+        elif last_good is not None:
+            frames[i] = frames[last_good]  # past the real end of the stream: repeat, as frame_sampler does
+    return frames
+
@@ -0,0 +1,213 @@
+import bisect
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Fraction of requests that log their per-stage debug output; ?debug=1 always does
+DEBUG_SAMPLE_RATE = float(os.getenv("DEBUG_SAMPLE_RATE", 0.0))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_model_version = ContextVar("model_version", default="unknown")
+_debug_sampled = ContextVar("debug_sampled", default=False)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# --------------------- METRIC TYPES (Prometheus text format 0.0.4) ---------------------
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key, [("le", "+Inf")])
+                lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(float(series[-2]))}")
+                lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "stegoshield_stage_seconds", "Time spent in one stage of a scan.", ("stage", "modality", "model_version")))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "stegoshield_request_seconds", "End-to-end scan request time.", ("endpoint", "modality", "model_version")))
+ERRORS = REGISTRY.register(Counter(
+    "stegoshield_errors_total", "Scans that failed, by the stage that raised.", ("stage", "modality")))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "stegoshield_cache_lookups_total", "Prediction cache lookups by outcome.", ("result",)))
+VERDICTS = REGISTRY.register(Counter(
+    "stegoshield_verdicts_total", "Verdicts returned, by modality and result.", ("modality", "result")))
+ADMISSION_QUEUED = REGISTRY.register(Gauge(
+    "stegoshield_admission_queued", "Scans waiting for an inference slot.", ("lane",)))
+ADMISSION_RUNNING = REGISTRY.register(Gauge(
+    "stegoshield_admission_running", "Scans holding an inference slot.", ("lane",)))
+ADMISSION_REJECTIONS = REGISTRY.register(Counter(
+    "stegoshield_admission_rejections_total", "Scans turned away by admission control.", ("lane", "reason")))
+VIDEO_FRAMES_USED = REGISTRY.register(Histogram(
+    "stegoshield_video_frames_used", "Frames an incremental video scan decoded before its verdict.",
+    buckets=(1, 2, 4, 6, 8, 10, 12, 16, 24, 32)))
+ADMISSION_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "stegoshield_admission_wait_seconds", "Time a scan waited in its lane for an inference slot.", ("lane",)))
+
+
+# --------------------- HELPERS FOR THE SCAN PATH ---------------------
+
+@contextmanager
+def model_version(version):
+    """Labels the observations made in this block, on this thread, with the model version a scan runs on.
+
+    Threads that serve many scans (schedulers, pool feeders, the uploader) pass
+    their version to observe_stage() instead.
+    """
+    token = _model_version.set(version)
+    try:
+        yield
+    finally:
+        _model_version.reset(token)
+
+
+def observe_stage(stage, modality, seconds, model_version=None):
+    STAGE_SECONDS.observe(seconds, stage=stage, modality=modality,
+                          model_version=model_version or _model_version.get())
+
+
+def observe_request(endpoint, modality, seconds, model_version=None):
+    REQUEST_SECONDS.observe(seconds, endpoint=endpoint, modality=modality,
+                            model_version=model_version or _model_version.get())
+
+
+@contextmanager
+def timed(stage, modality):
+    """Times the block into stegoshield_stage_seconds and counts it in stegoshield_errors_total if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS.inc(stage=stage, modality=modality)
+        raise
+    finally:
+        observe_stage(stage, modality, time.perf_counter() - started)
+
+
+def render():
+    return REGISTRY.render()
+
+
+# --------------------- SAMPLED DEBUG OUTPUT ---------------------
+
+def start_debug_sample(force=False):
+    """Decides whether the current request logs its debug output; call once per request."""
+    sampled = force or (DEBUG_SAMPLE_RATE > 0 and random.random() < DEBUG_SAMPLE_RATE)
+    _debug_sampled.set(sampled)
+    return sampled
+
+
+def debug(*args):
+    if _debug_sampled.get():
+        print(*args)
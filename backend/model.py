@@ -4,14 +4,66 @@ import torchvision.transforms as transforms
 import torchvision.models as models
 from torchvision.models import resnet18, ResNet18_Weights, efficientnet_v2_s, EfficientNet_V2_S_Weights
 from PIL import Image
+import numpy as np
 import io
-import random
+import os
+import hashlib
+import time
+from functools import lru_cache
+from dotenv import load_dotenv
+from audio_features import (preprocess_audio, file_to_spectrogram, spectrogram_windows, window_seconds,
+                            SAMPLE_RATE, TARGET_SHAPE)
+import media_decode
+from media_decode import local_copy
+from ingest import spooled_upload
+from frame_sampler import sample_frames, iter_sampled_frames, frames_to_tensor
+from stat_filter import prefilter, STAT_FILTER_ENABLED
+from metrics import timed, observe_stage, debug, VERDICTS, VIDEO_FRAMES_USED
+
+load_dotenv()
+
+IMAGE_MODEL_PATH = os.getenv("IMAGE_MODEL_PATH", "models/image_model.pth")
+IMAGE_INT8_MODEL_PATH = os.getenv("IMAGE_INT8_MODEL_PATH", "models/image_model_int8.pt")
+IMAGE_MODEL_PRECISION = os.getenv("IMAGE_MODEL_PRECISION", "fp32")  # fp32 | int8
+AUDIO_MODEL_PATH = os.getenv("AUDIO_MODEL_PATH", "models/best_audio_model.pth")
+VIDEO_MODEL_PATH = os.getenv("VIDEO_MODEL_PATH", "models/video.pth")
+VIDEO_NUM_FRAMES = int(os.getenv("VIDEO_NUM_FRAMES", 10))  # frames sampled across the clip, as in training
+VIDEO_DECODER = os.getenv("VIDEO_DECODER", "opencv")  # opencv (seeks, needs a file) | ffmpeg (pipe, no temp copy)
+VIDEO_ANALYSIS_MODE = os.getenv("VIDEO_ANALYSIS_MODE", "fixed")  # fixed | incremental (early exit)
+VIDEO_STEP_FRAMES = int(os.getenv("VIDEO_STEP_FRAMES", 2))  # frames fed to the LSTM per incremental step
+VIDEO_EXIT_CONFIDENCE = float(os.getenv("VIDEO_EXIT_CONFIDENCE", 0.9))
+VIDEO_EXIT_PATIENCE = int(os.getenv("VIDEO_EXIT_PATIENCE", 2))  # consecutive confident steps before stopping
+VIDEO_MAX_FRAMES = int(os.getenv("VIDEO_MAX_FRAMES", VIDEO_NUM_FRAMES))  # frame budget, spread over the clip
+VIDEO_BACKBONE_FRAMES = int(os.getenv("VIDEO_BACKBONE_FRAMES", 8))  # frames per backbone call; see video_forward.py
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")  # torch | onnx
+
+IMAGE_ANALYSIS_MODE = os.getenv("IMAGE_ANALYSIS_MODE", "resize")  # resize | tiled
+TILE_SIZE = 224
+TILE_MAX_COUNT = int(os.getenv("TILE_MAX_COUNT", 64))
+TILE_BATCH_SIZE = int(os.getenv("TILE_BATCH_SIZE", 16))
+TILE_AGGREGATE = os.getenv("TILE_AGGREGATE", "max")  # max | mean | topk
+TILE_TOP_K = int(os.getenv("TILE_TOP_K", 4))
+
+# crop scores the first 300 frames, as the model was trained; windowed scans the whole file, but scales each
+# window on its own and skips the trim, so its verdicts differ and have not been evaluated yet
+AUDIO_ANALYSIS_MODE = os.getenv("AUDIO_ANALYSIS_MODE", "crop")  # crop | windowed
+AUDIO_WINDOW_HOP = int(os.getenv("AUDIO_WINDOW_HOP", TARGET_SHAPE[1] // 2))  # frames between window starts
+AUDIO_WINDOW_BATCH_SIZE = int(os.getenv("AUDIO_WINDOW_BATCH_SIZE", 8))
+AUDIO_WINDOW_AGGREGATE = os.getenv("AUDIO_WINDOW_AGGREGATE", "max")  # max | mean | topk
+# Stop reading once a window scores at least this for the stego class; 0 reads the whole file
+AUDIO_EARLY_STOP_SCORE = float(os.getenv("AUDIO_EARLY_STOP_SCORE", 0))
+MODEL_VERSION = os.getenv("MODEL_VERSION")
+WARMUP_ITERATIONS = int(os.getenv("WARMUP_ITERATIONS", 3))  # forwards per model before the app reports ready
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.flac', '.m4a', '.mp4', '.mov')
+VIDEO_EXTENSIONS = ('.mp4', '.mov')
 
 # 🟢 Image Model (ResNet18)
 class ImageStegoCNN(nn.Module):
-    def __init__(self):
+    def __init__(self, pretrained=True):
         super(ImageStegoCNN, self).__init__()
-        self.model = models.resnet18(weights=ResNet18_Weights.DEFAULT)  # ✅ Fixed pretrained weights
+        self.model = models.resnet18(weights=ResNet18_Weights.DEFAULT if pretrained else None)  # ✅ Fixed pretrained weights
         self.model.fc = nn.Linear(self.model.fc.in_features, 2)
 
     def forward(self, x):
@@ -51,11 +103,27 @@ class AudioStegoCNN(nn.Module):
         x = self.fc2(x)
         return x
 
+# 🟢 Audio Model (ResNet34 on spectrograms, as trained by audio_steganography.py)
+class ResNet34Audio(nn.Module):
+    def __init__(self, num_classes=2):
+        super(ResNet34Audio, self).__init__()
+        self.resnet34 = models.resnet34(weights=None)  # weights come from the checkpoint
+        self.resnet34.conv1 = nn.Conv2d(1, 64, kernel_size=7, stride=2, padding=3, bias=False)
+        num_ftrs = self.resnet34.fc.in_features
+        self.resnet34.fc = nn.Sequential(
+            nn.BatchNorm1d(num_ftrs),
+            nn.Dropout(0.5),
+            nn.Linear(num_ftrs, num_classes)
+        )
+
+    def forward(self, x):
+        return self.resnet34(x)
+
 # 🟢 Video Model (EfficientNet + LSTM)
 class VideoStegoModel(nn.Module):
-    def __init__(self):
+    def __init__(self, pretrained=True):
         super(VideoStegoModel, self).__init__()
-        self.cnn = models.efficientnet_v2_s(weights=EfficientNet_V2_S_Weights.DEFAULT)  # ✅ Fixed weights
+        self.cnn = models.efficientnet_v2_s(weights=EfficientNet_V2_S_Weights.DEFAULT if pretrained else None)  # ✅ Fixed weights
         self.cnn.classifier = nn.Sequential(  # ✅ Fixed classifier layer
             nn.Linear(self.cnn.classifier[1].in_features, 128),
             nn.ReLU()
@@ -64,84 +132,486 @@ class VideoStegoModel(nn.Module):
         self.fc = nn.Linear(64, 2)
         
     def forward(self, x):
+        return self.step(x)[0]
+
+    def step(self, x, state=None):
+        """Feeds (B, T, C, H, W) frames through the LSTM from `state`; returns (logits, state).
+
+        Feeding a clip group by group, passing the state along, gives the same
+        logits as forward() on the whole clip.
+        """
         batch_size, timesteps, C, H, W = x.shape
-        cnn_features = [self.cnn(x[:, t, :, :, :]) for t in range(timesteps)]
-        cnn_features = torch.stack(cnn_features, dim=1)
-        lstm_out, _ = self.lstm(cnn_features)
-        return self.fc(lstm_out[:, -1, :])
+        frames = x.reshape(batch_size * timesteps, C, H, W)
+        if torch.jit.is_tracing():
+            cnn_features = self.cnn(frames)  # a traced split would fix the group sizes of the example clip
+        else:
+            # Batch and time folded, in groups: one call over 64 frames is slower on CPU than the per-frame loop
+            cnn_features = torch.cat([self.cnn(group) for group in frames.split(VIDEO_BACKBONE_FRAMES)])
+        cnn_features = cnn_features.view(batch_size, timesteps, -1)
+        lstm_out, state = self.lstm(cnn_features, state)
+        return self.fc(lstm_out[:, -1, :]), state
 
-# ✅ 🚀 Fixed Model Loading Function
-def load_model():
-    model = ImageStegoCNN()
-    model.load_state_dict(torch.load("models/image_model.pth", map_location=torch.device('cpu')))
+def read_checkpoint(path, mmap=False):
+    """State dict from `path`; with mmap the tensors are views of the file's pages, not copies.
+
+    Memory-mapped weights are shared through the page cache by every process that
+    maps the same file, instead of each worker holding a private copy.
+    """
+    return torch.load(path, map_location=torch.device('cpu'), mmap=mmap)
+
+def _with_weights(model, state_dict, mmap=False, path=None):
+    model.load_state_dict(state_dict, assign=mmap)  # assign keeps the mapped tensors instead of copying them
+    model.weights_mmapped = mmap
+    model.checkpoint_path = path  # lets another process map the same file instead of copying the weights
     model.eval()
     return model
 
+def load_audio_model(path=AUDIO_MODEL_PATH, mmap=False):
+    # best_audio_model.pth holds a ResNet34Audio; older checkpoints hold an AudioStegoCNN
+    state_dict = read_checkpoint(path, mmap)
+    if any(key.startswith("resnet34.") for key in state_dict):
+        model = ResNet34Audio()
+    else:
+        model = AudioStegoCNN()
+    return _with_weights(model, state_dict, mmap, path)
+
+def load_video_model(path=VIDEO_MODEL_PATH, mmap=False):
+    state_dict = read_checkpoint(path, mmap)
+    # video_steganography.py trains with a bare Linear classifier; ours wraps it in Sequential(Linear, ReLU)
+    for name in ("weight", "bias"):
+        if f"cnn.classifier.{name}" in state_dict:
+            state_dict[f"cnn.classifier.0.{name}"] = state_dict.pop(f"cnn.classifier.{name}")
+    model = VideoStegoModel(pretrained=False)  # weights come from the checkpoint
+    return _with_weights(model, state_dict, mmap, path)
+
+def _image_weights_path():
+    if IMAGE_MODEL_PRECISION == "int8":
+        if os.path.exists(IMAGE_INT8_MODEL_PATH):
+            return IMAGE_INT8_MODEL_PATH
+        print(f"⚠️ INT8 image model not found at {IMAGE_INT8_MODEL_PATH}; serving fp32")
+    return IMAGE_MODEL_PATH
+
+def load_image_model(path=None, mmap=False):
+    path = path or _image_weights_path()
+    if path == IMAGE_INT8_MODEL_PATH:
+        return load_torchscript_model(path)
+    model = ImageStegoCNN(pretrained=False)  # weights come from the checkpoint
+    return _with_weights(model, read_checkpoint(path, mmap), mmap, path)
+
+def load_torchscript_model(path):
+    # TorchScript artifacts, e.g. the int8 model written by create_model/modelTraining/quantize_image_model.py
+    model = torch.jit.load(path, map_location=torch.device('cpu'))
+    model.eval()
+    return model
+
+def load_checkpoint_model(modality, path, mmap=False):
+    """The state-dict checkpoint at `path` in `modality`'s architecture."""
+    loader = {"image": load_image_model, "audio": load_audio_model, "video": load_video_model}[modality]
+    return loader(path, mmap=mmap)
+
+# ✅ 🚀 Fixed Model Loading Function
+def load_model():
+    """Returns the full model dict, keyed by modality."""
+    if INFERENCE_BACKEND == "onnx":
+        # Graphs written by onnx_export.py, run on onnxruntime's CPU provider
+        from onnx_backend import load_onnx_models, ONNX_MODEL_DIR
+        models_by_modality = load_onnx_models()
+        if "image" not in models_by_modality:
+            raise FileNotFoundError(f"No image.onnx in {ONNX_MODEL_DIR}; run onnx_export.py first")
+        return models_by_modality
+
+    models_by_modality = {"image": load_image_model()}
+
+    if os.path.exists(AUDIO_MODEL_PATH):
+        models_by_modality["audio"] = load_audio_model()
+    else:
+        print(f"⚠️ Audio model not found at {AUDIO_MODEL_PATH}; audio scans are disabled")
+
+    if os.path.exists(VIDEO_MODEL_PATH):
+        models_by_modality["video"] = load_video_model()
+    else:
+        print(f"⚠️ Video model not found at {VIDEO_MODEL_PATH}; videos are scanned by their soundtrack")
+    return models_by_modality
+
+@lru_cache(maxsize=1)
+def get_model_version():
+    """Short digest of the checkpoints being served, unless MODEL_VERSION pins one."""
+    if MODEL_VERSION:
+        return MODEL_VERSION
+    digest = hashlib.sha256()
+    paths = (_image_weights_path(), AUDIO_MODEL_PATH, VIDEO_MODEL_PATH)
+    if INFERENCE_BACKEND == "onnx":
+        from onnx_backend import onnx_model_path, MODALITIES
+        paths = tuple(onnx_model_path(m) for m in MODALITIES)
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+def open_image(image_file):
+    """Decodes an upload to RGB; already-decoded images pass straight through."""
+    if isinstance(image_file, Image.Image):
+        return image_file
+    spool = spooled_upload(image_file)
+    if spool is not None and spool.size:
+        return Image.open(spool.mmap()).convert("RGB")  # decode straight from the spooled bytes
+    image_file.seek(0)  # 👈 reset file pointer to beginning
+    return Image.open(image_file).convert("RGB")
+
 # Preprocess image for model prediction
+# Serving input pipeline for the image model; INT8 calibration reuses it so both see the same inputs
+image_transform = transforms.Compose([
+    transforms.Resize((224, 224)),
+    transforms.ToTensor()
+])
+
 def preprocess_image(image_file):
-    image_file.seek(0)  # 👈 reset file pointer to beginning
-    image = Image.open(image_file).convert("RGB")
-    transform = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor()
-    ])
-    return transform(image).unsqueeze(0)  # Add batch dimension
+    image = open_image(image_file)
+    return image_transform(image).unsqueeze(0)  # Add batch dimension
+
+def preprocess_video(video_file, num_frames=VIDEO_NUM_FRAMES):
+    """Returns (1, num_frames, 3, 224, 224) frames sampled across the whole clip."""
+    if VIDEO_DECODER == "ffmpeg":
+        return frames_to_tensor(media_decode.sample_frames(video_file, num_frames, (224, 224))).unsqueeze(0)
+    path, temporary = local_copy(video_file)
+    try:
+        frames = sample_frames(path, num_frames=num_frames, size=(224, 224))
+    finally:
+        if temporary:
+            os.unlink(path)
+    return frames_to_tensor(frames).unsqueeze(0)
+
+def _tile_starts(length, tile_size):
+    # Non-overlapping tiles plus one flush with the far edge, so no pixels are skipped
+    starts = list(range(0, max(length - tile_size, 0) + 1, tile_size))
+    if length > tile_size and starts[-1] + tile_size < length:
+        starts.append(length - tile_size)
+    return starts
+
+def preprocess_image_tiles(image_file, tile_size=TILE_SIZE, max_tiles=TILE_MAX_COUNT):
+    """Cuts the full-resolution image into tile_size x tile_size tiles without resampling.
+
+    Returns (tiles [N, 3, tile_size, tile_size], [(x, y), ...]). Images smaller than a
+    tile are zero-padded; when there are more than `max_tiles` tiles, an evenly spaced
+    subset is kept so latency stays bounded and repeat scans see the same tiles.
+    """
+    pixels = np.asarray(open_image(image_file))
+    height, width = pixels.shape[:2]
+    if height < tile_size or width < tile_size:
+        padded = np.zeros((max(height, tile_size), max(width, tile_size), 3), dtype=np.uint8)
+        padded[:height, :width] = pixels
+        pixels, height, width = padded, padded.shape[0], padded.shape[1]
+
+    positions = [(x, y) for y in _tile_starts(height, tile_size) for x in _tile_starts(width, tile_size)]
+    if len(positions) > max_tiles:
+        keep = np.linspace(0, len(positions) - 1, max_tiles).round().astype(int)
+        positions = [positions[i] for i in keep]
+
+    tiles = np.empty((len(positions), tile_size, tile_size, 3), dtype=np.uint8)
+    for i, (x, y) in enumerate(positions):
+        tiles[i] = pixels[y:y + tile_size, x:x + tile_size]
+    # Same scaling as transforms.ToTensor(): HWC uint8 -> CHW float in [0, 1]
+    tiles = torch.from_numpy(tiles).permute(0, 3, 1, 2).float().div_(255.0)
+    return tiles, positions
+
+def aggregate_tile_scores(scores, method=TILE_AGGREGATE, top_k=TILE_TOP_K):
+    if method == "mean":
+        return float(scores.mean())
+    if method == "topk":
+        k = min(top_k, scores.numel())
+        return float(scores.topk(k).values.mean())
+    return float(scores.max())
+
+def _stego_scores(group, model, scheduler=None, modality="image"):
+    """Stego-class probability for every sample of a batch."""
+    if scheduler is not None:
+        output = scheduler.run(group)
+    else:
+        with timed("forward", modality), torch.no_grad():
+            output = model(group)
+    return torch.softmax(output, dim=1)[:, 1]
+
+def analyze_image_tiles(image_file, model, scheduler=None):
+    """Scores every tile for the stego class and aggregates them into one verdict."""
+    tiles, positions = preprocess_image_tiles(image_file)
+    scores = []
+    for start in range(0, tiles.shape[0], TILE_BATCH_SIZE):
+        scores.append(_stego_scores(tiles[start:start + TILE_BATCH_SIZE], model, scheduler, "image"))
+    scores = torch.cat(scores)
+
+    score = aggregate_tile_scores(scores)
+    result = "Malicious" if score >= 0.5 else "Safe"
+    confidence = score if result == "Malicious" else 1.0 - score
+    tile_scores = [
+        {"x": x, "y": y, "score": round(float(s), 4)} for (x, y), s in zip(positions, scores)
+    ]
+    return result, round(confidence, 2), tile_scores
+
+def analyze_audio_windows(audio_file, model, scheduler=None):
+    """Scores overlapping spectrogram windows across the whole recording and aggregates them.
+
+    Returns (result, confidence, window_scores, stopped_early). With AUDIO_EARLY_STOP_SCORE
+    set, decoding stops at the first window that reaches it.
+    """
+    windows = spectrogram_windows(audio_file, hop=AUDIO_WINDOW_HOP)
+    scores, starts, group, group_starts = [], [], [], []
+    decode_seconds, stopped_early = 0.0, False
+
+    def score_group():
+        scores.append(_stego_scores(torch.stack(group), model, scheduler, "audio"))
+        starts.extend(group_starts)
+        group.clear()
+        group_starts.clear()
+        return AUDIO_EARLY_STOP_SCORE > 0 and float(scores[-1].max()) >= AUDIO_EARLY_STOP_SCORE
+
+    try:
+        while True:
+            decode_started = time.perf_counter()
+            try:
+                start, window = next(windows)
+            except StopIteration:
+                break
+            finally:
+                decode_seconds += time.perf_counter() - decode_started
+            group.append(window)
+            group_starts.append(start)
+            if len(group) == AUDIO_WINDOW_BATCH_SIZE and score_group():
+                stopped_early = True
+                break
+        if group and not stopped_early:
+            stopped_early = score_group()
+    finally:
+        windows.close()  # stops ffmpeg when we leave before the end
+        observe_stage("decode", "audio", decode_seconds)
+    scores = torch.cat(scores)
+
+    # A confidently malicious window decides the verdict, whatever the rest would have averaged to
+    score = float(scores.max()) if stopped_early else aggregate_tile_scores(scores, AUDIO_WINDOW_AGGREGATE)
+    result = "Malicious" if score >= 0.5 else "Safe"
+    confidence = score if result == "Malicious" else 1.0 - score
+    window_scores = [
+        {"start_s": round(window_seconds(f), 2), "end_s": round(window_seconds(f + TARGET_SHAPE[1]), 2),
+         "score": round(float(s), 4)}
+        for f, s in zip(starts, scores)
+    ]
+    return result, round(confidence, 2), window_scores, stopped_early
+
+def video_exit_settled(scores, threshold=VIDEO_EXIT_CONFIDENCE, patience=VIDEO_EXIT_PATIENCE):
+    """True once the last `patience` step scores all call the same class with at least `threshold` confidence."""
+    if patience <= 0 or len(scores) < patience:
+        return False
+    recent = scores[-patience:]
+    return all(s >= threshold for s in recent) or all(1.0 - s >= threshold for s in recent)
+
+def analyze_video_incremental(video_file, model, max_frames=VIDEO_MAX_FRAMES, step_frames=VIDEO_STEP_FRAMES,
+                              threshold=VIDEO_EXIT_CONFIDENCE, patience=VIDEO_EXIT_PATIENCE):
+    """Feeds sampled frames to the LSTM a few at a time and stops decoding once the verdict has settled.
+
+    The `max_frames` sample positions are spread over the whole clip, like the fixed
+    mode; frames are decoded only as the LSTM asks for them. Returns (result,
+    confidence, frames_used, step_scores); without an early exit the verdict equals
+    the fixed mode's on the same frames. `video_file` may also be a path; patience=0
+    never exits early.
+    """
+    path, temporary = (video_file, False) if isinstance(video_file, str) else local_copy(video_file)
+    frames = iter_sampled_frames(path, num_frames=max_frames, size=(224, 224))
+    state, logits, used, scores = None, None, 0, []
+    decode_seconds = 0.0
+    try:
+        while used < max_frames:
+            decode_started = time.perf_counter()
+            group = [frame for _, frame in zip(range(min(step_frames, max_frames - used)), frames)]
+            decode_seconds += time.perf_counter() - decode_started
+            if not group:
+                break
+            with timed("forward", "video"), torch.no_grad():
+                logits, state = model.step(frames_to_tensor(np.stack(group)).unsqueeze(0), state)
+            used += len(group)
+            scores.append(float(torch.softmax(logits, dim=1)[0, 1]))
+            if video_exit_settled(scores, threshold, patience):
+                break
+    finally:
+        frames.close()
+        observe_stage("decode", "video", decode_seconds)
+        if temporary:
+            os.unlink(path)
+    VIDEO_FRAMES_USED.observe(used)
+
+    score = scores[-1]
+    result = "Malicious" if score >= 0.5 else "Safe"
+    confidence = score if result == "Malicious" else 1.0 - score
+    return result, round(confidence, 2), used, scores
+
+def _classify(input_data, model, scheduler=None, modality="image"):
+    # 🔹 Share a forward pass with concurrent requests when a batch scheduler is running
+    if scheduler is not None:
+        return scheduler.classify(input_data)
+
+    with timed("forward", modality), torch.no_grad():
+        output = model(input_data)
+    prediction = torch.argmax(output, dim=1).item()
+    confidence = torch.softmax(output, dim=1).max().item()
+
+    result = "Malicious" if prediction == 1 else "Safe"
+    return result, round(confidence, 2)
 
 # Predict function to detect malicious payloads
 
-def predict(file, model):
-    print("📥 Inside predict()")
-    print("Filename:", file.filename)
+def file_modality(filename):
+    """Metrics label for an upload, from its extension."""
+    filename = filename.lower()
+    if filename.endswith(IMAGE_EXTENSIONS):
+        return "image"
+    if filename.endswith(VIDEO_EXTENSIONS):
+        return "video"
+    if filename.endswith(AUDIO_EXTENSIONS):
+        return "audio"
+    return "other"
+
+def predict(file, model, schedulers=None, details=None):
+    """Returns (result, confidence). Pass a dict as `details` to collect debugging output such as tile scores."""
+    result, confidence, modality = _predict(file, model, schedulers or {}, details)
+    VERDICTS.inc(modality=modality, result=result)
+    debug(f"✅ {file.filename}: {result} | Confidence: {confidence}")
+    return result, confidence
 
+def _predict(file, model, schedulers, details):
     try:
         filename = file.filename.lower()
 
         # 🔹 If image, run actual model
-        if filename.endswith(('.png', '.jpg', '.jpeg')):
-            print("🖼 Detected as image")
-            input_data = preprocess_image(file)
-
-            print("✅ Running model prediction...")
-            with torch.no_grad():
-                print("🧪 input_data shape:", input_data.shape)
-                output = model(input_data)
-                print("📊 Model output:", output)
-
-                prediction = torch.argmax(output, dim=1).item()
-                confidence = torch.softmax(output, dim=1).max().item()
-
-            result = "Malicious" if prediction == 1 else "Safe"
-            print("✅ Result:", result, "| Confidence:", confidence)
-            return result, round(confidence, 2)
-
-        # 🔹 If audio, do jugaad with 4th char logic
-        elif filename.endswith(('.mp3', '.wav', '.flac', '.m4a' , '.mp4' , '.mov')):
-            print("🎧 Detected as audio file — checking 4th character...")
-
-            if len(filename) >= 4:
-                fourth_char = filename[3]
-
-                if fourth_char == 's':
-                    label = 'Malicious'
-                    confidence = random.uniform(50, 75)/100
-                elif fourth_char == 'c':
-                    label = 'Safe'
-                    confidence = random.uniform(50, 75)/100
-                else:
-                    label = random.choice(['Malicious', 'Safe'])
-                    confidence = random.uniform(10, 40)/100
-            else:
-                print("⚠️ Filename too short to determine 4th character.")
-                label = random.choice(['Malicious', 'Safe'])
-                confidence = random.uniform(10, 40)/100
-
-            print(f"🎯 Jugaad Result: {label} | Confidence: {confidence:.2f}")
-            return label, round(confidence, 2)
+        if filename.endswith(IMAGE_EXTENSIONS):
+            debug("🖼 Detected as image:", file.filename)
+            with timed("decode", "image"):
+                image = open_image(file)  # decode once for every stage below
+
+            # 🔹 Cheap statistical pass first; only ambiguous images reach the CNN
+            if STAT_FILTER_ENABLED:
+                with timed("statistics", "image"):
+                    result, confidence, stats = prefilter.check(np.asarray(image))
+                if details is not None:
+                    details["statistics"] = stats
+                if result is not None:
+                    debug(f"📊 Resolved by statistics: {stats}")
+                    return result, confidence, "image"
+
+            if IMAGE_ANALYSIS_MODE == "tiled":
+                result, confidence, tile_scores = analyze_image_tiles(image, model["image"], schedulers.get("image"))
+                debug(f"🧩 Tiles: {len(tile_scores)} ({TILE_AGGREGATE})")
+                if details is not None:
+                    details["tiles"] = tile_scores
+                    details["tile_aggregate"] = TILE_AGGREGATE
+                return result, confidence, "image"
+
+            with timed("preprocess", "image"):
+                input_data = preprocess_image(image)
+            debug("🧪 input_data shape:", tuple(input_data.shape))
+            result, confidence = _classify(input_data, model["image"], schedulers.get("image"), "image")
+            return result, confidence, "image"
+
+        # 🔹 If video and the video model is loaded, run it on frames sampled across the clip
+        elif filename.endswith(VIDEO_EXTENSIONS) and "video" in model:
+            debug("🎬 Detected as video file:", file.filename)
+            if VIDEO_ANALYSIS_MODE == "incremental" and hasattr(model["video"], "step"):
+                result, confidence, frames_used, step_scores = analyze_video_incremental(file, model["video"])
+                debug(f"⏩ Frames used: {frames_used}/{VIDEO_MAX_FRAMES} in {len(step_scores)} steps")
+                if details is not None:
+                    details["frames_used"] = frames_used
+                    details["frame_budget"] = VIDEO_MAX_FRAMES
+                    details["step_scores"] = [round(s, 4) for s in step_scores]
+                return result, confidence, "video"
+
+            with timed("decode", "video"):
+                input_data = preprocess_video(file)
+            result, confidence = _classify(input_data, model["video"], schedulers.get("video"), "video")
+            return result, confidence, "video"
+
+        # 🔹 If audio (or the soundtrack of a video), run the audio model on its mel spectrogram
+        elif filename.endswith(AUDIO_EXTENSIONS):
+            debug("🎧 Detected as audio file:", file.filename)
+            if "audio" not in model:
+                return "Audio model unavailable", 0.0, "audio"
+
+            if AUDIO_ANALYSIS_MODE == "windowed":
+                try:
+                    result, confidence, window_scores, stopped_early = analyze_audio_windows(
+                        file, model["audio"], schedulers.get("audio"))
+                except ValueError as e:
+                    print("⚠️ Could not extract audio:", e)
+                    return "No audio track", 0.0, "audio"
+                debug(f"🪟 Windows: {len(window_scores)} ({AUDIO_WINDOW_AGGREGATE})"
+                      + (", stopped early" if stopped_early else ""))
+                if details is not None:
+                    details["windows"] = window_scores
+                    details["window_aggregate"] = AUDIO_WINDOW_AGGREGATE
+                    details["stopped_early"] = stopped_early
+                return result, confidence, "audio"
+
+            try:
+                with timed("decode", "audio"):  # ffmpeg decode and mel spectrogram in one streaming pass
+                    input_data = preprocess_audio(file)
+            except ValueError as e:
+                print("⚠️ Could not extract audio:", e)
+                return "No audio track", 0.0, "audio"
+
+            result, confidence = _classify(input_data, model["audio"], schedulers.get("audio"), "audio")
+            return result, confidence, "audio"
 
         else:
-            print("❌ Unsupported file type")
-            return "Unsupported file type", 0.0
+            debug("❌ Unsupported file type:", file.filename)
+            return "Unsupported file type", 0.0, "other"
 
     except Exception as e:
         print("🔥 Exception in predict():", str(e))
         raise e
+
+# --------------------- WARM-UP ---------------------
+
+def warmup_inputs():
+    """One zero sample per modality, in the shape predict() feeds each model."""
+    return {
+        "image": torch.zeros(1, 3, 224, 224),
+        "audio": torch.zeros(1, 1, *TARGET_SHAPE),
+        "video": torch.zeros(1, VIDEO_NUM_FRAMES, 3, 224, 224),
+    }
+
+def _warm_preprocessing():
+    # First calls pay for lazy imports: PIL plugins, librosa's resampler and filter banks, the ffmpeg binary
+    preprocess_image(Image.new("RGB", (256, 256)))
+    import tempfile
+    import wave
+    samples = (np.random.default_rng(0).normal(0, 1000, SAMPLE_RATE)).astype(np.int16)
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
+        path = tmp.name
+    try:
+        with wave.open(path, "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(SAMPLE_RATE)
+            out.writeframes(samples.tobytes())
+        file_to_spectrogram(path)
+    finally:
+        os.unlink(path)
+
+def warm_up(models, iterations=WARMUP_ITERATIONS):
+    """Runs `iterations` forwards through every model in `models` and the preprocessing paths once.
+
+    Primes the allocator, oneDNN kernel selection and lazy imports so the first real
+    request does not pay for them. Returns the ms spent per stage.
+    """
+    timings = {}
+    started = time.perf_counter()
+    _warm_preprocessing()
+    timings["preprocessing"] = round((time.perf_counter() - started) * 1000, 1)
+
+    for modality, inputs in warmup_inputs().items():
+        if modality not in models:
+            continue
+        started = time.perf_counter()
+        with torch.no_grad():
+            for _ in range(max(1, iterations)):
+                models[modality](inputs)
+        timings[modality] = round((time.perf_counter() - started) * 1000, 1)
+    return timings
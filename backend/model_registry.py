@@ -0,0 +1,353 @@
+"""Versioned model registry: immutable model versions on disk and a manifest naming the active one.
+
+Layout under MODEL_REGISTRY_DIR:
+  manifest.json              {"active": "<version>", "versions": {"<version>": {"created_at", "models"}}}
+  <version>/<modality>.<ext> weights, copied in by `publish` and never modified afterwards
+
+Every model entry records its file, format (state_dict | torchscript | onnx), sha256
+and the input spec it is validated against before it serves traffic. state_dict
+checkpoints are loaded with torch.load(mmap=True): the weights stay in the page
+cache, shared by every process serving the same version.
+
+Run from backend/:
+  python model_registry.py publish <version> --image models/image_model.pth [--audio ...] [--video ...] [--activate]
+  python model_registry.py activate <version>
+  python model_registry.py list
+  python model_registry.py verify [<version>]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import torch
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "models/registry")
+MODEL_REGISTRY_POLL_SECONDS = float(os.getenv("MODEL_REGISTRY_POLL_SECONDS", 10))  # 0 disables hot swap
+
+MODALITIES = ("image", "audio", "video")
+FORMATS = ("state_dict", "torchscript", "onnx")
+_VERSION_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+class RegistryError(RuntimeError):
+    pass
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def detect_format(path):
+    if path.lower().endswith(".onnx"):
+        return "onnx"
+    # TorchScript archives carry the serialized code next to the tensors
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            if any("/code/" in name for name in archive.namelist()):
+                return "torchscript"
+    return "state_dict"
+
+
+def default_input_specs():
+    """The shape predict() feeds each model, as recorded in new manifest entries."""
+    from model import warmup_inputs
+    return {m: {"shape": list(t.shape), "dtype": "float32"} for m, t in warmup_inputs().items()}
+
+
+def _load_entry(modality, path, fmt, mmap):
+    import model as model_module
+    if fmt == "onnx":
+        from onnx_backend import OnnxModel
+        return OnnxModel(path)
+    if fmt == "torchscript":
+        return model_module.load_torchscript_model(path)
+    return model_module.load_checkpoint_model(modality, path, mmap=mmap)
+
+
+def validate(modality, loaded, spec):
+    """Runs one zero input of the recorded spec; the model must return (batch, 2) logits."""
+    inputs = torch.zeros(*spec["shape"], dtype=getattr(torch, spec.get("dtype", "float32")))
+    with torch.no_grad():
+        output = loaded(inputs)
+    if tuple(output.shape) != (spec["shape"][0], 2):
+        raise RegistryError(f"{modality} model returned shape {tuple(output.shape)} for input {spec['shape']}")
+
+
+class ModelRegistry:
+    def __init__(self, root=MODEL_REGISTRY_DIR):
+        self.root = root
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self._lock = threading.Lock()
+
+    # --------------------- MANIFEST ---------------------
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"active": None, "versions": {}}
+
+    def _write_manifest(self, manifest):
+        # Written beside the old one and renamed over it, so readers never see half a manifest
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".manifest-", suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def manifest_mtime(self):
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def active_version(self):
+        return self.read_manifest().get("active")
+
+    def versions(self):
+        return self.read_manifest()["versions"]
+
+    def _entry(self, version):
+        entry = self.versions().get(version)
+        if entry is None:
+            raise RegistryError(f"Unknown model version {version!r}")
+        return entry
+
+    # --------------------- PUBLISHING ---------------------
+
+    def publish(self, version, files, activate=False):
+        """Copies {modality: path} into a new immutable version; returns its manifest entry."""
+        if not _VERSION_NAME.match(version or ""):
+            raise RegistryError(f"Invalid version name {version!r}")
+        if "image" not in files:
+            raise RegistryError("A version needs at least an image model")
+        unknown = set(files) - set(MODALITIES)
+        if unknown:
+            raise RegistryError(f"Unknown modalities: {sorted(unknown)}")
+
+        specs = default_input_specs()
+        with self._lock:
+            if version in self.versions():
+                raise RegistryError(f"Version {version!r} already exists; versions are immutable")
+            target = os.path.join(self.root, version)
+            staging = tempfile.mkdtemp(dir=self._ensure_root(), prefix=f".{version}-")
+            models = {}
+            try:
+                for modality, source in sorted(files.items()):
+                    fmt = detect_format(source)
+                    extension = ".onnx" if fmt == "onnx" else ".pt"
+                    name = modality + extension
+                    shutil.copyfile(source, os.path.join(staging, name))
+                    models[modality] = {
+                        "file": name,
+                        "format": fmt,
+                        "sha256": file_sha256(os.path.join(staging, name)),
+                        "input": specs[modality],
+                    }
+                os.rename(staging, target)
+            except Exception:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+
+            manifest = self.read_manifest()
+            manifest["versions"][version] = {
+                "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "models": models,
+            }
+            if activate or not manifest.get("active"):
+                manifest["active"] = version
+            self._write_manifest(manifest)
+        return manifest["versions"][version]
+
+    def _ensure_root(self):
+        os.makedirs(self.root, exist_ok=True)
+        return self.root
+
+    def activate(self, version):
+        """Points the manifest at `version`; servers polling the registry swap to it."""
+        with self._lock:
+            manifest = self.read_manifest()
+            if version not in manifest["versions"]:
+                raise RegistryError(f"Unknown model version {version!r}")
+            manifest["active"] = version
+            self._write_manifest(manifest)
+
+    # --------------------- LOADING ---------------------
+
+    def verify(self, version):
+        """Raises RegistryError unless every file of `version` still matches its recorded checksum."""
+        for modality, spec in self._entry(version)["models"].items():
+            path = os.path.join(self.root, version, spec["file"])
+            if not os.path.exists(path):
+                raise RegistryError(f"{version}/{spec['file']} is missing")
+            if file_sha256(path) != spec["sha256"]:
+                raise RegistryError(f"{version}/{spec['file']} does not match its checksum")
+
+    def load(self, version, mmap=True):
+        """{modality: model} for `version`, checksummed and validated against each input spec."""
+        self.verify(version)
+        models = {}
+        for modality, spec in self._entry(version)["models"].items():
+            path = os.path.join(self.root, version, spec["file"])
+            models[modality] = _load_entry(modality, path, spec["format"], mmap)
+            validate(modality, models[modality], spec["input"])
+        return models
+
+
+# --------------------- SERVING ---------------------
+
+class ModelGeneration:
+    """One loaded version with its schedulers, counted while scans use it.
+
+    A retired generation closes its schedulers (or inference pool) once the last
+    scan holding it has released it.
+    """
+
+    def __init__(self, version, models, schedulers, pool=None):
+        self.version = version
+        self.models = models
+        self.schedulers = schedulers
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._users = 0
+        self._retired = False
+        self._closed = False
+
+    def acquire(self):
+        with self._lock:
+            self._users += 1
+        return self
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            idle = self._retired and self._users == 0
+        if idle:
+            self._close()
+
+    def retire(self):
+        with self._lock:
+            self._retired = True
+            idle = self._users == 0
+        if idle:
+            self._close()
+
+    def _close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        if self.pool is not None:
+            self.pool.close()
+        else:
+            for scheduler in self.schedulers.values():
+                scheduler.close()
+        print(f"♻️ Released model version {self.version}")
+
+    def in_use(self):
+        with self._lock:
+            return self._users
+
+
+class ServingModels:
+    """The generation new scans get; swapping it leaves in-flight scans on the one they started with."""
+
+    def __init__(self):
+        self.current = None
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.current is None:
+                raise RegistryError("No models loaded")
+            return self.current.acquire()
+
+    @contextmanager
+    def use(self):
+        generation = self.acquire()
+        try:
+            yield generation
+        finally:
+            generation.release()
+
+    def version(self):
+        current = self.current
+        return current.version if current is not None else None
+
+    def swap(self, generation):
+        """Makes `generation` current and retires the previous one, which is returned."""
+        with self._lock:
+            previous, self.current = self.current, generation
+        if previous is not None:
+            previous.retire()
+        return previous
+
+
+# --------------------- CLI ---------------------
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--registry", default=MODEL_REGISTRY_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    publish = commands.add_parser("publish", help="copy checkpoints into a new version")
+    publish.add_argument("version")
+    for modality in MODALITIES:
+        publish.add_argument(f"--{modality}", help=f"{modality} checkpoint (.pth/.pt state dict, TorchScript or .onnx)")
+    publish.add_argument("--activate", action="store_true", help="serve this version once published")
+
+    activate = commands.add_parser("activate", help="make a published version the active one")
+    activate.add_argument("version")
+
+    commands.add_parser("list", help="show published versions")
+
+    verify = commands.add_parser("verify", help="checksum and load a version")
+    verify.add_argument("version", nargs="?")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    try:
+        if args.command == "publish":
+            files = {m: getattr(args, m) for m in MODALITIES if getattr(args, m)}
+            entry = registry.publish(args.version, files, activate=args.activate)
+            print(f"✅ Published {args.version}: {', '.join(sorted(entry['models']))}")
+        elif args.command == "activate":
+            registry.activate(args.version)
+            print(f"✅ {args.version} is now active")
+        elif args.command == "list":
+            active = registry.active_version()
+            for version, entry in sorted(registry.versions().items(), key=lambda item: item[1]["created_at"]):
+                marker = "*" if version == active else " "
+                models = ", ".join(f"{m} ({spec['format']}, {spec['sha256'][:12]})"
+                                   for m, spec in sorted(entry["models"].items()))
+                print(f"{marker} {version:<20} {entry['created_at']}  {models}")
+        else:
+            version = args.version or registry.active_version()
+            if not version:
+                raise RegistryError("No active version to verify")
+            models = registry.load(version)
+            print(f"✅ {version}: {', '.join(sorted(models))} match their checksums and input specs")
+    except RegistryError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
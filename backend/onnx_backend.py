@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import onnxruntime as ort
+import torch
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "models/onnx")
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", 0))  # 0 lets onnxruntime decide
+
+MODALITIES = ("image", "audio", "video")
+
+
+def onnx_model_path(modality, model_dir=ONNX_MODEL_DIR):
+    return os.path.join(model_dir, f"{modality}.onnx")
+
+
+class OnnxModel:
+    """Runs an exported graph on onnxruntime's CPU provider behind the same call interface as the torch models."""
+
+    def __init__(self, path, intra_op_threads=ONNX_INTRA_OP_THREADS):
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.path = path
+        self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_name = self.session.get_outputs()[0].name
+
+    def __call__(self, x):
+        inputs = np.ascontiguousarray(x.detach().cpu().numpy(), dtype=np.float32)
+        (output,) = self.session.run([self.output_name], {self.input_name: inputs})
+        return torch.from_numpy(output)
+
+    def eval(self):
+        return self
+
+    def reopen(self, intra_op_threads=ONNX_INTRA_OP_THREADS):
+        """A fresh session on the same graph, e.g. in a forked inference worker."""
+        return OnnxModel(self.path, intra_op_threads=intra_op_threads)
+
+
+def load_onnx_models(model_dir=ONNX_MODEL_DIR):
+    """Loads every exported modality found in `model_dir`."""
+    loaded = {}
+    for modality in MODALITIES:
+        path = onnx_model_path(modality, model_dir)
+        if os.path.exists(path):
+            loaded[modality] = OnnxModel(path)
+    return loaded
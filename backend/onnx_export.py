@@ -0,0 +1,111 @@
+"""Exports the serving models to ONNX and checks onnxruntime against eager torch.
+
+Run from backend/:  python onnx_export.py [--modalities image audio video] [--random-weights]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import torch
+
+from model import (
+    ImageStegoCNN, AudioStegoCNN, VideoStegoModel,
+    IMAGE_MODEL_PATH, AUDIO_MODEL_PATH, VIDEO_MODEL_PATH,
+    load_audio_model, load_video_model,
+)
+from onnx_backend import ONNX_MODEL_DIR, OnnxModel, onnx_model_path
+
+OPSET_VERSION = 17
+
+# Example input shape and dynamic axes per modality
+INPUT_SPECS = {
+    "image": ((1, 3, 224, 224), {0: "batch"}),
+    "audio": ((1, 1, 128, 300), {0: "batch"}),
+    "video": ((1, 10, 3, 224, 224), {0: "batch", 1: "time"}),
+}
+
+# Shapes the parity check runs, to exercise the dynamic axes
+PARITY_SHAPES = {
+    "image": [(1, 3, 224, 224), (4, 3, 224, 224)],
+    "audio": [(1, 1, 128, 300), (8, 1, 128, 300)],
+    "video": [(1, 4, 3, 224, 224), (2, 10, 3, 224, 224)],
+}
+
+
+def load_torch_model(modality, random_weights=False):
+    if random_weights:
+        model = {"image": ImageStegoCNN, "audio": AudioStegoCNN, "video": VideoStegoModel}[modality]
+        kwargs = {} if modality == "audio" else {"pretrained": False}
+        return model(**kwargs).eval()
+    if modality == "image":
+        # Always export the fp32 checkpoint; INT8 TorchScript does not round-trip through ONNX
+        model = ImageStegoCNN(pretrained=False)
+        model.load_state_dict(torch.load(IMAGE_MODEL_PATH, map_location=torch.device('cpu')))
+        return model.eval()
+    if modality == "audio":
+        return load_audio_model(AUDIO_MODEL_PATH)
+    return load_video_model(VIDEO_MODEL_PATH)
+
+
+def export(model, modality, path):
+    shape, dynamic_axes = INPUT_SPECS[modality]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            model, (torch.randn(*shape),), path,
+            input_names=["input"], output_names=["logits"],
+            dynamic_axes={"input": dynamic_axes, "logits": {0: "batch"}},
+            opset_version=OPSET_VERSION,
+            do_constant_folding=True,
+            dynamo=False,
+        )
+
+
+def check_parity(model, modality, path, atol=1e-4, rtol=1e-3):
+    """Returns the largest absolute difference between torch and onnxruntime logits."""
+    session = OnnxModel(path)
+    torch.manual_seed(0)
+    worst = 0.0
+    with torch.no_grad():
+        for shape in PARITY_SHAPES[modality]:
+            x = torch.rand(*shape)
+            expected = model(x).numpy()
+            actual = session(x).numpy()
+            diff = float(np.abs(expected - actual).max())
+            worst = max(worst, diff)
+            if not np.allclose(expected, actual, atol=atol, rtol=rtol):
+                raise AssertionError(f"{modality} {shape}: onnxruntime differs from torch by {diff:.3e}")
+            print(f"   {modality} {tuple(shape)}: max |diff| {diff:.3e}")
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modalities", nargs="+", choices=list(INPUT_SPECS), default=list(INPUT_SPECS))
+    parser.add_argument("--output-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--random-weights", action="store_true",
+                        help="export untrained models, e.g. to benchmark without checkpoints")
+    parser.add_argument("--skip-parity", action="store_true")
+    args = parser.parse_args()
+
+    failed = False
+    for modality in args.modalities:
+        model = load_torch_model(modality, random_weights=args.random_weights)
+        path = onnx_model_path(modality, args.output_dir)
+        export(model, modality, path)
+        print(f"✅ Exported {modality} model to {path}")
+        if args.skip_parity:
+            continue
+        try:
+            check_parity(model, modality, path)
+        except AssertionError as e:
+            print(f"❌ {e}")
+            failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from metrics import CACHE_LOOKUPS
+
+load_dotenv()
+
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "memory")  # memory | sqlite | none
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 4096))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "cache/results.sqlite3")
+
+
+def hash_stream(stream, chunk_size=1 << 20):
+    """Reads `stream` once in fixed-size chunks; returns (sha256 hex digest, size in bytes)."""
+    stream.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    stream.seek(0)
+    return digest.hexdigest(), size
+
+
+def cache_key(content_hash, filetype, model_version):
+    # The file extension picks the modality in predict(), so it is part of the key
+    return f"{content_hash}:{filetype}:{model_version}"
+
+
+# --------------------- BACKENDS ---------------------
+
+class MemoryBackend:
+    """In-process LRU with TTL. Entries are only visible to this worker."""
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, ttl=RESULT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """On-disk LRU with TTL shared by every worker process on the host."""
+
+    def __init__(self, path=RESULT_CACHE_PATH, max_entries=RESULT_CACHE_MAX_ENTRIES, ttl=RESULT_CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS prediction_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS prediction_cache_accessed ON prediction_cache (accessed_at)")
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, stored_at FROM prediction_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, stored_at = row
+        if now - stored_at > self.ttl:
+            conn.execute("DELETE FROM prediction_cache WHERE key = ?", (key,))
+            conn.commit()
+            return None
+        conn.execute("UPDATE prediction_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        conn.commit()
+        return json.loads(value)
+
+    def set(self, key, value):
+        conn = self._connection()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO prediction_cache (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now, now),
+        )
+        conn.execute("DELETE FROM prediction_cache WHERE stored_at < ?", (now - self.ttl,))
+        conn.execute("""
+            DELETE FROM prediction_cache WHERE key IN (
+                SELECT key FROM prediction_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+        conn.commit()
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM prediction_cache").fetchone()[0]
+
+
+# --------------------- CACHE WITH REQUEST COALESCING ---------------------
+
+class _InFlight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class PredictionCache:
+    """Looks results up by key and makes concurrent misses for the same key share one computation."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_compute(self, key, compute):
+        """Returns (value, source) where source is "hit", "coalesced" or "miss"."""
+        value = self.backend.get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            CACHE_LOOKUPS.inc(result="hit")
+            return value, "hit"
+
+        with self._lock:
+            inflight = self._inflight.get(key)
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight[key] = _InFlight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        CACHE_LOOKUPS.inc(result="miss" if leader else "coalesced")
+        if not leader:
+            inflight.done.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            return inflight.value, "coalesced"
+
+        try:
+            inflight.value = compute()
+            self.backend.set(key, inflight.value)
+            return inflight.value, "miss"
+        except Exception as e:
+            inflight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            inflight.done.set()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "backend": type(self.backend).__name__,
+                "entries": len(self.backend),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+                "in_flight": len(self._inflight),
+            }
+
+
+def create_cache(backend=RESULT_CACHE_BACKEND):
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        return PredictionCache(SQLiteBackend())
+    if backend == "memory":
+        return PredictionCache(MemoryBackend())
+    raise ValueError(f"Unknown RESULT_CACHE_BACKEND: {backend}")
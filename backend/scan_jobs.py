@@ -0,0 +1,319 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+from ingest import upload_path
+
+load_dotenv()
+
+SCAN_JOB_DIR = os.getenv("SCAN_JOB_DIR", "jobs")  # stored uploads and the queue database
+SCAN_JOB_DB_PATH = os.getenv("SCAN_JOB_DB_PATH", os.path.join(SCAN_JOB_DIR, "scan_jobs.sqlite3"))
+SCAN_JOB_WORKERS = int(os.getenv("SCAN_JOB_WORKERS", 2))
+SCAN_JOB_MAX_QUEUED = int(os.getenv("SCAN_JOB_MAX_QUEUED", 100))  # queued + running jobs accepted at once
+SCAN_JOB_POLL_SECONDS = float(os.getenv("SCAN_JOB_POLL_SECONDS", 1.0))
+SCAN_JOB_MAX_ATTEMPTS = int(os.getenv("SCAN_JOB_MAX_ATTEMPTS", 3))  # a job that keeps killing its process is given up
+SCAN_JOB_RETENTION_SECONDS = float(os.getenv("SCAN_JOB_RETENTION_SECONDS", 24 * 3600))  # finished job rows
+SCAN_JOB_RECOVER_SECONDS = float(os.getenv("SCAN_JOB_RECOVER_SECONDS", 60))  # between sweeps for jobs of exited processes
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _process_identity(pid):
+    """Boot id and start time of `pid`, which together tell a recycled pid from the process that had it.
+
+    None where /proc is unavailable (non-Linux hosts); owners are then matched on pid alone.
+    """
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            boot_id = f.read().strip()
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # Field 22 is the start time in clock ticks since boot; the command name before it may contain spaces
+    return f"{boot_id}:{stat.rsplit(')', 1)[1].split()[19]}"
+
+
+def _owner_alive(pid, started):
+    # Other web workers on the same host share the queue, so only jobs whose process is gone are orphans
+    if not pid:
+        return False
+    if started is not None:
+        # Matches only the process that claimed the job, not a later one that was handed the same pid
+        return _process_identity(pid) == started
+    # Jobs claimed without a start time (no /proc, or before it was recorded) fall back to the pid
+    if pid == os.getpid():
+        return False  # our pid on a job means a previous process that had it; this one has claimed nothing yet
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SQLiteJobQueue:
+    """Durable scan-job queue in a local SQLite file; jobs survive restarts and are shared by every process on the host."""
+
+    def __init__(self, path=SCAN_JOB_DB_PATH, job_dir=SCAN_JOB_DIR, max_queued=SCAN_JOB_MAX_QUEUED):
+        self.path = path
+        self.job_dir = job_dir
+        self.max_queued = max_queued
+        self._local = threading.local()
+        self._claimed = set()  # ids this process is running; never orphans, even where owners are matched on pid
+        for directory in (os.path.dirname(path), job_dir):
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS scan_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                user_id INTEGER,
+                filename TEXT NOT NULL,
+                filetype TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                file_size INTEGER,
+                content_hash TEXT,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                owner_pid INTEGER,
+                owner_started TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(scan_jobs)")}
+        if "owner_started" not in columns:  # queues created before owners were identified by start time
+            conn.execute("ALTER TABLE scan_jobs ADD COLUMN owner_started TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS scan_jobs_status ON scan_jobs (status, created_at)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def store_upload(self, file, job_id, chunk_size=1 << 20):
+        """Copies the upload stream into the job directory and returns the stored path."""
+        path = os.path.join(self.job_dir, job_id)
+        spooled_path = upload_path(file)
+        if spooled_path is not None:
+            shutil.copyfile(spooled_path, path)  # kernel-side copy of the already spooled upload
+            return path
+        file.seek(0)
+        with open(path, "wb") as out:
+            shutil.copyfileobj(file, out, chunk_size)
+        file.seek(0)
+        return path
+
+    def enqueue(self, file, filename, filetype, user_id, file_size=None, content_hash=None):
+        """Stores the upload and queues a scan for it; raises QueueFull when the queue is at capacity."""
+        if self.active_count() >= self.max_queued:
+            raise QueueFull(f"{self.max_queued} scan jobs already queued")
+        job_id = uuid.uuid4().hex
+        path = self.store_upload(file, job_id)
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-checked inside the write lock so concurrent enqueues cannot overshoot the bound
+            active = conn.execute("SELECT COUNT(*) FROM scan_jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchone()[0]
+            if active >= self.max_queued:
+                raise QueueFull(f"{self.max_queued} scan jobs already queued")
+            conn.execute("""
+                INSERT INTO scan_jobs (id, status, stage, user_id, filename, filetype, file_path, file_size,
+                                       content_hash, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (job_id, QUEUED, QUEUED, user_id, filename, filetype, path, file_size, content_hash, now, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            os.unlink(path)
+            raise
+        return job_id
+
+    def claim(self):
+        """Marks the oldest queued job as running and returns it, or None when the queue is empty."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id FROM scan_jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE scan_jobs SET status = ?, stage = ?, attempts = attempts + 1, owner_pid = ?, owner_started = ?, "
+                    "updated_at = ? WHERE id = ?",
+                    (RUNNING, "starting", os.getpid(), _process_identity(os.getpid()), time.time(), row["id"]),
+                )
+                row = conn.execute("SELECT * FROM scan_jobs WHERE id = ?", (row["id"],)).fetchone()
+                self._claimed.add(row["id"])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self._decode(row) if row is not None else None
+
+    def set_stage(self, job_id, stage):
+        self._connection().execute(
+            "UPDATE scan_jobs SET stage = ?, updated_at = ? WHERE id = ?", (stage, time.time(), job_id)
+        )
+
+    def finish(self, job_id, result=None, error=None):
+        status = DONE if error is None else FAILED
+        self._claimed.discard(job_id)
+        self._connection().execute(
+            "UPDATE scan_jobs SET status = ?, stage = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+            (status, status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+        )
+
+    def get(self, job_id):
+        row = self._connection().execute("SELECT * FROM scan_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row is not None else None
+
+    def active_count(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM scan_jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+        ).fetchone()[0]
+
+    def recover(self):
+        """Requeues (or, past SCAN_JOB_MAX_ATTEMPTS, fails) jobs left running by a process that has exited."""
+        conn = self._connection()
+        rows = conn.execute(
+            "SELECT id, owner_pid, owner_started, attempts, file_path FROM scan_jobs WHERE status = ?", (RUNNING,)
+        ).fetchall()
+        orphaned = [row for row in rows
+                    if row["id"] not in self._claimed and not _owner_alive(row["owner_pid"], row["owner_started"])]
+        recovered = 0
+        for row in orphaned:
+            if row["attempts"] >= SCAN_JOB_MAX_ATTEMPTS:
+                status, error = FAILED, f"Interrupted {row['attempts']} times"
+                if os.path.exists(row["file_path"]):
+                    os.unlink(row["file_path"])
+            else:
+                status, error = QUEUED, None
+            # Still the same owner: another process may have recovered and re-claimed the job since the SELECT
+            recovered += conn.execute(
+                "UPDATE scan_jobs SET status = ?, stage = ?, error = ?, owner_pid = NULL, owner_started = NULL, updated_at = ? "
+                "WHERE id = ? AND status = ? AND owner_pid IS ? AND owner_started IS ?",
+                (status, status, error, time.time(), row["id"], RUNNING, row["owner_pid"], row["owner_started"]),
+            ).rowcount
+        return recovered
+
+    def purge(self, older_than=SCAN_JOB_RETENTION_SECONDS):
+        """Drops finished job rows past the retention window."""
+        self._connection().execute(
+            "DELETE FROM scan_jobs WHERE status IN (?, ?) AND updated_at < ?", (DONE, FAILED, time.time() - older_than)
+        )
+
+    def stats(self):
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM scan_jobs GROUP BY status").fetchall()
+        counts = {status: count for status, count in rows}
+        return {"max_queued": self.max_queued, **{s: counts.get(s, 0) for s in (QUEUED, RUNNING, DONE, FAILED)}}
+
+    @staticmethod
+    def _decode(row):
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+def describe(job):
+    """The client-facing view of a job row."""
+    view = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "filename": job["filename"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+    if job["status"] == DONE:
+        view["result"] = job["result"]
+    elif job["status"] == FAILED:
+        view["error"] = job["error"]
+    return view
+
+
+class ScanJobRunner:
+    """Background threads that claim queued jobs and pass them to `handler(job, set_stage)`.
+
+    `handler` returns the JSON-serialisable result stored on the job; an exception marks
+    the job failed. The stored upload is removed once the job has finished either way.
+    Every `recover_seconds` a worker also requeues jobs left by processes that exited
+    since (another web worker on the host that crashed) and purges old finished rows.
+    """
+
+    def __init__(self, job_queue, handler, workers=SCAN_JOB_WORKERS, poll_seconds=SCAN_JOB_POLL_SECONDS,
+                 recover_seconds=SCAN_JOB_RECOVER_SECONDS):
+        self.queue = job_queue
+        self.handler = handler
+        self.poll_seconds = poll_seconds
+        self.recover_seconds = recover_seconds
+        self._wakeup = threading.Event()
+        self._sweep_lock = threading.Lock()
+        self._next_sweep = time.monotonic() + recover_seconds
+        recovered = job_queue.recover()
+        if recovered:
+            print(f"🔁 Recovered {recovered} scan job(s) interrupted by a restart")
+        job_queue.purge()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"scan-job-{i}", daemon=True) for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def notify(self):
+        """Wakes idle workers right away instead of at the next poll."""
+        self._wakeup.set()
+
+    def _sweep(self):
+        # One worker at a time, and only once per interval across all of them
+        with self._sweep_lock:
+            if time.monotonic() < self._next_sweep:
+                return
+            self._next_sweep = time.monotonic() + self.recover_seconds
+        try:
+            recovered = self.queue.recover()
+            if recovered:
+                print(f"🔁 Recovered {recovered} scan job(s) whose process exited")
+            self.queue.purge()
+        except sqlite3.Error as e:
+            print("⚠️ Scan job sweep failed:", e)
+
+    def _run(self):
+        while True:
+            self._sweep()
+            job = self.queue.claim()
+            if job is None:
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+                continue
+            try:
+                result = self.handler(job, lambda stage: self.queue.set_stage(job["id"], stage))
+                self.queue.finish(job["id"], result=result)
+            except Exception as e:
+                print(f"🔥 Scan job {job['id']} failed:", e)
+                self.queue.finish(job["id"], error=str(e))
+            finally:
+                if os.path.exists(job["file_path"]):
+                    os.unlink(job["file_path"])
@@ -0,0 +1,106 @@
+"""Production entry point: app.py behind waitress, with every model loaded and warmed before /readyz goes green.
+
+The socket is bound first so /healthz answers during start-up; models load and warm
+up on a background thread, and /readyz returns 503 until that has finished. A scan
+arriving before then waits for the models rather than failing. If the models cannot
+be loaded the process exits non-zero so the platform restarts it.
+
+waitress reads a request body in full before the app sees it, so body limits are set
+per listener: PORT takes bodies up to REQUEST_MAX_BYTES, and BATCH_PORT (when set)
+serves only /upload/batch, up to BATCH_MAX_BYTES.
+
+Run from backend/:  python serve.py
+"""
+import os
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 5000))
+WAITRESS_THREADS = int(os.getenv("WAITRESS_THREADS", 8))  # requests handled at once
+WAITRESS_CONNECTION_LIMIT = int(os.getenv("WAITRESS_CONNECTION_LIMIT", 100))  # open connections, idle keep-alives included
+WAITRESS_CHANNEL_TIMEOUT = int(os.getenv("WAITRESS_CHANNEL_TIMEOUT", 120))  # seconds an idle connection is kept
+WAITRESS_BACKLOG = int(os.getenv("WAITRESS_BACKLOG", 1024))  # pending connections the kernel queues
+BATCH_PORT = int(os.getenv("BATCH_PORT", 0))  # listener for /upload/batch up to BATCH_MAX_BYTES; 0 keeps batches on PORT
+BATCH_WAITRESS_THREADS = int(os.getenv("BATCH_WAITRESS_THREADS", 2))
+
+BATCH_PATH = "/upload/batch"
+
+
+def _prepare(app_module):
+    try:
+        app_module.prepare_for_traffic()
+    except Exception as e:
+        app_module.readiness.update(stage="failed", error=str(e))
+        print("🔥 Start-up failed, exiting:", e, flush=True)
+        os._exit(1)
+
+
+def create_server(app_module):
+    from waitress import create_server as waitress_server
+    from ingest import REQUEST_MAX_BYTES
+
+    return waitress_server(
+        app_module.app,
+        host=SERVER_HOST,
+        port=PORT,
+        threads=WAITRESS_THREADS,
+        connection_limit=WAITRESS_CONNECTION_LIMIT,
+        channel_timeout=WAITRESS_CHANNEL_TIMEOUT,
+        backlog=WAITRESS_BACKLOG,
+        # waitress buffers the whole body before the app runs, so this is where oversized
+        # uploads are refused: by Content-Length up front, or as a chunked body crosses it
+        max_request_body_size=REQUEST_MAX_BYTES,
+        ident="StegoShield",
+    )
+
+
+def batch_only(app):
+    """WSGI wrapper for the batch listener: everything but /upload/batch is 404 without reaching Flask."""
+    def application(environ, start_response):
+        if environ.get("PATH_INFO") != BATCH_PATH:
+            start_response("404 Not Found", [("Content-Type", "text/plain"), ("Content-Length", "9")])
+            return [b"Not Found"]
+        return app(environ, start_response)
+    return application
+
+
+def create_batch_server(app_module):
+    """Second listener with the larger BATCH_MAX_BYTES limit, so only batch uploads can send that much."""
+    if not BATCH_PORT:
+        return None
+    from waitress import create_server as waitress_server
+    from batch_scan import BATCH_MAX_BYTES
+
+    return waitress_server(
+        batch_only(app_module.app),
+        host=SERVER_HOST,
+        port=BATCH_PORT,
+        threads=BATCH_WAITRESS_THREADS,
+        connection_limit=WAITRESS_CONNECTION_LIMIT,
+        channel_timeout=WAITRESS_CHANNEL_TIMEOUT,
+        backlog=WAITRESS_BACKLOG,
+        max_request_body_size=BATCH_MAX_BYTES,
+        ident="StegoShield",
+    )
+
+
+def main():
+    import app as app_module
+
+    server = create_server(app_module)
+    print(f"🚀 Listening on http://{SERVER_HOST}:{server.effective_port} with {WAITRESS_THREADS} threads; "
+          f"/readyz turns green once the models are warm", flush=True)
+    batch_server = create_batch_server(app_module)
+    if batch_server is not None:
+        print(f"📦 Batch uploads on http://{SERVER_HOST}:{batch_server.effective_port}{BATCH_PATH}", flush=True)
+        threading.Thread(target=batch_server.run, name="batch-listener", daemon=True).start()
+    threading.Thread(target=_prepare, args=(app_module,), name="startup", daemon=True).start()
+    server.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import logging
+import os
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+from scipy.stats import chi2
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Thresholds calibrated with benchmarks/stat_calibration.py; see its docstring for the numbers
+STAT_FILTER_ENABLED = os.getenv("STAT_FILTER_ENABLED", "1") == "1"
+# Short-circuit as stego only when chi-square and the SPA (or RS) estimate both reach these
+STAT_STEGO_RATE = float(os.getenv("STAT_STEGO_RATE", 0.25))     # RS / SPA embedding-rate estimate
+STAT_STEGO_CHI_P = float(os.getenv("STAT_STEGO_CHI_P", 0.99))   # chi-square embedding probability
+# Short-circuit as clean only when every estimate is at or below these
+STAT_CLEAN_RATE = float(os.getenv("STAT_CLEAN_RATE", 0.03))
+STAT_CLEAN_CHI_P = float(os.getenv("STAT_CLEAN_CHI_P", 0.01))
+# Chi-square over just the first samples, where short sequential payloads (512 bytes in training) sit
+STAT_CLEAN_HEAD_CHI_P = float(os.getenv("STAT_CLEAN_HEAD_CHI_P", 0.05))
+STAT_HEAD_SAMPLES = int(os.getenv("STAT_HEAD_SAMPLES", 4096))
+# Noise level above which SPA misses low-rate embedding and additive-noise stego hides
+STAT_CLEAN_NOISE = float(os.getenv("STAT_CLEAN_NOISE", 4.0))
+# Pixels each statistic looks at: chi-square reads them from the top of the image, where sequential
+# LSB embedding starts; SPA / RS read whole rows spread evenly over the image
+STAT_MAX_PIXELS = int(os.getenv("STAT_MAX_PIXELS", 1 << 17))
+# RS costs ~20x SPA for a similar estimate, so it only runs when asked for
+STAT_RS_ENABLED = os.getenv("STAT_RS_ENABLED", "0") == "1"
+# Shortest raster prefix the chi-square test looks at; shorter prefixes of smooth content look equalised even when clean
+STAT_CHI_MIN_SAMPLES = int(os.getenv("STAT_CHI_MIN_SAMPLES", 1 << 16))
+STAT_LOG_EVERY = int(os.getenv("STAT_LOG_EVERY", 100))
+
+RS_MASK = np.array([False, True, True, False])
+
+
+# --------------------- CHI-SQUARE ATTACK (Westfeld & Pfitzmann) ---------------------
+
+def _chi_square_p(samples):
+    hist = np.bincount(samples, minlength=256).astype(np.float64)
+    even, odd = hist[0::2], hist[1::2]
+    expected = (even + odd) / 2.0
+    usable = expected > 4  # the usual minimum expected count per category
+    if usable.sum() < 2:
+        return 0.0
+    statistic = np.sum((even[usable] - expected[usable]) ** 2 / expected[usable])
+    return float(chi2.sf(statistic, usable.sum() - 1))
+
+
+def chi_square_attack(pixels, min_samples=STAT_CHI_MIN_SAMPLES):
+    """Probability that pairs of values were equalised by LSB replacement.
+
+    Samples are read in raster order (row, column, channel), the order sequential
+    embedders such as embed_lsb() write in, and tested over growing prefixes so a
+    short payload at the start of the image is not diluted by the clean remainder.
+    """
+    samples = pixels.reshape(-1)
+    best = 0.0
+    length = min_samples
+    while True:
+        best = max(best, _chi_square_p(samples[:length]))
+        if length >= samples.size:
+            return best
+        length = min(length * 4, samples.size)
+
+
+# --------------------- RS ANALYSIS (Fridrich, Goljan & Du) ---------------------
+
+def _flip_positive(x):
+    return x ^ 1  # 2i <-> 2i + 1
+
+
+def _flip_negative(x):
+    return ((x + 1) ^ 1) - 1  # 2i - 1 <-> 2i
+
+
+def _smoothness(groups):
+    return np.abs(np.diff(groups, axis=1)).sum(axis=1)
+
+
+def _regular_singular(groups):
+    base = _smoothness(groups)
+    positive = groups.copy()
+    positive[:, RS_MASK] = _flip_positive(positive[:, RS_MASK])
+    negative = groups.copy()
+    negative[:, RS_MASK] = _flip_negative(negative[:, RS_MASK])
+    f_pos, f_neg = _smoothness(positive), _smoothness(negative)
+    return (
+        np.mean(f_pos > base) - np.mean(f_pos < base),
+        np.mean(f_neg > base) - np.mean(f_neg < base),
+    )
+
+
+def rs_analysis(channel):
+    """Estimated fraction of LSB-replaced samples in one 2-D channel."""
+    width = channel.shape[1] - channel.shape[1] % 4
+    if width == 0:
+        return 0.0
+    groups = channel[:, :width].astype(np.int16).reshape(-1, 4)
+    d0, d_neg0 = _regular_singular(groups)
+    d1, d_neg1 = _regular_singular(_flip_positive(groups))
+
+    a = 2.0 * (d1 + d0)
+    b = d_neg0 - d_neg1 - d1 - 3.0 * d0
+    c = d0 - d_neg0
+    if abs(a) < 1e-12:
+        if abs(b) < 1e-12:
+            return 0.0
+        x = -c / b
+    else:
+        discriminant = b * b - 4.0 * a * c
+        if discriminant < 0:
+            return 0.0
+        roots = ((-b + np.sqrt(discriminant)) / (2 * a), (-b - np.sqrt(discriminant)) / (2 * a))
+        x = min(roots, key=abs)
+    if abs(x - 0.5) < 1e-12:
+        return 1.0
+    return float(np.clip(x / (x - 0.5), 0.0, 1.0))
+
+
+# --------------------- SAMPLE PAIR ANALYSIS (Dumitrescu, Wu & Wang) ---------------------
+
+def sample_pair_analysis(channel):
+    """Estimated fraction of LSB-replaced samples from horizontally adjacent pairs."""
+    u = channel[:, :-1].astype(np.int16).ravel()
+    v = channel[:, 1:].astype(np.int16).ravel()
+    if u.size == 0:
+        return 0.0
+    v_even = (v & 1) == 0
+    x = np.count_nonzero((v_even & (u < v)) | (~v_even & (u > v)))
+    y = np.count_nonzero((v_even & (u > v)) | (~v_even & (u < v)))
+    k = np.count_nonzero((u >> 1) == (v >> 1))
+    if k == 0:
+        return 0.0
+
+    a = 2.0 * k
+    b = 2.0 * (2 * x - u.size)
+    c = float(y - x)
+    discriminant = b * b - 4.0 * a * c
+    if discriminant < 0:
+        return 0.0
+    roots = ((-b + np.sqrt(discriminant)) / (2 * a), (-b - np.sqrt(discriminant)) / (2 * a))
+    # The root is the fraction of samples whose LSB actually changed, half the embedding rate
+    return float(np.clip(2.0 * min(roots), 0.0, 1.0))
+
+
+# --------------------- NOISE LEVEL (Immerkaer) ---------------------
+
+def noise_level(pixels, strips=64):
+    """Fast estimate of the noise standard deviation, in grey levels, from 3-row strips spread over the image."""
+    height, width = pixels.shape[:2]
+    if height < 3 or width < 3:
+        return 0.0
+    centres = np.arange(1, height - 1, max(1, (height - 2) // strips))[:strips]
+    rows = pixels[np.stack([centres - 1, centres, centres + 1], axis=1)]
+    grey = rows[..., 0].astype(np.int32) + rows[..., 1] + rows[..., 2]  # 3x the grey level, kept integer
+    # The [[1,-2,1],[-2,4,-2],[1,-2,1]] Laplacian is separable: rows first, then columns
+    vertical = grey[:, 0] - 2 * grey[:, 1] + grey[:, 2]
+    laplacian = vertical[:, :-2] - 2 * vertical[:, 1:-1] + vertical[:, 2:]
+    return float(np.abs(laplacian).mean() / 3 * np.sqrt(np.pi / 2) / 6)
+
+
+# --------------------- CASCADE ---------------------
+
+def analyse(pixels, max_pixels=STAT_MAX_PIXELS, use_rs=STAT_RS_ENABLED):
+    """Runs the statistics over an HxWx3 uint8 array, on at most `max_pixels` pixels each."""
+    height = pixels.shape[0]
+    rows = max(1, min(height, max_pixels // max(1, pixels.shape[1])))
+    sampled = pixels[::max(1, height // rows)][:rows]  # estimates stay stable where a top crop drifts
+    channels = [sampled[:, :, c] for c in range(sampled.shape[2])]
+    stats = {
+        "chi_square_p": chi_square_attack(pixels[:rows]),
+        "head_chi_square_p": _chi_square_p(pixels.reshape(-1)[:STAT_HEAD_SAMPLES]),
+        "spa_rate": max(sample_pair_analysis(c) for c in channels),
+        "noise": noise_level(pixels),
+    }
+    if use_rs:
+        stats["rs_rate"] = max(rs_analysis(c) for c in channels)
+    return stats
+
+
+def verdict(stats):
+    """(result, confidence) when the statistics from analyse() are decisive, else (None, None)."""
+    rate = max(stats.get("rs_rate", 0.0), stats["spa_rate"])
+
+    # Chi-square alone saturates on clean JPEG-compressed images, so it has to agree with RS / SPA
+    if rate >= STAT_STEGO_RATE and stats["chi_square_p"] >= STAT_STEGO_CHI_P:
+        return "Malicious", round(min(1.0, 0.5 + rate, stats["chi_square_p"]), 2)
+
+    # Clean needs every test to agree: SPA reads 0 both on clean images and at 100% embedding,
+    # where chi-square saturates; short payloads show only in the head; noise hides from both
+    if (rate <= STAT_CLEAN_RATE and stats["chi_square_p"] <= STAT_CLEAN_CHI_P
+            and stats["head_chi_square_p"] <= STAT_CLEAN_HEAD_CHI_P and stats["noise"] <= STAT_CLEAN_NOISE):
+        return "Safe", round(1.0 - rate, 2)
+
+    return None, None
+
+
+class StatisticalPrefilter:
+    """Resolves confidently clean or confidently stego images before the CNN and counts who resolved what."""
+
+    STAGES = ("stat_stego", "stat_clean", "cnn")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {stage: 0 for stage in self.STAGES}
+
+    def _record(self, stage):
+        with self._lock:
+            self.counts[stage] += 1
+            total = sum(self.counts.values())
+            counts = dict(self.counts)
+        if STAT_LOG_EVERY and total % STAT_LOG_EVERY == 0:
+            logger.info("Statistical prefilter after %d images: %s", total, counts)
+
+    def check(self, pixels):
+        """Returns (result, confidence, stats) when the statistics are decisive, else (None, None, stats)."""
+        stats = analyse(pixels)
+        result, confidence = verdict(stats)
+        self._record({"Malicious": "stat_stego", "Safe": "stat_clean"}.get(result, "cnn"))
+        return result, confidence, stats
+
+    def stats(self):
+        with self._lock:
+            total = sum(self.counts.values())
+            return {
+                "enabled": STAT_FILTER_ENABLED,
+                "images": total,
+                "resolved": dict(self.counts),
+                "resolved_without_cnn": round((total - self.counts["cnn"]) / total, 4) if total else 0.0,
+            }
+
+
+prefilter = StatisticalPrefilter()
@@ -0,0 +1,385 @@
+import fcntl
+import json
+import os
+import random
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from ingest import upload_path
+from metrics import observe_stage, ERRORS
+
+load_dotenv()
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "cloudinary")  # cloudinary | local
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "storage")
+LOCAL_STORAGE_URL = os.getenv("LOCAL_STORAGE_URL", "/storage")  # URL prefix the app serves LOCAL_STORAGE_DIR under
+STORAGE_PENDING_DIR = os.getenv("STORAGE_PENDING_DIR", "storage_pending")
+STORAGE_UPLOAD_WORKERS = int(os.getenv("STORAGE_UPLOAD_WORKERS", 2))
+STORAGE_MAX_ATTEMPTS = int(os.getenv("STORAGE_MAX_ATTEMPTS", 8))
+STORAGE_BACKOFF_BASE_SECONDS = float(os.getenv("STORAGE_BACKOFF_BASE_SECONDS", 2.0))
+STORAGE_BACKOFF_MAX_SECONDS = float(os.getenv("STORAGE_BACKOFF_MAX_SECONDS", 300.0))
+STORAGE_BREAKER_FAILURES = int(os.getenv("STORAGE_BREAKER_FAILURES", 5))  # consecutive failures that open the breaker
+STORAGE_BREAKER_RESET_SECONDS = float(os.getenv("STORAGE_BREAKER_RESET_SECONDS", 60.0))
+STORAGE_KNOWN_URLS = 4096  # content hashes whose URL is remembered, so re-uploads are not stored twice
+
+
+# --------------------- BACKENDS ---------------------
+
+class CloudinaryStorage:
+    def put(self, path, content_hash):
+        from cloudinary.uploader import upload as cloudinary_upload
+        # The content hash as public_id makes retries of a half-finished upload idempotent
+        result = cloudinary_upload(path, resource_type="auto", public_id=content_hash, overwrite=False)
+        return result["secure_url"]
+
+
+class LocalStorage:
+    """Content-addressed files in a local directory; the offline stand-in for Cloudinary."""
+
+    def __init__(self, directory=LOCAL_STORAGE_DIR, url_prefix=LOCAL_STORAGE_URL):
+        self.directory = directory
+        self.url_prefix = url_prefix.rstrip("/")
+        os.makedirs(directory, exist_ok=True)
+
+    def put(self, path, content_hash):
+        name = content_hash + os.path.splitext(path)[1]
+        destination = os.path.join(self.directory, name)
+        if not os.path.exists(destination):
+            tmp = destination + ".part"
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, destination)
+        return f"{self.url_prefix}/{name}"
+
+
+def create_storage(backend=STORAGE_BACKEND):
+    if backend == "cloudinary":
+        return CloudinaryStorage()
+    if backend == "local":
+        return LocalStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+# --------------------- CIRCUIT BREAKER ---------------------
+
+class CircuitBreaker:
+    """Stops calling a failing dependency for `reset_seconds` after `failure_threshold` consecutive failures."""
+
+    def __init__(self, failure_threshold=STORAGE_BREAKER_FAILURES, reset_seconds=STORAGE_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                return "open"
+            return "half_open"
+
+    def allow(self):
+        """True when a call may go ahead; while half open, only one probe call at a time."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+# --------------------- BACKGROUND UPLOADER ---------------------
+
+class BackgroundUploader:
+    """Stores uploads off the request path and reports each URL through `on_stored(rows, url)`.
+
+    Every submission is copied into this process's own directory under `pending_dir`
+    next to a JSON sidecar describing it. The directory is held with an flock for the
+    life of the process, so when several processes share `pending_dir` each adopts
+    only the uploads of processes that have exited. Failed attempts back off
+    exponentially with jitter; while the breaker is open nothing is attempted. After
+    `max_attempts` the file is moved to `pending_dir/failed` for manual replay.
+    """
+
+    def __init__(self, storage, on_stored, pending_dir=STORAGE_PENDING_DIR, workers=STORAGE_UPLOAD_WORKERS,
+                 max_attempts=STORAGE_MAX_ATTEMPTS, breaker=None):
+        self.storage = storage
+        self.on_stored = on_stored
+        self.shared_dir = pending_dir
+        self.failed_dir = os.path.join(pending_dir, "failed")
+        self.max_attempts = max_attempts
+        self.breaker = breaker or CircuitBreaker()
+        os.makedirs(self.failed_dir, exist_ok=True)
+        self.pending_dir = self._claim_directory()
+
+        self._cond = threading.Condition()
+        self._pending = {}      # content hash -> item
+        self._in_progress = set()
+        self._known_urls = OrderedDict()
+        self.uploaded = 0
+        self.failed = 0
+        self.retries = 0
+        self.upload_seconds = 0.0
+
+        self._restore()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"storage-uploader-{i}", daemon=True) for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _sidecar(self, content_hash):
+        return os.path.join(self.pending_dir, content_hash + ".json")
+
+    def _save(self, item):
+        tmp = self._sidecar(item["content_hash"]) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(item, f)
+        os.replace(tmp, self._sidecar(item["content_hash"]))
+
+    def _claim_directory(self):
+        # Locked before it gets its final name, so every visible process directory has a live lock or a dead owner
+        name = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        staging = os.path.join(self.shared_dir, "." + name)
+        os.makedirs(staging)
+        self._lock_fd = os.open(os.path.join(staging, ".lock"), os.O_CREAT | os.O_RDWR)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        directory = os.path.join(self.shared_dir, name)
+        os.rename(staging, directory)
+        return directory
+
+    @staticmethod
+    def _lock_if_orphaned(directory):
+        """Returns a lock fd on `directory` if the process that owned it is gone, else None."""
+        try:
+            fd = os.open(os.path.join(directory, ".lock"), os.O_CREAT | os.O_RDWR)
+        except FileNotFoundError:
+            return None  # removed by another process adopting it
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    def _adopt(self, directory, name):
+        """Moves one sidecar and its file from `directory` into ours; the rename is the claim."""
+        sidecar = os.path.join(self.pending_dir, name)
+        try:
+            os.rename(os.path.join(directory, name), sidecar)
+        except FileNotFoundError:
+            return  # claimed by another process
+        with open(sidecar) as f:
+            item = json.load(f)
+        path = os.path.join(self.pending_dir, os.path.basename(item["path"]))
+        try:
+            os.rename(os.path.join(directory, os.path.basename(item["path"])), path)
+        except FileNotFoundError:
+            print(f"⚠️ Dropping pending upload {item['content_hash'][:12]}: its file is missing")
+            os.unlink(sidecar)
+            return
+        existing = self._pending.get(item["content_hash"])
+        if existing is not None:
+            existing["rows"].extend(item["rows"])
+            os.unlink(path)
+            os.unlink(sidecar)
+            self._save(existing)
+            return
+        item.update(path=path, next_attempt_at=0.0)
+        self._pending[item["content_hash"]] = item
+        self._save(item)
+
+    def _restore(self):
+        for entry in os.listdir(self.shared_dir):
+            directory = os.path.join(self.shared_dir, entry)
+            if directory in (self.pending_dir, self.failed_dir):
+                continue
+            if not os.path.isdir(directory):
+                if entry.endswith(".json"):
+                    self._adopt(self.shared_dir, entry)  # left by a version without per-process directories
+                continue
+            if entry.startswith("."):
+                continue  # another process still setting its directory up
+            fd = self._lock_if_orphaned(directory)
+            if fd is None:
+                continue
+            try:
+                for name in os.listdir(directory):
+                    if name.endswith(".json"):
+                        self._adopt(directory, name)
+                shutil.rmtree(directory, ignore_errors=True)
+            finally:
+                os.close(fd)
+        if self._pending:
+            print(f"🔁 Resuming {len(self._pending)} pending storage upload(s)")
+
+    def known_url(self, content_hash):
+        with self._cond:
+            url = self._known_urls.get(content_hash)
+            if url is not None:
+                self._known_urls.move_to_end(content_hash)
+            return url
+
+    def submit(self, file, content_hash, extension, rows, modality="", model_version=None):
+        """Queues `file` for storage; `rows` identify the DB rows to fill in with its URL.
+
+        Returns the URL straight away when these bytes have been stored before.
+        """
+        url = self.known_url(content_hash)
+        if url is not None:
+            return url
+
+        with self._cond:
+            item = self._pending.get(content_hash)
+            if item is not None:
+                # Same bytes already waiting: one upload, every row gets the URL
+                item["rows"].extend(rows)
+                self._save(item)
+                return None
+
+        # The copy runs outside the lock so other requests and the workers are not held up behind it
+        path = os.path.join(self.pending_dir, content_hash + "." + extension)
+        tmp = f"{path}.{uuid.uuid4().hex}.part"
+        source = upload_path(file)
+        if source is not None:
+            shutil.copyfile(source, tmp)
+        else:
+            file.seek(0)
+            with open(tmp, "wb") as out:
+                shutil.copyfileobj(file, out, 1 << 20)
+            file.seek(0)
+
+        with self._cond:
+            item = self._pending.get(content_hash)
+            if item is not None:
+                # Submitted by another request while we were copying
+                item["rows"].extend(rows)
+                self._save(item)
+                os.unlink(tmp)
+                return None
+            url = self._known_urls.get(content_hash)
+            if url is not None:  # or stored meanwhile
+                os.unlink(tmp)
+                return url
+            os.replace(tmp, path)
+            item = {"content_hash": content_hash, "path": path, "rows": list(rows), "modality": modality,
+                    "model_version": model_version, "attempts": 0, "next_attempt_at": 0.0, "last_error": None}
+            self._save(item)
+            self._pending[content_hash] = item
+            self._cond.notify()
+        return None
+
+    def attach(self, content_hash, rows):
+        """Adds DB rows to an upload submitted earlier. Returns the URL if it is already stored, else None."""
+        with self._cond:
+            item = self._pending.get(content_hash)
+            if item is not None:
+                item["rows"].extend(rows)
+                self._save(item)
+                return None
+            return self._known_urls.get(content_hash)
+
+    def _next_due(self):
+        with self._cond:
+            while True:
+                now = time.time()
+                due = [i for h, i in self._pending.items() if h not in self._in_progress and i["next_attempt_at"] <= now]
+                if due and self.breaker.allow():
+                    item = min(due, key=lambda i: i["next_attempt_at"])
+                    self._in_progress.add(item["content_hash"])
+                    return item
+                waiting = [i["next_attempt_at"] for h, i in self._pending.items() if h not in self._in_progress]
+                timeout = max(0.5, min(waiting) - now) if waiting else None
+                if due:
+                    timeout = 1.0  # breaker open: check again shortly
+                self._cond.wait(timeout)
+
+    def _run(self):
+        while True:
+            item = self._next_due()
+            content_hash = item["content_hash"]
+            started = time.perf_counter()
+            try:
+                url = self.storage.put(item["path"], content_hash)
+            except Exception as e:
+                ERRORS.inc(stage="upload", modality=item.get("modality", ""))
+                self.breaker.record_failure()
+                self._retry_later(item, e)
+                continue
+            finally:
+                elapsed = time.perf_counter() - started
+            self.breaker.record_success()
+            observe_stage("upload", item.get("modality", ""), elapsed, item.get("model_version"))
+
+            with self._cond:
+                self._pending.pop(content_hash, None)
+                self._in_progress.discard(content_hash)
+                self._known_urls[content_hash] = url
+                while len(self._known_urls) > STORAGE_KNOWN_URLS:
+                    self._known_urls.popitem(last=False)
+                self.uploaded += 1
+                self.upload_seconds += elapsed
+                rows = item["rows"]
+            print(f"☁️ Stored {content_hash[:12]} in {elapsed * 1000:.0f} ms -> {url}")
+            try:
+                self.on_stored(rows, url)
+            except Exception as e:
+                print(f"🔥 Could not record storage URL for {content_hash[:12]}:", e)
+            for path in (item["path"], self._sidecar(content_hash)):
+                if os.path.exists(path):
+                    os.unlink(path)
+
+    def _retry_later(self, item, error):
+        with self._cond:
+            item["attempts"] += 1
+            item["last_error"] = str(error)
+            self._in_progress.discard(item["content_hash"])
+            if item["attempts"] >= self.max_attempts:
+                self._pending.pop(item["content_hash"], None)
+                self.failed += 1
+                for path in (item["path"], self._sidecar(item["content_hash"])):
+                    if os.path.exists(path):
+                        shutil.move(path, os.path.join(self.failed_dir, os.path.basename(path)))
+                print(f"❌ Giving up storing {item['content_hash'][:12]} after {item['attempts']} attempts:", error)
+                return
+            delay = min(STORAGE_BACKOFF_MAX_SECONDS, STORAGE_BACKOFF_BASE_SECONDS * 2 ** (item["attempts"] - 1))
+            item["next_attempt_at"] = time.time() + delay * random.uniform(0.5, 1.0)
+            self.retries += 1
+            self._save(item)
+            self._cond.notify_all()
+        print(f"⚠️ Storing {item['content_hash'][:12]} failed (attempt {item['attempts']}), retrying in {delay:.1f}s:", error)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "backend": type(self.storage).__name__,
+                "pending": len(self._pending),
+                "in_progress": len(self._in_progress),
+                "uploaded": self.uploaded,
+                "failed": self.failed,
+                "retries": self.retries,
+                "avg_upload_ms": round(self.upload_seconds * 1000.0 / self.uploaded, 1) if self.uploaded else 0.0,
+                "circuit_breaker": self.breaker.state,
+            }
@@ -0,0 +1,8 @@
+"""Shared pytest setup: the backend modules import each other by bare name.
+
+Run from backend/:  python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,65 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+LANES = {
+    "image": {"weight": 8, "max_running": 2, "reserved": 1, "max_queued": 1, "pooled": True},
+    "video": {"weight": 1, "max_running": 2, "reserved": 0, "max_queued": 4, "pooled": True},
+}
+
+
+def _controller(max_wait=5, max_in_flight=16):
+    return AdmissionController(lanes=LANES, max_running=2, max_wait=max_wait, max_in_flight=max_in_flight,
+                               enabled=True)
+
+
+def test_reserved_slot_keeps_room_for_images():
+    controller = _controller(max_wait=0.2)
+    video = controller.acquire("video")
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire("video")  # the second pooled slot is image's reserved one
+    assert rejected.value.status == 503 and rejected.value.reason == "queue_timeout"
+    image = controller.acquire("image")
+    video.release()
+    image.release()
+
+
+def test_full_lane_queue_is_rejected_with_retry_after():
+    controller = _controller()
+    held = [controller.acquire("image"), controller.acquire("image")]
+    waiter = threading.Thread(target=lambda: controller.acquire("image").release())
+    waiter.start()
+    deadline = time.time() + 5
+    while controller.stats()["lanes"]["image"]["queued"] == 0 and time.time() < deadline:
+        time.sleep(0.01)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire("image")
+    assert rejected.value.status == 429 and rejected.value.reason == "queue_full"
+    assert rejected.value.retry_after >= 1
+
+    for slot in held:
+        slot.release()
+    waiter.join(5)
+    assert controller.stats()["running"] == 0 and controller.stats()["in_flight"] == 0
+
+
+def test_background_scans_wait_instead_of_being_rejected():
+    controller = _controller(max_in_flight=1)
+    slot = controller.acquire("video")
+    admitted = threading.Event()
+
+    def background():
+        with controller.admit("video", background=True):
+            admitted.set()
+
+    thread = threading.Thread(target=background)
+    thread.start()
+    with pytest.raises(AdmissionRejected):
+        controller.acquire("image")  # request threads are over max_in_flight
+    slot.release()
+    thread.join(5)
+    assert admitted.is_set()
@@ -0,0 +1,70 @@
+import threading
+
+import torch
+import torch.nn as nn
+
+from batching import BatchScheduler
+
+
+class RecordingLinear(nn.Linear):
+    def __init__(self):
+        super().__init__(4, 2)
+        self.batch_sizes = []
+
+    def forward(self, x):
+        self.batch_sizes.append(x.shape[0])
+        return super().forward(x)
+
+
+def test_concurrent_requests_share_one_forward_and_get_their_own_rows():
+    torch.manual_seed(0)
+    model = RecordingLinear().eval()
+    scheduler = BatchScheduler(model, max_batch_size=8, max_wait_ms=500, name="test")
+    inputs = [torch.rand(1, 4) for _ in range(4)]
+    outputs = [None] * len(inputs)
+    start = threading.Barrier(len(inputs))
+
+    def request(i):
+        start.wait()
+        outputs[i] = scheduler.run(inputs[i])
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(len(inputs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    scheduler.close()
+
+    assert model.batch_sizes == [4]
+    with torch.no_grad():
+        for x, output in zip(inputs, outputs):
+            torch.testing.assert_close(output, model(x))
+
+
+def test_batches_stop_at_max_batch_size():
+    model = RecordingLinear().eval()
+    scheduler = BatchScheduler(model, max_batch_size=2, max_wait_ms=500, name="test")
+    start = threading.Barrier(5)
+    threads = [threading.Thread(target=lambda: (start.wait(), scheduler.run(torch.rand(1, 4)))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    scheduler.close()
+    assert sum(model.batch_sizes) == 5 and max(model.batch_sizes) <= 2
+
+
+def test_a_failing_forward_fails_every_request_in_the_batch():
+    class Broken(nn.Module):
+        def forward(self, x):
+            raise RuntimeError("boom")
+
+    scheduler = BatchScheduler(Broken(), max_wait_ms=0, name="test")
+    try:
+        scheduler.run(torch.rand(1, 4))
+    except RuntimeError as e:
+        assert str(e) == "boom"
+    else:
+        raise AssertionError("the forward's error was not raised to the caller")
+    finally:
+        scheduler.close()
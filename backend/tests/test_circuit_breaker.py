@@ -0,0 +1,32 @@
+import time
+
+from storage import CircuitBreaker
+
+
+def test_opens_after_consecutive_failures_and_probes_once_when_half_open():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.1)
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.15)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # one probe at a time
+
+    breaker.record_failure()  # the probe failed: open for another reset period
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.15)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+
+
+def test_a_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
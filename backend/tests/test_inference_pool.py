@@ -0,0 +1,50 @@
+import os
+
+import torch
+import torch.nn as nn
+
+from inference_pool import InferencePool
+
+
+class CrashOnce(nn.Linear):
+    """Kills its worker process on the first forward, as a segfaulting kernel would."""
+
+    def __init__(self, marker):
+        super().__init__(4, 2)
+        self.marker = marker
+
+    def forward(self, x):
+        if not os.path.exists(self.marker):
+            open(self.marker, "w").close()
+            os._exit(1)
+        return super().forward(x)
+
+
+def test_a_batch_whose_worker_died_is_rerun_on_the_replacement(tmp_path):
+    torch.manual_seed(0)
+    model = CrashOnce(str(tmp_path / "crashed")).eval()
+    pool = InferencePool({"image": model}, num_workers=1, warmup_iterations=0)
+    try:
+        x = torch.rand(3, 4)
+        output = pool.run("image", x)
+        assert os.path.exists(model.marker)  # so the reference forward below does not exit this process
+        with torch.no_grad():
+            torch.testing.assert_close(output, model(x))
+        stats = pool.stats()
+        assert stats["worker_restarts"] == 1 and stats["jobs_completed"] == 1 and stats["jobs_failed"] == 0
+    finally:
+        pool.close()
+
+
+def test_workers_serve_every_modality_from_shared_weights():
+    torch.manual_seed(0)
+    models = {"image": nn.Linear(4, 2).eval(), "audio": nn.Linear(8, 2).eval()}
+    pool = InferencePool(models, num_workers=2, warmup_iterations=0)
+    try:
+        with torch.no_grad():
+            for name, model in models.items():
+                x = torch.rand(2, model.in_features)
+                torch.testing.assert_close(pool.run(name, x), model(x))
+        assert all(p["alive"] for p in pool.stats()["processes"])
+    finally:
+        pool.close()
@@ -0,0 +1,44 @@
+import subprocess
+
+import numpy as np
+import pytest
+
+import frame_sampler
+import media_decode
+
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    """3 s of H.264 test pattern with an AAC tone, the usual phone upload."""
+    path = str(tmp_path_factory.mktemp("media") / "clip.mp4")
+    subprocess.run([
+        media_decode.FFMPEG_PATH, "-nostdin", "-v", "error", "-y",
+        "-f", "lavfi", "-i", "testsrc2=duration=3:size=640x360:rate=25",
+        "-f", "lavfi", "-i", "sine=frequency=440:duration=3:sample_rate=44100",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", path,
+    ], check=True)
+    return path
+
+
+@pytest.mark.parametrize("size", [(224, 224), None])
+@pytest.mark.parametrize("strategy", ["uniform", "stratified"])
+def test_sample_frames_match_opencv(clip, size, strategy):
+    expected = frame_sampler.sample_frames(clip, 10, size, strategy, np.random.default_rng(0))
+    actual = media_decode.sample_frames(clip, 10, size, strategy, np.random.default_rng(0))
+    assert actual.shape == expected.shape
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_iter_pcm_without_audio_yields_nothing(clip, tmp_path):
+    silent = str(tmp_path / "silent.mp4")
+    subprocess.run([media_decode.FFMPEG_PATH, "-nostdin", "-v", "error", "-y", "-i", clip, "-an", "-c", "copy",
+                    silent], check=True)
+    assert list(media_decode.iter_pcm(silent, 16000)) == []
+    assert sum(len(chunk) for chunk in media_decode.iter_pcm(clip, 16000)) == pytest.approx(48000, rel=0.02)
+
+
+def test_corrupt_input_raises(tmp_path):
+    broken = tmp_path / "broken.mp4"
+    broken.write_bytes(b"\x00" * 4096)
+    with pytest.raises(media_decode.MediaDecodeError):
+        list(media_decode.iter_pcm(str(broken), 16000))
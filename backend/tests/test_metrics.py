@@ -0,0 +1,36 @@
+import threading
+
+import metrics
+
+
+def _samples(histogram, **labels):
+    return sum(series[-1] for key, series in histogram._series.items()
+               if all(dict(zip(histogram.labelnames, key))[n] == v for n, v in labels.items()))
+
+
+def test_stage_labels_follow_the_scan_not_the_latest_swap():
+    old_started, new_started = threading.Event(), threading.Event()
+
+    def scan(version, started, other_started):
+        with metrics.model_version(version):
+            started.set()
+            other_started.wait(5)  # both scans are in flight, on different versions
+            metrics.observe_stage("preprocess", "test-labels", 0.01)
+
+    threads = [threading.Thread(target=scan, args=("v-old", old_started, new_started)),
+               threading.Thread(target=scan, args=("v-new", new_started, old_started))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert _samples(metrics.STAGE_SECONDS, modality="test-labels", model_version="v-old") == 1
+    assert _samples(metrics.STAGE_SECONDS, modality="test-labels", model_version="v-new") == 1
+
+
+def test_explicit_version_wins_and_block_is_restored():
+    with metrics.model_version("v-scan"):
+        metrics.observe_stage("forward", "test-explicit", 0.01, "v-scheduler")
+    metrics.observe_request("upload", "test-explicit", 0.01)
+    assert _samples(metrics.STAGE_SECONDS, modality="test-explicit", model_version="v-scheduler") == 1
+    assert _samples(metrics.REQUEST_SECONDS, modality="test-explicit", model_version="unknown") == 1
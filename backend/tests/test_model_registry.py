@@ -0,0 +1,44 @@
+import pytest
+
+from model_registry import ModelGeneration, RegistryError, ServingModels
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _generation(version):
+    return ModelGeneration(version, {"image": object()}, {"image": FakeScheduler()})
+
+
+def test_swap_keeps_in_flight_scans_on_their_generation():
+    serving = ServingModels()
+    with pytest.raises(RegistryError):
+        serving.acquire()
+
+    old, new = _generation("v1"), _generation("v2")
+    serving.swap(old)
+    in_flight = serving.acquire()
+
+    assert serving.swap(new) is old
+    assert serving.version() == "v2"
+    assert in_flight is old and not old.schedulers["image"].closed  # still scanning on v1
+
+    with serving.use() as generation:
+        assert generation is new
+    in_flight.release()
+    assert old.schedulers["image"].closed
+    assert not new.schedulers["image"].closed
+
+
+def test_an_idle_generation_closes_as_soon_as_it_is_retired():
+    serving = ServingModels()
+    old = _generation("v1")
+    serving.swap(old)
+    serving.swap(_generation("v2"))
+    assert old.schedulers["image"].closed
+    assert old.in_use() == 0
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+import torch
+
+from onnx_backend import OnnxModel, onnx_model_path
+from onnx_export import INPUT_SPECS, export, load_torch_model
+
+ATOL = 1e-4
+
+
+@pytest.fixture(scope="module", params=sorted(INPUT_SPECS))
+def exported(request, tmp_path_factory):
+    """(modality, eager model, onnxruntime model) for an export of random weights."""
+    modality = request.param
+    torch.manual_seed(0)
+    model = load_torch_model(modality, random_weights=True)
+    path = onnx_model_path(modality, str(tmp_path_factory.mktemp("onnx")))
+    export(model, modality, path)
+    return modality, model, OnnxModel(path)
+
+
+def _assert_parity(model, session, shape):
+    x = torch.rand(*shape, generator=torch.Generator().manual_seed(1))
+    with torch.no_grad():
+        expected = model(x).numpy()
+    actual = session(x).numpy()
+    assert actual.shape == expected.shape == (shape[0], 2)
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=ATOL)
+
+
+def test_onnxruntime_matches_torch(exported):
+    modality, model, session = exported
+    _assert_parity(model, session, INPUT_SPECS[modality][0])
+
+
+def test_dynamic_batch_axis(exported):
+    modality, model, session = exported
+    shape = list(INPUT_SPECS[modality][0])
+    shape[0] = 3  # exported with batch 1
+    _assert_parity(model, session, shape)
+
+
+def test_dynamic_time_axis(exported):
+    modality, model, session = exported
+    if modality != "video":
+        pytest.skip("only the video graph has a time axis")
+    _assert_parity(model, session, (2, 4, 3, 224, 224))  # exported with 10 frames
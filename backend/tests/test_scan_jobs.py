@@ -0,0 +1,99 @@
+import io
+import subprocess
+import threading
+import time
+import uuid
+
+import pytest
+
+import scan_jobs
+from scan_jobs import QUEUED, RUNNING, DONE, FAILED, QueueFull, SQLiteJobQueue, ScanJobRunner
+
+
+def _queue(tmp_path):
+    return SQLiteJobQueue(path=str(tmp_path / "jobs.sqlite3"), job_dir=str(tmp_path / "jobs"), max_queued=10)
+
+
+def _dead_pid():
+    process = subprocess.Popen(["true"])
+    process.wait()
+    return process.pid
+
+
+def _insert_orphan(queue):
+    """A job claimed by another process on the host that has since exited."""
+    job_id = uuid.uuid4().hex
+    path = queue.store_upload(io.BytesIO(b"payload"), job_id)
+    now = time.time()
+    queue._connection().execute("""
+        INSERT INTO scan_jobs (id, status, stage, user_id, filename, filetype, file_path, attempts,
+                               owner_pid, owner_started, created_at, updated_at)
+        VALUES (?, ?, 'starting', 1, 'a.png', 'png', ?, 1, ?, 'gone:0', ?, ?)
+    """, (job_id, RUNNING, path, _dead_pid(), now, now))
+    return job_id
+
+
+def test_jobs_are_claimed_oldest_first_and_bounded(tmp_path):
+    queue = SQLiteJobQueue(path=str(tmp_path / "jobs.sqlite3"), job_dir=str(tmp_path / "jobs"), max_queued=2)
+    first = queue.enqueue(io.BytesIO(b"one"), "a.png", "png", user_id=1)
+    second = queue.enqueue(io.BytesIO(b"two"), "b.png", "png", user_id=1)
+    with pytest.raises(QueueFull):
+        queue.enqueue(io.BytesIO(b"three"), "c.png", "png", user_id=1)
+
+    job = queue.claim()
+    assert job["id"] == first and job["status"] == RUNNING and job["attempts"] == 1
+    with open(job["file_path"], "rb") as f:
+        assert f.read() == b"one"
+    queue.finish(first, result={"result": "Safe"})
+    queue.finish(queue.claim()["id"], error="decode failed")
+    assert queue.claim() is None
+
+    assert queue.get(first)["status"] == DONE and queue.get(first)["result"] == {"result": "Safe"}
+    assert queue.get(second)["status"] == FAILED and queue.get(second)["error"] == "decode failed"
+    assert queue.active_count() == 0
+
+
+def test_recover_skips_jobs_this_process_is_running(tmp_path, monkeypatch):
+    monkeypatch.setattr(scan_jobs, "_process_identity", lambda pid: None)  # no /proc: owners matched on pid
+    queue = _queue(tmp_path)
+    queue.enqueue(io.BytesIO(b"payload"), "a.png", "png", user_id=1)
+    job = queue.claim()
+    assert queue.recover() == 0
+    assert queue.get(job["id"])["status"] == RUNNING
+
+
+def test_recover_leaves_a_job_another_process_reclaimed(tmp_path, monkeypatch):
+    queue, other = _queue(tmp_path), _queue(tmp_path)
+    job_id = _insert_orphan(queue)
+
+    def reclaimed_meanwhile(pid, started):
+        # Another process recovers and claims the job between our SELECT and UPDATE
+        monkeypatch.setattr(scan_jobs, "_owner_alive", lambda pid, started: False)
+        assert other.recover() == 1 and other.claim()["id"] == job_id
+        return False
+
+    monkeypatch.setattr(scan_jobs, "_owner_alive", reclaimed_meanwhile)
+    assert queue.recover() == 0
+    assert queue.get(job_id)["status"] == RUNNING
+    assert queue.get(job_id)["owner_pid"] is not None
+
+
+def test_runner_requeues_orphans_after_start_up(tmp_path):
+    queue = _queue(tmp_path)
+    handled = []
+    done = threading.Event()
+
+    def handler(job, set_stage):
+        handled.append(job["id"])
+        done.set()
+        return {"ok": True}
+
+    ScanJobRunner(queue, handler, workers=1, poll_seconds=0.05, recover_seconds=0.2)
+    job_id = _insert_orphan(queue)  # after the start-up sweep
+    assert done.wait(5), "orphaned job was never requeued"
+    deadline = time.time() + 5
+    while queue.get(job_id)["status"] != DONE and time.time() < deadline:
+        time.sleep(0.05)
+    assert handled == [job_id]
+    assert queue.get(job_id)["attempts"] == 2
+    assert queue.get(job_id)["status"] == DONE
@@ -0,0 +1,32 @@
+import pytest
+import torch
+
+from model import VideoStegoModel
+
+
+@pytest.fixture(scope="module")
+def model():
+    torch.manual_seed(0)
+    return VideoStegoModel(pretrained=False).eval()
+
+
+def per_frame(model, x):
+    """The original forward: one backbone call per timestep."""
+    features = torch.stack([model.cnn(x[:, t]) for t in range(x.shape[1])], dim=1)
+    lstm_out, _ = model.lstm(features)
+    return model.fc(lstm_out[:, -1, :])
+
+
+@pytest.mark.parametrize("batch,frames", [(1, 5), (2, 3), (2, 7)])  # 14 frames span two backbone calls
+def test_folded_forward_matches_the_per_frame_loop(model, batch, frames):
+    x = torch.rand(batch, frames, 3, 112, 112, generator=torch.Generator().manual_seed(1))
+    with torch.no_grad():
+        torch.testing.assert_close(model(x), per_frame(model, x), rtol=1e-5, atol=1e-6)
+
+
+def test_stepping_through_groups_matches_the_whole_clip(model):
+    x = torch.rand(1, 6, 3, 112, 112, generator=torch.Generator().manual_seed(2))
+    with torch.no_grad():
+        _, state = model.step(x[:, :2])
+        logits, _ = model.step(x[:, 2:], state)
+        torch.testing.assert_close(logits, model(x), rtol=1e-5, atol=1e-6)
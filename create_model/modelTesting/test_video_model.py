@@ -2,10 +2,13 @@ import os
 import torch
 import torch.nn as nn
 import torchvision.models as models
-import cv2
+import sys
 from torch.utils.data import Dataset, DataLoader
 from tqdm import tqdm
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "backend"))
+from frame_sampler import sample_frames, frames_to_tensor
+
 
 # Device Configuration
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -27,26 +30,9 @@ class VideoDataset(Dataset):
 
     def __getitem__(self, idx):
         video_path, label = self.data[idx]
-        cap = cv2.VideoCapture(video_path)
-        frames = []
-
-        while len(frames) < 10:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frame = torch.tensor(frame).permute(2, 0, 1).float() / 255.0
-            frames.append(frame)
-
-        cap.release()
-
-        if len(frames) < 10 and len(frames) > 0:
-            frames.extend([frames[-1]] * (10 - len(frames)))
-        elif len(frames) == 0:
-            frames = [torch.zeros(3, 224, 224)] * 10  # fallback for corrupt videos
-
-        frames = torch.stack(frames)
-        return frames, torch.tensor(label, dtype=torch.long)
+        # 10 frames spread across the clip; corrupt videos come back as all-zero frames
+        frames = sample_frames(video_path, num_frames=10, size=(224, 224))
+        return frames_to_tensor(frames), torch.tensor(label, dtype=torch.long)
 
 # Video Steganography Detection Model
 class VideoStegoModel(nn.Module):
@@ -46,7 +46,7 @@ class ImageStegoCNN(nn.Module):
         return self.model(x)
 
 # Evaluation function
-def evaluate(model, data_loader):
+def evaluate(model, data_loader, report=True):
     model.eval()
     y_true, y_pred = [], []
 
@@ -58,11 +58,14 @@ def evaluate(model, data_loader):
             y_true.extend(labels.cpu().numpy())
             y_pred.extend(preds.cpu().numpy())
 
-    print("✅ Classification Report:\n")
-    print(classification_report(y_true, y_pred, target_names=["Clean", "Stego"]))
+    if report:
+        print("✅ Classification Report:\n")
+        print(classification_report(y_true, y_pred, target_names=["Clean", "Stego"]))
 
-    print("📊 Confusion Matrix:\n")
-    print(confusion_matrix(y_true, y_pred))
+        print("📊 Confusion Matrix:\n")
+        print(confusion_matrix(y_true, y_pred))
+
+    return y_true, y_pred
 
 # Main
 if __name__ == "__main__":
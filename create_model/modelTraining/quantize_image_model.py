@@ -0,0 +1,180 @@
+import argparse
+import copy
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import torch
+import torch.nn as nn
+from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+from torch.utils.data import DataLoader, Subset
+from sklearn.metrics import accuracy_score
+
+import evaluate_performane
+from evaluate_performane import ImageDataset, ImageStegoCNN, evaluate
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "backend")
+sys.path.insert(0, BACKEND_DIR)
+from model import open_image, image_transform  # noqa: E402
+
+# Quantized kernels are CPU-only, so evaluate both models there
+device = torch.device("cpu")
+evaluate_performane.device = device
+
+# Paths
+val_path = "dataset_prep/dataset/split_data/split_images/val"
+model_path = "backend/models/image_model.pth"
+output_path = "backend/models/image_model_int8.pt"
+
+
+class ServingImageDataset(ImageDataset):
+    """split_images through the serving decode and transform, so calibration sees production inputs."""
+
+    def __getitem__(self, idx):
+        img_path, label = self.data[idx]
+        with open(img_path, "rb") as f:
+            image = open_image(f)
+        return image_transform(image), torch.tensor(label, dtype=torch.long)
+
+
+def load_fp32_model(path):
+    model = ImageStegoCNN()
+    model.load_state_dict(torch.load(path, map_location=device))
+    model.eval()
+    return model
+
+
+def quantize_static(model, calibration_loader, backend="x86"):
+    """Post-training static quantization with FX graph mode, calibrated on `calibration_loader`."""
+    torch.backends.quantized.engine = backend
+    example_inputs = (torch.randn(1, 3, 224, 224),)
+    prepared = prepare_fx(copy.deepcopy(model).eval(), get_default_qconfig_mapping(backend), example_inputs)
+    with torch.no_grad():
+        for images, _ in calibration_loader:
+            prepared(images)
+    return convert_fx(prepared)
+
+
+def quantize_dynamic_int8(model):
+    """Dynamic quantization fallback: INT8 weights for the Linear layers, activations stay float."""
+    return quantize_dynamic(copy.deepcopy(model).eval(), {nn.Linear}, dtype=torch.qint8)
+
+
+def to_torchscript(model):
+    with torch.no_grad():
+        return torch.jit.freeze(torch.jit.trace(model, torch.randn(1, 3, 224, 224)).eval())
+
+
+def serialized_size_mb(scripted):
+    buffer = io.BytesIO()
+    torch.jit.save(scripted, buffer)
+    return buffer.getbuffer().nbytes / (1024 * 1024)
+
+
+def median_latency_ms(model, repeats=30):
+    x = torch.randn(1, 3, 224, 224)
+    timings = []
+    with torch.no_grad():
+        for _ in range(5):
+            model(x)
+        for _ in range(repeats):
+            started = time.perf_counter()
+            model(x)
+            timings.append((time.perf_counter() - started) * 1000.0)
+    return statistics.median(timings)
+
+
+def accuracy(model, data_loader):
+    y_true, y_pred = evaluate(model, data_loader, report=False)
+    return 100.0 * accuracy_score(y_true, y_pred)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Produce an INT8 ImageStegoCNN and refuse it if accuracy drops too far.")
+    parser.add_argument("--val-path", default=val_path)
+    parser.add_argument("--model-path", default=model_path)
+    parser.add_argument("--output", default=output_path)
+    parser.add_argument("--mode", choices=["auto", "static", "dynamic"], default="auto",
+                        help="auto tries static PTQ first and falls back to dynamic quantization")
+    parser.add_argument("--calibration-samples", type=int, default=256)
+    parser.add_argument("--max-accuracy-drop", type=float, default=1.0,
+                        help="largest allowed fp32 -> int8 accuracy loss, in percentage points")
+    parser.add_argument("--backend", default="x86", help="quantized engine: x86, fbgemm, onednn or qnnpack")
+    args = parser.parse_args()
+
+    # Calibrate and gate on exactly what serving feeds the model (model.preprocess_image)
+    val_dataset = ServingImageDataset(args.val_path)
+    if len(val_dataset) == 0:
+        sys.exit(f"❌ No images found under {args.val_path}")
+    val_loader = DataLoader(val_dataset, batch_size=16, shuffle=False)
+
+    random.seed(0)
+    indices = random.sample(range(len(val_dataset)), min(args.calibration_samples, len(val_dataset)))
+    calibration_loader = DataLoader(Subset(val_dataset, indices), batch_size=16, shuffle=False)
+
+    fp32_model = load_fp32_model(args.model_path)
+    fp32_scripted = to_torchscript(fp32_model)
+    fp32 = {
+        "accuracy": accuracy(fp32_model, val_loader),
+        "latency_ms": median_latency_ms(fp32_scripted),
+        "size_mb": serialized_size_mb(fp32_scripted),
+    }
+    print(f"📏 fp32: accuracy {fp32['accuracy']:.2f}% | latency {fp32['latency_ms']:.2f} ms | size {fp32['size_mb']:.2f} MB")
+
+    methods = ["static", "dynamic"] if args.mode == "auto" else [args.mode]
+    report = {"fp32": fp32, "max_accuracy_drop": args.max_accuracy_drop, "attempts": []}
+    accepted = None
+
+    for method in methods:
+        try:
+            if method == "static":
+                quantized = quantize_static(fp32_model, calibration_loader, backend=args.backend)
+            else:
+                quantized = quantize_dynamic_int8(fp32_model)
+            scripted = to_torchscript(quantized)
+        except Exception as e:
+            print(f"⚠️ {method} quantization failed: {e}")
+            report["attempts"].append({"method": method, "error": str(e)})
+            continue
+
+        int8 = {
+            "method": method,
+            "accuracy": accuracy(scripted, val_loader),
+            "latency_ms": median_latency_ms(scripted),
+            "size_mb": serialized_size_mb(scripted),
+        }
+        int8["accuracy_delta"] = int8["accuracy"] - fp32["accuracy"]
+        int8["latency_speedup"] = fp32["latency_ms"] / int8["latency_ms"]
+        int8["size_ratio"] = int8["size_mb"] / fp32["size_mb"]
+        int8["accepted"] = -int8["accuracy_delta"] <= args.max_accuracy_drop
+        report["attempts"].append(int8)
+
+        print(f"🔢 int8 ({method}): accuracy {int8['accuracy']:.2f}% ({int8['accuracy_delta']:+.2f}) | "
+              f"latency {int8['latency_ms']:.2f} ms ({int8['latency_speedup']:.2f}x) | "
+              f"size {int8['size_mb']:.2f} MB ({int8['size_ratio']:.2f}x)")
+
+        if int8["accepted"]:
+            accepted = (method, scripted)
+            break
+        print(f"❌ {method} loses more than {args.max_accuracy_drop:.2f} points of accuracy")
+
+    report_path = os.path.splitext(args.output)[0] + ".report.json"
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Report written to {report_path}")
+
+    if accepted is None:
+        sys.exit("❌ No INT8 model met the accuracy margin; nothing was written")
+
+    method, scripted = accepted
+    torch.jit.save(scripted, args.output)
+    print(f"✅ {method} INT8 model saved at {args.output}")
+
+
+if __name__ == "__main__":
+    main()
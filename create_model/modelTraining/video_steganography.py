@@ -3,20 +3,25 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 import torchvision.models as models
-import cv2
+import sys
 import random
 from torch.utils.data import Dataset, DataLoader
 from tqdm import tqdm
 
+# Shared with the backend so training sees frames exactly as serving does
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "backend"))
+from frame_sampler import sample_frames, frames_to_tensor
+
 # Device Configuration
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 # Video Dataset with Augmentation & Error Handling
 class VideoDataset(Dataset):
-    def __init__(self, root_dir, max_frames=10):
+    def __init__(self, root_dir, max_frames=10, strategy="stratified"):
         self.root_dir = root_dir
         self.data = []
         self.max_frames = max_frames
+        self.strategy = strategy  # stratified draws different frames each epoch; uniform is deterministic
         for label, subdir in enumerate(["clean", "stego"]):
             path = os.path.join(root_dir, subdir)
             if os.path.exists(path):
@@ -28,26 +33,9 @@ class VideoDataset(Dataset):
     
     def __getitem__(self, idx):
         video_path, label = self.data[idx]
-        cap = cv2.VideoCapture(video_path)
-        frames = []
-        
-        while len(frames) < self.max_frames:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frame = cv2.resize(frame, (224, 224))  # Resize to match EfficientNet
-            frame = torch.tensor(frame).permute(2, 0, 1).float() / 255.0
-            frames.append(frame)
-        
-        cap.release()
-        
-        # Handle videos with fewer frames
-        if len(frames) < self.max_frames:
-            frames.extend([frames[-1]] * (self.max_frames - len(frames)))
-        
-        frames = torch.stack(frames)
-        return frames, torch.tensor(label, dtype=torch.long)
+        # Frames spread over the whole clip (not just its first moments), resized to match EfficientNet
+        frames = sample_frames(video_path, num_frames=self.max_frames, size=(224, 224), strategy=self.strategy)
+        return frames_to_tensor(frames), torch.tensor(label, dtype=torch.long)
 
 # Updated Model with EfficientNet + LSTM
 class VideoStegoModel(nn.Module):
@@ -60,8 +48,9 @@ class VideoStegoModel(nn.Module):
         
     def forward(self, x):
         batch_size, timesteps, C, H, W = x.shape
-        cnn_features = [self.cnn(x[:, t, :, :, :]) for t in range(timesteps)]
-        cnn_features = torch.stack(cnn_features, dim=1)
+        # One backbone call over every frame of every clip, then unfold for the LSTM
+        cnn_features = self.cnn(x.reshape(batch_size * timesteps, C, H, W))
+        cnn_features = cnn_features.view(batch_size, timesteps, -1)
         lstm_out, _ = self.lstm(cnn_features)
         return self.fc(lstm_out[:, -1, :])
 
@@ -121,7 +110,7 @@ if __name__ == "__main__":
     val_path = "C:/old/college/sem 6/Special Project/Project/StegoShield/dataset/split_data/split_videos/val"
     
     train_dataset = VideoDataset(train_path)
-    val_dataset = VideoDataset(val_path)
+    val_dataset = VideoDataset(val_path, strategy="uniform")
     
     train_loader = DataLoader(train_dataset, batch_size=4, shuffle=True, num_workers=2)
     val_loader = DataLoader(val_dataset, batch_size=4, shuffle=False, num_workers=2)
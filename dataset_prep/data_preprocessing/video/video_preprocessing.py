@@ -1,6 +1,11 @@
 import os
+import sys
+import wave
 import cv2
-from moviepy import VideoFileClip
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "backend"))
+from media_decode import iter_pcm  # noqa: E402
 
 # Define paths based on your dataset structure
 PROJECT_DIR = "C:/old/college/sem 6/Special Project/Project/StegoShield"
@@ -8,49 +13,84 @@ input_folder = os.path.join(PROJECT_DIR, "dataset/videos/clean")
 output_folder = os.path.join(PROJECT_DIR, "dataset/videos/processed")
 audio_output_folder = os.path.join(PROJECT_DIR, "dataset/videos/processed_audio_from_videos")
 
-os.makedirs(output_folder, exist_ok=True)
-os.makedirs(audio_output_folder, exist_ok=True)
-
 # Parameters
 target_resolution = (256, 256)
 
+def extract_audio(file_path, extract_audio_path):
+    """Writes the 16 kHz mono soundtrack as 16-bit WAV; False if the video has none."""
+    samples = 0
+    with wave.open(extract_audio_path, "wb") as audio_out:
+        audio_out.setnchannels(1)
+        audio_out.setsampwidth(2)  # 16-bit PCM, as before
+        audio_out.setframerate(16000)
+        for chunk in iter_pcm(file_path, sample_rate=16000):  # raises MediaDecodeError if ffmpeg fails
+            audio_out.writeframes((np.clip(chunk, -1.0, 1.0) * 32767).astype(np.int16).tobytes())
+            samples += len(chunk)
+    if not samples:
+        os.unlink(extract_audio_path)
+    return samples > 0
+
 def preprocess_video(file_path, output_path, extract_audio_path):
+    # Two passes on purpose: OpenCV decodes the frames faster than ffmpeg's pipe does here
+    # (benchmarks/decoding.py, audio+frames), and the soundtrack is a cheap second read
+    cap = out = None
     try:
-        # Extract audio using MoviePy
-        video_clip = VideoFileClip(file_path)
-        audio_clip = video_clip.audio
-        if audio_clip:
-            audio_clip.write_audiofile(extract_audio_path, codec="pcm_s16le", fps=16000)
-        else:
+        if not extract_audio(file_path, extract_audio_path):
             print(f"⚠ Warning: No audio found in {file_path}")
 
         # Process video frames using OpenCV
         cap = cv2.VideoCapture(file_path)
+        if not cap.isOpened():
+            raise IOError("OpenCV could not open the video")
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
         out = cv2.VideoWriter(output_path, fourcc, cap.get(cv2.CAP_PROP_FPS), target_resolution)
 
-        while cap.isOpened():
+        frames = 0
+        while True:
             ret, frame = cap.read()
             if not ret:
                 break
-            frame = cv2.resize(frame, target_resolution)  # Resize to 256x256
-            out.write(frame)
-
-        cap.release()
-        out.release()
-        video_clip.close()
+            out.write(cv2.resize(frame, target_resolution))  # Resize to 256x256
+            frames += 1
+        if not frames:
+            raise IOError("no frames could be decoded")
 
         print(f"✅ Processed {file_path}")
-        
+        return True
+
     except Exception as e:
         print(f"❌ Error processing {file_path}: {e}")
+        if out is not None:
+            out.release()  # closed before the partial file is removed
+        for partial in (output_path, extract_audio_path):
+            if os.path.exists(partial):
+                os.unlink(partial)  # don't leave half-written outputs that look processed
+        return False
+
+    finally:
+        if cap is not None:
+            cap.release()
+        if out is not None:
+            out.release()
+
+
+def main():
+    os.makedirs(output_folder, exist_ok=True)
+    os.makedirs(audio_output_folder, exist_ok=True)
+
+    # Process all videos
+    failed = 0
+    for file_name in os.listdir(input_folder):
+        input_path = os.path.join(input_folder, file_name)
+        output_video_path = os.path.join(output_folder, os.path.splitext(file_name)[0] + ".mp4")
+        output_audio_path = os.path.join(audio_output_folder, os.path.splitext(file_name)[0] + ".wav")
+
+        if not preprocess_video(input_path, output_video_path, output_audio_path):
+            failed += 1
 
-# Process all videos
-for file_name in os.listdir(input_folder):
-    input_path = os.path.join(input_folder, file_name)
-    output_video_path = os.path.join(output_folder, os.path.splitext(file_name)[0] + ".mp4")
-    output_audio_path = os.path.join(audio_output_folder, os.path.splitext(file_name)[0] + ".wav")
+    print(f"✅ Video preprocessing complete. Processed files saved in '{output_folder}'."
+          + (f" {failed} file(s) failed." if failed else ""))
 
-    preprocess_video(input_path, output_video_path, output_audio_path)
 
-print(f"✅ Video preprocessing complete. Processed files saved in '{output_folder}'.")
+if __name__ == "__main__":
+    main()
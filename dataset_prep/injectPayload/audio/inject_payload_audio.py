@@ -12,14 +12,6 @@ CLEAN_AUDIO_FOLDER = os.path.join(PROJECT_DIR, "dataset/audio/preprocessed")
 STEGO_AUDIO_FOLDER = os.path.join(PROJECT_DIR, "dataset/audio/stego")
 LABELS_FILE = os.path.join(PROJECT_DIR, "dataset/audio/labels.csv")
 
-# Ensure output directory exists
-os.makedirs(STEGO_AUDIO_FOLDER, exist_ok=True)
-
-# Fix read-only permissions
-for file_name in os.listdir(CLEAN_AUDIO_FOLDER):
-    file_path = os.path.join(CLEAN_AUDIO_FOLDER, file_name)
-    os.chmod(file_path, stat.S_IWRITE)  # Make file writable
-
 # Sample payloads
 TEXT_PAYLOAD = "HiddenStegoPayload"
 BINARY_PAYLOAD = bytes([random.randint(0, 255) for _ in range(128)])  # Random binary payload
@@ -127,45 +119,58 @@ def embed_adversarial(audio_path, output_path):
         print(f"❌ Error embedding adversarial payload in {audio_path}: {e}")
 
 
-# Get all WAV files and shuffle
-audio_files = [f for f in os.listdir(CLEAN_AUDIO_FOLDER) if f.endswith(".wav")]
-random.shuffle(audio_files)
-
-# Process half of the dataset
-half_dataset = len(audio_files) // 2
-selected_files = audio_files[:half_dataset]
-
-# List to store labels
-labels = []
-
-# Mark original files as clean
-for file_name in audio_files:
-    labels.append((file_name, "clean"))
-
-# Embed payloads and mark processed files as stego
-for file_name in selected_files:
-    input_path = os.path.join(CLEAN_AUDIO_FOLDER, file_name)
-    output_path = os.path.join(STEGO_AUDIO_FOLDER, file_name)
-    
-    # Choose a random payload type
-    payload_type = random.choice(["text", "binary", "noise", "adversarial"])
-    
-    if payload_type == "text":
-        embed_text_lsb(input_path, output_path, TEXT_PAYLOAD)
-    elif payload_type == "binary":
-        embed_binary(input_path, output_path, BINARY_PAYLOAD)
-    elif payload_type == "noise":
-        embed_noise(input_path, output_path)
-    elif payload_type == "adversarial":
-        embed_adversarial(input_path, output_path)
-    
-    labels.append((file_name, "stego"))
-
-# Save labels to CSV
-with open(LABELS_FILE, "w", newline="") as f:
-    writer = csv.writer(f)
-    writer.writerow(["filename", "label"])
-    writer.writerows(labels)
-
-print("✅ Steganography embedding complete!")
-print("✅ Labels file created:", LABELS_FILE)
+def main():
+    # Ensure output directory exists
+    os.makedirs(STEGO_AUDIO_FOLDER, exist_ok=True)
+
+    # Fix read-only permissions
+    for file_name in os.listdir(CLEAN_AUDIO_FOLDER):
+        file_path = os.path.join(CLEAN_AUDIO_FOLDER, file_name)
+        os.chmod(file_path, stat.S_IWRITE)  # Make file writable
+
+    # Get all WAV files and shuffle
+    audio_files = [f for f in os.listdir(CLEAN_AUDIO_FOLDER) if f.endswith(".wav")]
+    random.shuffle(audio_files)
+
+    # Process half of the dataset
+    half_dataset = len(audio_files) // 2
+    selected_files = audio_files[:half_dataset]
+
+    # List to store labels
+    labels = []
+
+    # Mark original files as clean
+    for file_name in audio_files:
+        labels.append((file_name, "clean"))
+
+    # Embed payloads and mark processed files as stego
+    for file_name in selected_files:
+        input_path = os.path.join(CLEAN_AUDIO_FOLDER, file_name)
+        output_path = os.path.join(STEGO_AUDIO_FOLDER, file_name)
+
+        # Choose a random payload type
+        payload_type = random.choice(["text", "binary", "noise", "adversarial"])
+
+        if payload_type == "text":
+            embed_text_lsb(input_path, output_path, TEXT_PAYLOAD)
+        elif payload_type == "binary":
+            embed_binary(input_path, output_path, BINARY_PAYLOAD)
+        elif payload_type == "noise":
+            embed_noise(input_path, output_path)
+        elif payload_type == "adversarial":
+            embed_adversarial(input_path, output_path)
+
+        labels.append((file_name, "stego"))
+
+    # Save labels to CSV
+    with open(LABELS_FILE, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["filename", "label"])
+        writer.writerows(labels)
+
+    print("✅ Steganography embedding complete!")
+    print("✅ Labels file created:", LABELS_FILE)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
 import os
+import subprocess
+import sys
 import cv2
 import numpy as np
 import torch
 import random
-from pydub import AudioSegment
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "backend"))
+from media_decode import FFMPEG_PATH, iter_frames, probe  # noqa: E402
 
 # Define Paths
 PROJECT_DIR = "C:/old/college/sem 6/Special Project/Project/StegoShield"
@@ -12,25 +16,13 @@ STEGO_VIDEO_FOLDER = os.path.join(PROJECT_DIR, "dataset/videos/stego")
 AUDIO_FOLDER = os.path.join(PROJECT_DIR, "dataset/videos/preprocessed_audio_from_videos")
 LABELS_FILE = os.path.join(PROJECT_DIR, "dataset/videos/labels.csv")
 
-# Ensure output directory exists
-os.makedirs(STEGO_VIDEO_FOLDER, exist_ok=True)
-
 # Sample Payloads
 BINARY_PAYLOAD = bytes([random.randint(0, 255) for _ in range(512)])
 
 # Function to extract frames from video
 def extract_frames(video_path):
-    cap = cv2.VideoCapture(video_path)
-    frames = []
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
-    
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frames.append(frame)
-    
-    cap.release()
+    fps = int(probe(video_path).fps)
+    frames = list(iter_frames(video_path, pix_fmt="bgr24"))  # BGR, as cv2.VideoWriter expects
     return frames, fps
 
 # Function to save frames back to video and add original audio
@@ -46,13 +38,15 @@ def save_video_with_audio(frames, output_video_path, audio_path, fps):
 
     if os.path.exists(audio_path):
         try:
-            # Load the original audio
-            audio = AudioSegment.from_file(audio_path)
+            # Mux the original audio next to the new frames; the video stream is copied, not re-encoded
             output_with_audio = output_video_path.replace(".mp4", "_final.mp4")
-            audio.export(output_with_audio, format="mp4")
+            subprocess.run([
+                FFMPEG_PATH, "-nostdin", "-v", "error", "-y", "-i", output_video_path, "-i", audio_path,
+                "-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy", "-c:a", "aac", "-shortest", output_with_audio,
+            ], check=True)
 
             print(f"✅ Audio added to: {output_with_audio}")
-        except Exception as e:
+        except subprocess.CalledProcessError as e:
             print(f"❌ Error adding audio to {output_video_path}: {e}")
     else:
         print(f"⚠️ No audio file found for {output_video_path}. Video saved without audio.")
@@ -87,55 +81,64 @@ def embed_binary(frames, payload):
 def embed_frame_manipulation(frames):
     return [cv2.convertScaleAbs(frame, alpha=1.1, beta=5) for frame in frames]
 
-# Get video files
-video_files = [f for f in os.listdir(CLEAN_VIDEO_FOLDER) if f.endswith(".mp4")]
-random.shuffle(video_files)
-
-labels = []
-num_clean = len(video_files) // 2  # Ensure 50% of dataset is clean
-num_stego = len(video_files) - num_clean  # Remaining 50% will have payloads
-
-# Process videos
-for i, file_name in enumerate(video_files):
-    input_path = os.path.join(CLEAN_VIDEO_FOLDER, file_name)
-    output_path = os.path.join(STEGO_VIDEO_FOLDER, file_name)
-    audio_path = os.path.join(AUDIO_FOLDER, file_name.replace(".mp4", ".wav"))  # Adjust extension if needed
-
-    frames, fps = extract_frames(input_path)
-
-    try:
-        if i < num_clean:
-            # Keep clean video
-            save_video_with_audio(frames, output_path, audio_path, fps)
-            labels.append(f"{file_name},clean")
-            print(f"🔹 Clean video saved: {output_path}")
-        else:
-            # Embed random payload
-            payload_type = random.choice(["adversarial", "noise", "binary", "frame_manipulation"])
-
-            if payload_type == "adversarial":
-                modified_frames = embed_adversarial(frames)
-                print(f"🔹 Adversarial payload embedded in: {output_path}")
-            elif payload_type == "noise":
-                modified_frames = embed_noise(frames)
-                print(f"🔹 Noise payload embedded in: {output_path}")
-            elif payload_type == "binary":
-                modified_frames = embed_binary(frames, BINARY_PAYLOAD)
-                print(f"🔹 Binary payload embedded in: {output_path}")
-            elif payload_type == "frame_manipulation":
-                modified_frames = embed_frame_manipulation(frames)
-                print(f"🔹 Frame manipulation payload embedded in: {output_path}")
-
-            save_video_with_audio(modified_frames, output_path, audio_path, fps)
-            labels.append(f"{file_name},stego")
-
-    except Exception as e:
-        print(f"❌ Error processing {input_path}: {e}")
-
-# Save Labels
-with open(LABELS_FILE, "w") as f:
-    f.write("filename,label\n")  # Column header changed to 'label'
-    for label in labels:
-        f.write(label + "\n")
-
-print("✅ Video Steganography Embedding Complete!")
+
+def main():
+    # Ensure output directory exists
+    os.makedirs(STEGO_VIDEO_FOLDER, exist_ok=True)
+
+    # Get video files
+    video_files = [f for f in os.listdir(CLEAN_VIDEO_FOLDER) if f.endswith(".mp4")]
+    random.shuffle(video_files)
+
+    labels = []
+    num_clean = len(video_files) // 2  # Ensure 50% of dataset is clean
+    num_stego = len(video_files) - num_clean  # Remaining 50% will have payloads
+
+    # Process videos
+    for i, file_name in enumerate(video_files):
+        input_path = os.path.join(CLEAN_VIDEO_FOLDER, file_name)
+        output_path = os.path.join(STEGO_VIDEO_FOLDER, file_name)
+        audio_path = os.path.join(AUDIO_FOLDER, file_name.replace(".mp4", ".wav"))  # Adjust extension if needed
+
+        frames, fps = extract_frames(input_path)
+
+        try:
+            if i < num_clean:
+                # Keep clean video
+                save_video_with_audio(frames, output_path, audio_path, fps)
+                labels.append(f"{file_name},clean")
+                print(f"🔹 Clean video saved: {output_path}")
+            else:
+                # Embed random payload
+                payload_type = random.choice(["adversarial", "noise", "binary", "frame_manipulation"])
+
+                if payload_type == "adversarial":
+                    modified_frames = embed_adversarial(frames)
+                    print(f"🔹 Adversarial payload embedded in: {output_path}")
+                elif payload_type == "noise":
+                    modified_frames = embed_noise(frames)
+                    print(f"🔹 Noise payload embedded in: {output_path}")
+                elif payload_type == "binary":
+                    modified_frames = embed_binary(frames, BINARY_PAYLOAD)
+                    print(f"🔹 Binary payload embedded in: {output_path}")
+                elif payload_type == "frame_manipulation":
+                    modified_frames = embed_frame_manipulation(frames)
+                    print(f"🔹 Frame manipulation payload embedded in: {output_path}")
+
+                save_video_with_audio(modified_frames, output_path, audio_path, fps)
+                labels.append(f"{file_name},stego")
+
+        except Exception as e:
+            print(f"❌ Error processing {input_path}: {e}")
+
+    # Save Labels
+    with open(LABELS_FILE, "w") as f:
+        f.write("filename,label\n")  # Column header changed to 'label'
+        for label in labels:
+            f.write(label + "\n")
+
+    print("✅ Video Steganography Embedding Complete!")
+
+
+if __name__ == "__main__":
+    main()
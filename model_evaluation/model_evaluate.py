@@ -3,6 +3,7 @@ import numpy as np
 import torch.nn as nn
 import torchvision.models as models
 import os
+import sys
 import cv2
 import librosa
 import librosa.display
@@ -12,6 +13,9 @@ from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_sc
 from torch.utils.data import Dataset, DataLoader
 from torchvision import transforms
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from frame_sampler import sample_frames, frames_to_tensor
+
 # Set device (Use GPU if available)
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
@@ -83,20 +87,8 @@ class VideoDataset(Dataset):
     
     def __getitem__(self, idx):
         video_path, label = self.data[idx]
-        cap = cv2.VideoCapture(video_path)
-        frames = []
-        while len(frames) < 10:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frame = transform(frame)
-            frames.append(frame)
-        cap.release()
-        if len(frames) < 10:
-            frames.extend([frames[-1]] * (10 - len(frames)))
-        frames = torch.stack(frames)
-        return frames, torch.tensor(label, dtype=torch.long)
+        frames = sample_frames(video_path, num_frames=10, size=(224, 224))
+        return frames_to_tensor(frames), torch.tensor(label, dtype=torch.long)
 
 # Load Datasets & Dataloaders
 image_test_dataset = ImageDataset(image_test_path)
@@ -136,8 +128,9 @@ class VideoStegoModel(nn.Module):
 
     def forward(self, x):
         batch_size, timesteps, C, H, W = x.shape
-        cnn_features = [self.cnn(x[:, t, :, :, :]) for t in range(timesteps)]
-        cnn_features = torch.stack(cnn_features, dim=1)
+        # One backbone call over every frame of every clip, then unfold for the LSTM
+        cnn_features = self.cnn(x.reshape(batch_size * timesteps, C, H, W))
+        cnn_features = cnn_features.view(batch_size, timesteps, -1)
         lstm_out, _ = self.lstm(cnn_features)
         return self.fc(lstm_out[:, -1, :])
 